@@ -31,6 +31,22 @@ app.conf.beat_schedule = {
         'task': 'incentive.tasks.cleanup_inactive_incentives',
         'schedule': 86400.0,  # Cada 24 horas
     },
+    'compute-all-roommate-matches': {
+        'task': 'matching.tasks.compute_all_roommate_matches',
+        'schedule': 86400.0,  # Cada 24 horas
+    },
+    'compute-all-agent-matches': {
+        'task': 'matching.tasks.compute_all_agent_matches',
+        'schedule': 86400.0,  # Cada 24 horas
+    },
+    'prune-expired-matches': {
+        'task': 'matching.tasks.prune_expired_matches',
+        'schedule': 86400.0,  # Cada 24 horas
+    },
+    'refresh-nearby-counts': {
+        'task': 'matching.tasks.refresh_all_nearby_counts',
+        'schedule': 86400.0,  # Cada 24 horas
+    },
 }
 
 app.conf.timezone = 'America/La_Paz'
@@ -333,3 +333,16 @@ else:
     }
 
 MATCH_MIN_SCORE = int(os.environ.get('MATCH_MIN_SCORE', '0'))
+MATCH_FULL_RESCORE_HOURS = int(os.environ.get('MATCH_FULL_RESCORE_HOURS', '24'))
+# Matches pendientes que se conservan por usuario y tipo (0 = sin límite)
+MATCH_TOP_K = int(os.environ.get('MATCH_TOP_K', '100'))
+# Edad máxima (segundos) de los matches servidos antes de encolar su recálculo y duración del lock de recálculo
+MATCH_STALE_SECONDS = int(os.environ.get('MATCH_STALE_SECONDS', '300'))
+MATCH_REFRESH_LOCK_SECONDS = int(os.environ.get('MATCH_REFRESH_LOCK_SECONDS', '300'))
+# Instrumentación del matching (tiempos y consultas por fase, ver utils.match_profiling)
+MATCH_PROFILING = os.environ.get('MATCH_PROFILING', 'False') == 'True'
+# Puntos máximos que suma la similitud semántica de embeddings al score de propiedades (ver utils.embeddings)
+MATCH_SEMANTIC_BOOST = float(os.environ.get('MATCH_SEMANTIC_BOOST', '5'))
+# Retención: días sin recalcular tras los cuales se archivan los matches pendientes / rechazados
+MATCH_PENDING_TTL_DAYS = int(os.environ.get('MATCH_PENDING_TTL_DAYS', '30'))
+MATCH_REJECTED_TTL_DAYS = int(os.environ.get('MATCH_REJECTED_TTL_DAYS', '7'))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SearchProfile, RoommateRequest, Match, MatchFeedback
+from .models import SearchProfile, RoommateRequest, Match, MatchFeedback, MatchRefreshState, PropertyMatchFeatures, VibeTag, ArchivedMatch, MatchWeightSet
 
 
 @admin.register(SearchProfile)
@@ -25,4 +25,34 @@ class MatchAdmin(admin.ModelAdmin):
 class MatchFeedbackAdmin(admin.ModelAdmin):
     list_display = ('match', 'user', 'feedback_type', 'created_at')
     list_filter = ('feedback_type',)
-    search_fields = ('user__username',)
\ No newline at end of file
+    search_fields = ('user__username',)
+
+@admin.register(MatchRefreshState)
+class MatchRefreshStateAdmin(admin.ModelAdmin):
+    list_display = ('profile', 'match_type', 'scored_at', 'full_rescore_at', 'candidates_rescored', 'candidates_pruned')
+    list_filter = ('match_type',)
+
+
+@admin.register(PropertyMatchFeatures)
+class PropertyMatchFeaturesAdmin(admin.ModelAdmin):
+    list_display = ('property', 'rating_avg', 'rating_count', 'price_per_person', 'updated_at')
+    readonly_fields = ('amenity_mask',)
+
+
+@admin.register(VibeTag)
+class VibeTagAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name')
+    search_fields = ('name',)
+
+
+@admin.register(ArchivedMatch)
+class ArchivedMatchAdmin(admin.ModelAdmin):
+    list_display = ('original_id', 'match_type', 'subject_id', 'target_user_id', 'score', 'status', 'archived_at')
+    list_filter = ('match_type', 'status')
+
+
+@admin.register(MatchWeightSet)
+class MatchWeightSetAdmin(admin.ModelAdmin):
+    list_display = ('id', 'match_type', 'is_active', 'created_at')
+    list_filter = ('match_type', 'is_active')
+    readonly_fields = ('weights', 'intercept', 'metrics')
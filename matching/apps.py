@@ -7,5 +7,4 @@ class MatchingConfig(AppConfig):
     verbose_name = 'Matching'
 
     def ready(self):
-        # Aquí se pueden conectar señales si es necesario
-        pass
\ No newline at end of file
+        import matching.signals
\ No newline at end of file
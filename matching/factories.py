@@ -0,0 +1,123 @@
+"""
+Datos de prueba compartidos por los tests del motor de matching (``matching/tests_*.py``).
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point, Polygon
+
+from amenity.models import Amenity
+from matching.models import SearchProfile
+from property.models import Property
+from review.models import Review
+from user.models import UserProfile
+from zone.models import Zone
+
+TEST_PASSWORD = 'testpass123'
+CENTER = (-63.1821, -17.7834)
+SQUARE = ((-63.2, -17.8), (-63.1, -17.8), (-63.1, -17.7), (-63.2, -17.7), (-63.2, -17.8))
+
+
+def make_user(username: str) -> User:
+    return User.objects.create_user(username=username, password=TEST_PASSWORD)
+
+
+def make_zone(name: str) -> Zone:
+    return Zone.objects.create(name=name, bounds=Polygon(SQUARE))
+
+
+def make_property(owner: User, address: str, **fields) -> Property:
+    """Propiedad activa en ``CENTER``; ``fields`` reemplaza cualquier valor por defecto."""
+    values = {
+        'type': 'departamento', 'location': Point(*CENTER), 'price': Decimal('600.00'),
+        'description': 'Propiedad de prueba', 'bedrooms': 1, 'bathrooms': 1,
+    }
+    values.update(fields)
+    return Property.objects.create(owner=owner, address=address, **values)
+
+
+def make_profile(username: str, **fields) -> SearchProfile:
+    """Usuario nuevo con su perfil de búsqueda."""
+    return SearchProfile.objects.create(user=make_user(username), **fields)
+
+
+def make_roommate_seekers():
+    """
+    Zonas norte/sur y cinco perfiles con preferencias, presupuestos y zonas que
+    cubren los casos del motor de roomies (el último no busca roomie).
+    """
+    north = make_zone('Zona Norte Roomie')
+    south = make_zone('Zona Sur Roomie')
+    specs = [
+        ('roomie_a', 'looking', [north], ('400.00', '800.00'), {'gender': 'female', 'smoker_ok': False}, ['tranquilo', 'ordenado']),
+        ('roomie_b', 'open', [north, south], ('600.00', '900.00'), {'gender': 'female'}, ['ordenado']),
+        ('roomie_c', 'looking', [south], ('1500.00', '2000.00'), {'gender': 'male', 'smoker': True}, ['fiestero']),
+        ('roomie_d', 'looking', [], (None, None), {}, []),
+        ('roomie_e', 'no', [north], ('500.00', '700.00'), {'gender': 'any'}, ['tranquilo']),
+    ]
+    profiles = []
+    for username, preference, zones, (budget_min, budget_max), prefs, vibes in specs:
+        profile = make_profile(
+            username,
+            roommate_preference=preference,
+            budget_min=Decimal(budget_min) if budget_min else None,
+            budget_max=Decimal(budget_max) if budget_max else None,
+            roommate_preferences=prefs,
+            vibes=vibes,
+        )
+        profile.preferred_zones.set(zones)
+        profiles.append(profile)
+    return (north, south), profiles
+
+
+class ScoringFixtureMixin:
+    """
+    Perfil con amenities, familia y mascota frente a tres propiedades con precios,
+    reglas, reseñas y favoritos distintos: ejercita todos los sub-scores.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner_batch')
+        self.tenant = make_user('tenant_batch')
+        self.tenant_profile = UserProfile.objects.create(user=self.tenant)
+
+        self.pool = Amenity.objects.create(name='Piscina')
+        self.garage = Amenity.objects.create(name='Garaje')
+
+        self.profile = SearchProfile.objects.create(
+            user=self.tenant,
+            location=Point(*CENTER),
+            budget_min=Decimal('400.00'),
+            budget_max=Decimal('800.00'),
+            roommate_preference='open',
+            children_count=1,
+            pets_count=1,
+            occupation='Estudiante',
+        )
+        self.profile.amenities.add(self.pool, self.garage)
+
+        self.properties = [
+            make_property(
+                self.owner,
+                f'Calle Batch {i}',
+                location=Point(CENTER[0] + i * 0.01, CENTER[1]),
+                price=price,
+                bedrooms=bedrooms,
+                allows_roommates=allows_roommates,
+                max_occupancy=3 if allows_roommates else None,
+                pets_allowed=i != 1,
+                students_only=i == 2,
+            )
+            for i, (price, bedrooms, allows_roommates) in enumerate([
+                (Decimal('600.00'), 2, False),
+                (Decimal('1500.00'), 1, True),
+                (Decimal('350.00'), 3, True),
+            ])
+        ]
+
+        self.properties[0].amenities.add(self.pool)
+        self.properties[2].amenities.add(self.pool, self.garage)
+        Review.objects.create(property=self.properties[0], user=self.owner, rating=4, comment='Bien')
+        Review.objects.create(property=self.properties[0], user=self.tenant, rating=5, comment='Muy bien')
+        self.tenant_profile.favorites.add(self.properties[1])
@@ -0,0 +1,58 @@
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from utils.agent_roster import invalidate_agent_roster
+from utils.candidate_index import invalidate_profile_index
+from utils.match_benchmark import BENCHMARK_SCALES, MATCHERS, benchmark_report, run_benchmark, synthesize_dataset
+
+
+class Command(BaseCommand):
+    help = 'Genera un dataset sintético, mide los matchers y emite un reporte JSON comparable entre commits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(BENCHMARK_SCALES), default='small', help='Escala predefinida del dataset')
+        parser.add_argument('--zones', type=int, help='Cantidad de zonas (sobrescribe la escala)')
+        parser.add_argument('--properties', type=int, help='Cantidad de propiedades (sobrescribe la escala)')
+        parser.add_argument('--profiles', type=int, help='Cantidad de perfiles de búsqueda (sobrescribe la escala)')
+        parser.add_argument('--agents', type=int, help='Cantidad de agentes (sobrescribe la escala)')
+        parser.add_argument('--samples', type=int, default=20, help='Perfiles/propiedades medidos por matcher')
+        parser.add_argument('--matchers', nargs='+', choices=MATCHERS, default=list(MATCHERS), help='Matchers a medir')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del generador')
+        parser.add_argument('--output', type=str, help='Archivo donde escribir el reporte JSON (por defecto stdout)')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Conservar el dataset sintético (por defecto todo se revierte al terminar)'
+        )
+
+    def handle(self, *args, **options):
+        scale = dict(BENCHMARK_SCALES[options['scale']])
+        for key in ('zones', 'properties', 'profiles', 'agents'):
+            if options[key] is not None:
+                scale[key] = options[key]
+
+        self.stderr.write(f'Generando dataset sintético: {scale}')
+        try:
+            with transaction.atomic():
+                started = perf_counter()
+                dataset = synthesize_dataset(seed=options['seed'], **scale)
+                synth_seconds = perf_counter() - started
+                self.stderr.write(f'Dataset listo en {synth_seconds:.1f}s; midiendo {", ".join(options["matchers"])}')
+                results = run_benchmark(dataset, samples=options['samples'], matchers=options['matchers'], seed=options['seed'])
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        finally:
+            if not options['keep']:
+                # Los índices en caché pueden haberse construido con filas revertidas
+                invalidate_profile_index()
+                invalidate_agent_roster()
+
+        report = json.dumps(benchmark_report(scale, dataset, results, options['seed'], synth_seconds), indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Reporte escrito en {options['output']}"))
+        else:
+            self.stdout.write(report)
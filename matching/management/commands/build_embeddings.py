@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from utils.embedding_index import get_listing_index
+from utils.embeddings import backfill_embeddings
+
+
+class Command(BaseCommand):
+    help = 'Calcula los embeddings semánticos de propiedades y perfiles y reconstruye el índice de similares'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Filas por bulk_update')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recalcular todos los embeddings (por defecto solo los faltantes)'
+        )
+
+    def handle(self, *args, **options):
+        updated = backfill_embeddings(batch_size=options['batch_size'], force=options['force'])
+        for model_name, count in updated.items():
+            self.stdout.write(f'{model_name}: {count} embeddings actualizados')
+        index = get_listing_index()
+        self.stdout.write(self.style.SUCCESS(f'Índice de similares listo con {len(index)} propiedades'))
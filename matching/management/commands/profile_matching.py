@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from matching.models import SearchProfile
+from property.models import Property
+from utils.batch_matching import ScoringStats
+from utils.match_profiling import add_candidates, phase, profiling
+from utils.matching import MATCH_CREATORS, calculate_property_match_score
+from utils.spatial import MATCH_RADIUS_KM, nearby_properties
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los matches de un perfil de búsqueda e imprime el desglose de tiempos y consultas por fase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', type=int, help='ID del SearchProfile')
+        parser.add_argument(
+            '--type',
+            choices=list(MATCH_CREATORS) + ['all'],
+            default='all',
+            help='Tipo de match a recalcular'
+        )
+        parser.add_argument(
+            '--scalar',
+            action='store_true',
+            help='Puntuar además los candidatos de propiedades con la versión escalar (tiempo por sub-score)'
+        )
+        parser.add_argument(
+            '--write',
+            action='store_true',
+            help='Conservar los matches escritos (por defecto la corrida se revierte)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            profile = SearchProfile.objects.select_related('user').get(id=options['profile_id'])
+        except SearchProfile.DoesNotExist:
+            raise CommandError(f"SearchProfile {options['profile_id']} no existe")
+        match_types = list(MATCH_CREATORS) if options['type'] == 'all' else [options['type']]
+
+        # Recálculo completo (since=None) sin sumar a los contadores compartidos
+        with profiling(publish=False) as profiler, transaction.atomic():
+            for match_type in match_types:
+                stats = ScoringStats()
+                with phase(f'refresh.{match_type}'):
+                    if match_type in ('property', 'roommate'):
+                        MATCH_CREATORS[match_type](profile, stats=stats)
+                    else:
+                        stats.candidates = MATCH_CREATORS[match_type](profile)
+                add_candidates(match_type, stats.candidates)
+                self.stdout.write(f'{match_type}: {stats.as_dict()}')
+            if options['scalar'] and 'property' in match_types:
+                self._replay_scalar(profile)
+            if not options['write']:
+                transaction.set_rollback(True)
+
+        summary = profiler.as_dict()
+        self.stdout.write(f"{'fase':<28}{'llamadas':>10}{'total ms':>12}{'prom. ms':>12}{'consultas':>11}")
+        for name, row in summary['phases'].items():
+            self.stdout.write(
+                f"{name:<28}{row['calls']:>10}{row['total_ms']:>12.3f}{row['avg_ms']:>12.4f}{row['queries']:>11}"
+            )
+        for match_type, row in summary['candidates'].items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{match_type}: {row['candidates']} candidatos | {row['candidates_per_second']} candidatos/s"
+            ))
+
+    def _replay_scalar(self, profile):
+        qs = Property.objects.filter(is_active=True)
+        if profile.location:
+            qs = nearby_properties(qs, profile.location, MATCH_RADIUS_KM).order_by('match_distance')
+        for prop in qs[:500]:
+            with phase('scalar.property'):
+                calculate_property_match_score(profile, prop)
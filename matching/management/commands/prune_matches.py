@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from utils.match_retention import RETENTION_MODES, prune_expired_matches
+
+
+class Command(BaseCommand):
+    help = 'Archiva, exporta o elimina los matches pendientes/rechazados que superaron su TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=RETENTION_MODES,
+            default='archive',
+            help='archive: tabla ArchivedMatch; export: JSONL comprimido (--export-path); delete: solo eliminar'
+        )
+        parser.add_argument('--pending-days', type=int, help='TTL de matches pendientes (por defecto MATCH_PENDING_TTL_DAYS)')
+        parser.add_argument('--rejected-days', type=int, help='TTL de matches rechazados (por defecto MATCH_REJECTED_TTL_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote')
+        parser.add_argument('--export-path', type=str, help='Archivo .jsonl.gz para el modo export')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo contar filas y bytes que se recuperarían'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS(f'Iniciando retención de matches - {timezone.now()}')
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: No se eliminarán matches'))
+        try:
+            report = prune_expired_matches(
+                mode=options['mode'],
+                pending_days=options['pending_days'],
+                rejected_days=options['rejected_days'],
+                batch_size=options['batch_size'],
+                export_path=options['export_path'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Filas: {report['rows']} | Bytes recuperados: {report['bytes_reclaimed']} | "
+                f"Bytes archivados: {report['archive_bytes']} | Lotes: {report['batches']}"
+            )
+        )
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from matching.models import MatchWeightSet
+from utils.match_weights import activate_weight_set, export_training_csv, save_weight_set, tune_property_weights
+
+
+class Command(BaseCommand):
+    help = 'Ajusta offline los pesos del score de propiedades con el feedback y el estado de los matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--l2', type=float, default=1e-2, help='Regularización L2 de la regresión logística')
+        parser.add_argument('--min-samples', type=int, default=200, help='Mínimo de matches etiquetados para ajustar')
+        parser.add_argument('--holdout', type=float, default=0.2, help='Fracción de validación para comparar el AUC')
+        parser.add_argument('--export', type=str, help='Exportar features y etiquetas a este CSV y terminar')
+        parser.add_argument('--activate', action='store_true', help='Activar la versión nueva al guardarla')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar los pesos ajustados, sin guardar una versión'
+        )
+        parser.add_argument('--use-version', type=int, help='Activar una versión existente en lugar de ajustar')
+        parser.add_argument('--use-defaults', action='store_true', help='Desactivar las versiones y volver a los pesos por defecto')
+
+    def handle(self, *args, **options):
+        if options['use_defaults']:
+            activate_weight_set(None)
+            self.stdout.write(self.style.SUCCESS('Pesos por defecto activos'))
+            return
+        if options['use_version'] is not None:
+            try:
+                activate_weight_set(options['use_version'])
+            except MatchWeightSet.DoesNotExist as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"Versión de pesos {options['use_version']} activa"))
+            return
+        if options['export']:
+            rows = export_training_csv(options['export'])
+            self.stdout.write(self.style.SUCCESS(f"{rows} matches etiquetados exportados a {options['export']}"))
+            return
+
+        try:
+            result = tune_property_weights(l2=options['l2'], min_samples=options['min_samples'], holdout=options['holdout'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(json.dumps(result, indent=2))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: No se guardó la versión'))
+            return
+        weight_set = save_weight_set(
+            result['weights'], intercept=result['intercept'],
+            metrics={**result['metrics'], 'coefficients': result['coefficients']},
+            activate=options['activate'],
+        )
+        state = 'activa' if options['activate'] else 'guardada (usar --use-version para activarla)'
+        self.stdout.write(self.style.SUCCESS(f'Versión de pesos {weight_set.pk} {state}'))
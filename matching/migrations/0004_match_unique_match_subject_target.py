@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_matches(apps, schema_editor):
+    """
+    Elimina matches duplicados por (match_type, subject_id, target_user)
+    conservando el más reciente, para poder crear la restricción única.
+    """
+    Match = apps.get_model('matching', 'Match')
+    duplicates = (
+        Match.objects.values('match_type', 'subject_id', 'target_user')
+        .annotate(total=Count('id'), keep_id=Max('id'))
+        .filter(total__gt=1)
+    )
+    for dup in duplicates:
+        Match.objects.filter(
+            match_type=dup['match_type'],
+            subject_id=dup['subject_id'],
+            target_user=dup['target_user'],
+        ).exclude(id=dup['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0003_searchprofile_stable_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_matches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='match',
+            constraint=models.UniqueConstraint(fields=('match_type', 'subject_id', 'target_user'), name='unique_match_subject_target'),
+        ),
+    ]
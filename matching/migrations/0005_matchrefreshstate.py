@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0004_match_unique_match_subject_target'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchRefreshState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_type', models.CharField(choices=[('property', 'Property'), ('roommate', 'Roommate'), ('agent', 'Agent')], max_length=20)),
+                ('scored_at', models.DateTimeField()),
+                ('full_rescore_at', models.DateTimeField()),
+                ('candidates_rescored', models.IntegerField(default=0)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_refresh_states', to='matching.searchprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('profile', 'match_type'), name='unique_match_refresh_state')],
+            },
+        ),
+    ]
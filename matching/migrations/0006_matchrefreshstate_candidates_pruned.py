@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0005_matchrefreshstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchrefreshstate',
+            name='candidates_pruned',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count
+
+
+def backfill_property_match_features(apps, schema_editor):
+    """
+    Calcula las features de matching de las propiedades existentes por lotes.
+    Replica ``utils.match_features.refresh_property_match_features`` con modelos históricos.
+    """
+    Property = apps.get_model('property', 'Property')
+    Review = apps.get_model('review', 'Review')
+    PropertyMatchFeatures = apps.get_model('matching', 'PropertyMatchFeatures')
+    Through = Property.amenities.through
+
+    ids = list(Property.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        ratings = {
+            pid: (avg, count)
+            for pid, avg, count in Review.objects.filter(property_id__in=chunk)
+            .values('property_id').annotate(avg=Avg('rating'), count=Count('id'))
+            .values_list('property_id', 'avg', 'count')
+        }
+        masks = {}
+        for pid, amenity_id in Through.objects.filter(property_id__in=chunk).values_list('property_id', 'amenity_id'):
+            masks[pid] = masks.get(pid, 0) | (1 << amenity_id)
+        rows = []
+        for prop in Property.objects.filter(id__in=chunk).values('id', 'price', 'max_occupancy', 'created_at', 'tags', 'location'):
+            avg, count = ratings.get(prop['id'], (None, 0))
+            mask = masks.get(prop['id'], 0)
+            tags = prop['tags'] if isinstance(prop['tags'], (list, tuple)) else []
+            location = prop['location']
+            rows.append(PropertyMatchFeatures(
+                property_id=prop['id'],
+                rating_avg=avg,
+                rating_count=count,
+                amenity_mask=mask.to_bytes((mask.bit_length() + 7) // 8, 'little'),
+                tags=sorted({str(t).strip().lower() for t in tags if str(t).strip()}),
+                fresh_since=prop['created_at'],
+                price_per_person=float(prop['price']) / max(prop['max_occupancy'], 1) if prop['max_occupancy'] else None,
+                latitude=location.y if location is not None else None,
+                longitude=location.x if location is not None else None,
+            ))
+        PropertyMatchFeatures.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amenity', '0001_initial'),
+        ('matching', '0006_matchrefreshstate_candidates_pruned'),
+        ('property', '0007_property_is_roomie_listing_property_roomie_profile'),
+        ('review', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyMatchFeatures',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='match_features', serialize=False, to='property.property')),
+                ('rating_avg', models.FloatField(blank=True, null=True)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('amenity_mask', models.BinaryField(default=bytes)),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('fresh_since', models.DateTimeField(blank=True, null=True)),
+                ('price_per_person', models.FloatField(blank=True, null=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_property_match_features, migrations.RunPython.noop),
+    ]
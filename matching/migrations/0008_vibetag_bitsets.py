@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def _to_mask(ids):
+    value = 0
+    for item_id in ids:
+        value |= 1 << item_id
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def backfill_bitsets(apps, schema_editor):
+    """
+    Asigna ids de VibeTag a todos los vibes/tags existentes y calcula las máscaras
+    de bits de perfiles y propiedades.
+    """
+    SearchProfile = apps.get_model('matching', 'SearchProfile')
+    PropertyMatchFeatures = apps.get_model('matching', 'PropertyMatchFeatures')
+    VibeTag = apps.get_model('matching', 'VibeTag')
+
+    def as_list(value):
+        return value if isinstance(value, (list, tuple)) else []
+
+    names = set()
+    for vibes in SearchProfile.objects.values_list('vibes', flat=True).iterator():
+        names.update(str(v) for v in as_list(vibes))
+    for tags in PropertyMatchFeatures.objects.values_list('property__tags', flat=True).iterator():
+        names.update(str(t) for t in as_list(tags))
+    names = {n for n in names if len(n) <= 255}
+    VibeTag.objects.bulk_create([VibeTag(name=n) for n in names], ignore_conflicts=True)
+    ids = dict(VibeTag.objects.values_list('name', 'id'))
+
+    amenities = {}
+    for pid, amenity_id in SearchProfile.amenities.through.objects.values_list('searchprofile_id', 'amenity_id').iterator():
+        amenities.setdefault(pid, []).append(amenity_id)
+    profiles = []
+    for profile in SearchProfile.objects.only('id', 'vibes').iterator():
+        profile.vibe_mask = _to_mask(ids[str(v)] for v in as_list(profile.vibes) if str(v) in ids)
+        profile.amenity_mask = _to_mask(amenities.get(profile.id, []))
+        profiles.append(profile)
+    SearchProfile.objects.bulk_update(profiles, ['vibe_mask', 'amenity_mask'], batch_size=1000)
+
+    features = []
+    for row in PropertyMatchFeatures.objects.select_related('property').only('property_id', 'property__tags').iterator():
+        row.tag_mask = _to_mask(ids[str(t)] for t in as_list(row.property.tags) if str(t) in ids)
+        features.append(row)
+    PropertyMatchFeatures.objects.bulk_update(features, ['tag_mask'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0007_propertymatchfeatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VibeTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='searchprofile',
+            name='amenity_mask',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='searchprofile',
+            name='vibe_mask',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='propertymatchfeatures',
+            name='tag_mask',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(backfill_bitsets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0008_vibetag_bitsets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField()),
+                ('match_type', models.CharField(choices=[('property', 'Property'), ('roommate', 'Roommate'), ('agent', 'Agent')], max_length=20)),
+                ('subject_id', models.IntegerField()),
+                ('target_user_id', models.IntegerField()),
+                ('score', models.FloatField()),
+                ('status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target_user_id', 'match_type'], name='archived_match_user_type')],
+            },
+        ),
+    ]
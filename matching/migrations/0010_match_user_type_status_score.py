@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0009_archivedmatch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['target_user', 'match_type', 'status', '-score', 'id'], name='match_user_type_status_score'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0010_match_user_type_status_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchWeightSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_type', models.CharField(choices=[('property', 'Property'), ('roommate', 'Roommate'), ('agent', 'Agent')], default='property', max_length=20)),
+                ('weights', models.JSONField(default=dict)),
+                ('intercept', models.FloatField(default=0.0)),
+                ('metrics', models.JSONField(blank=True, default=dict)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('match_type',), name='unique_active_weight_set')],
+            },
+        ),
+    ]
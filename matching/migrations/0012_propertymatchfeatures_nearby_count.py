@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0011_matchweightset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertymatchfeatures',
+            name='nearby_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
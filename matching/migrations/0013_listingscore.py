@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0012_propertymatchfeatures_nearby_count'),
+        ('property', '0008_property_location_geog_gist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('scored_at', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listing_scores', to='matching.searchprofile')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listing_scores', to='property.property')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('profile', 'property'), name='unique_listing_score')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0014_match_user_type_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='searchprofile',
+            index=models.Index(fields=['budget_min', 'budget_max'], name='searchprofile_budget'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0015_searchprofile_budget'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ListingScore',
+        ),
+    ]
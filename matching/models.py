@@ -34,9 +34,18 @@ class SearchProfile(models.Model):
     lifestyle = models.JSONField(default=dict)
     schedule = models.JSONField(default=dict)
     stable_job = models.BooleanField(default=False)
+    # Conjuntos como máscaras de bits (ver utils.bitsets), mantenidos por señales
+    amenity_mask = models.BinaryField(default=bytes)
+    vibe_mask = models.BinaryField(default=bytes)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Filtro por presupuesto solapado (utils.budget_index.budget_overlap_filter)
+            models.Index(fields=['budget_min', 'budget_max'], name='searchprofile_budget'),
+        ]
+
     def __str__(self):
         return f"Perfil de búsqueda de {self.user.username}"
 
@@ -76,12 +85,77 @@ class Match(models.Model):
             models.Index(fields=['match_type', 'target_user']),
             models.Index(fields=['match_type', 'subject_id']),
             models.Index(fields=['status']),
+            # Listado de matches con paginación por cursor: filtro + orden (score DESC, id).
+            # Sin filtro de estado (caso por defecto) status quedaría entre el prefijo y el orden
+            models.Index(fields=['target_user', 'match_type', '-score', 'id'], name='match_user_type_score'),
+            models.Index(fields=['target_user', 'match_type', 'status', '-score', 'id'], name='match_user_type_status_score'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['match_type', 'subject_id', 'target_user'], name='unique_match_subject_target'),
         ]
 
     def __str__(self):
         return f"Match {self.match_type} -> {self.target_user.username} ({self.score})"
 
 
+class MatchRefreshState(models.Model):
+    """
+    Marca de agua del último cálculo de matches por perfil y tipo.
+    Permite recalcular solo los candidatos modificados desde ``scored_at``.
+    """
+    profile = models.ForeignKey(SearchProfile, on_delete=models.CASCADE, related_name='match_refresh_states')
+    match_type = models.CharField(max_length=20, choices=Match.MATCH_TYPE_CHOICES)
+    scored_at = models.DateTimeField()
+    full_rescore_at = models.DateTimeField()
+    candidates_rescored = models.IntegerField(default=0)
+    candidates_pruned = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'match_type'], name='unique_match_refresh_state'),
+        ]
+
+    def __str__(self):
+        return f"Refresh {self.match_type} de {self.profile_id} @ {self.scored_at}"
+
+
+class VibeTag(models.Model):
+    """
+    Id entero estable para cada vibe de SearchProfile o tag de Property, usado
+    como posición de bit en las máscaras de matching.
+    """
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PropertyMatchFeatures(models.Model):
+    """
+    Features desnormalizadas de una Property para el matching (una fila por propiedad).
+    Se mantienen al día con señales de Property, Review y Property.amenities para que
+    el barrido de candidatos no tenga que agregar reseñas ni amenities.
+    """
+    property = models.OneToOneField('property.Property', on_delete=models.CASCADE, primary_key=True, related_name='match_features')
+    rating_avg = models.FloatField(null=True, blank=True)
+    rating_count = models.IntegerField(default=0)
+    # Bit i encendido = amenity con id i (bytes little-endian)
+    amenity_mask = models.BinaryField(default=bytes)
+    # Bit i encendido = VibeTag con id i, a partir de Property.tags sin normalizar
+    tag_mask = models.BinaryField(default=bytes)
+    tags = models.JSONField(default=list, blank=True)
+    fresh_since = models.DateTimeField(null=True, blank=True)
+    price_per_person = models.FloatField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Propiedades activas a menos de NEARBY_RADIUS_KM (None = aún no calculado, ver utils.match_features)
+    nearby_count = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Features de matching de {self.property_id}"
+
+
 class MatchFeedback(models.Model):
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='feedback')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='match_feedback')
@@ -90,4 +164,50 @@ class MatchFeedback(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Feedback {self.feedback_type} por {self.user.username}"
\ No newline at end of file
+        return f"Feedback {self.feedback_type} por {self.user.username}"
+
+
+class ArchivedMatch(models.Model):
+    """
+    Copia compacta (sin metadata ni claves foráneas) de un Match eliminado por la
+    política de retención (ver ``utils.match_retention``).
+    """
+    original_id = models.BigIntegerField()
+    match_type = models.CharField(max_length=20, choices=Match.MATCH_TYPE_CHOICES)
+    subject_id = models.IntegerField()
+    target_user_id = models.IntegerField()
+    score = models.FloatField()
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['target_user_id', 'match_type'], name='archived_match_user_type'),
+        ]
+
+    def __str__(self):
+        return f"Match archivado {self.match_type} #{self.original_id}"
+
+
+class MatchWeightSet(models.Model):
+    """
+    Juego de pesos del score de matching ajustado offline con el feedback de los
+    usuarios (ver ``utils.match_weights``). Cada ajuste es una versión nueva; el
+    scorer usa la versión activa o, si no hay ninguna, los pesos por defecto.
+    """
+    match_type = models.CharField(max_length=20, choices=Match.MATCH_TYPE_CHOICES, default='property')
+    weights = models.JSONField(default=dict)
+    intercept = models.FloatField(default=0.0)
+    metrics = models.JSONField(default=dict, blank=True)
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['match_type'], condition=models.Q(is_active=True), name='unique_active_weight_set'),
+        ]
+
+    def __str__(self):
+        return f"Pesos {self.match_type} v{self.pk}{' (activo)' if self.is_active else ''}"
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MatchKeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (score DESC, id ASC), el orden de los
+    índices ``match_user_type_score`` y ``match_user_type_status_score``. Cada
+    página filtra por la posición del último elemento de la anterior, así que el
+    costo no crece con la profundidad y las inserciones o borrados concurrentes no
+    desplazan las páginas siguientes. Un recálculo concurrente tampoco corta el
+    recorrido: la página siguiente continúa desde la misma posición (score, id) con
+    los scores vigentes, de modo que solo un match cuyo score cruzó esa posición
+    puede aparecer dos veces u omitirse.
+    El cursor es opaco y va firmado para que no se pueda fabricar.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-score', 'id')
+    signing_salt = 'matching.match_cursor'
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+        self.next_position = None
+        self.request = None
+
+    def encode_cursor(self, score: float, match_id: int) -> str:
+        return signing.dumps([score, match_id], salt=self.signing_salt, compress=True)
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            score, match_id = signing.loads(raw, salt=self.signing_salt)
+            return float(score), int(match_id)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValidationError({'cursor': 'Cursor inválido'})
+
+    def get_page_size(self, request) -> int:
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            score, match_id = position
+            queryset = queryset.filter(Q(score__lt=score) | Q(score=score, id__gt=match_id))
+        # Un elemento extra indica si hay página siguiente sin hacer COUNT(*)
+        page = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = (page[-1].score, page[-1].id)
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
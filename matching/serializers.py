@@ -41,11 +41,11 @@ class SearchProfileSerializer(serializers.ModelSerializer):
     latitude = serializers.DecimalField(max_digits=9, decimal_places=6, required=False, write_only=True)
     longitude = serializers.DecimalField(max_digits=9, decimal_places=6, required=False, write_only=True)
     amenities = AmenityFlexibleField(required=False)
-    # Campos adicionales se serializan automáticamente vía fields='__all__'
+    # Campos adicionales se serializan automáticamente; las máscaras de bits y el embedding son internos del matching
 
     class Meta:
         model = SearchProfile
-        fields = '__all__'
+        exclude = ['amenity_mask', 'vibe_mask', 'semantic_embedding']
         read_only_fields = ['user', 'created_at', 'updated_at', 'location']
 
     def validate(self, data):
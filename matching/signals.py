@@ -0,0 +1,205 @@
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+from property.models import Property
+from review.models import Review
+from user.models import UserProfile
+from .models import SearchProfile
+
+
+@receiver(post_save, sender=SearchProfile)
+@receiver(post_delete, sender=SearchProfile)
+def invalidate_profile_index_on_change(sender, instance, **kwargs):
+    """
+    Invalida el índice de candidatos para matching inverso cuando cambia un perfil.
+    """
+    from utils.candidate_index import invalidate_profile_index
+    invalidate_profile_index()
+
+
+@receiver(pre_save, sender=SearchProfile)
+def update_vibe_mask_on_profile_save(sender, instance, raw=False, **kwargs):
+    """
+    Recalcula la máscara de bits de vibes del perfil antes de guardarlo.
+    """
+    if raw:
+        return
+    from utils.match_features import vibe_mask
+    instance.vibe_mask = vibe_mask(instance.vibes)
+
+
+@receiver(pre_save, sender=SearchProfile)
+@receiver(pre_save, sender=Property)
+def update_semantic_embedding_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Recalcula el embedding semántico (vibes/lifestyle o descripción/tags) antes de guardar.
+    """
+    if raw:
+        return
+    from utils.embeddings import embed_profile, embed_property, pack_embedding
+    embed = embed_property if sender is Property else embed_profile
+    instance.semantic_embedding = pack_embedding(embed(instance))
+
+
+@receiver(m2m_changed, sender=SearchProfile.amenities.through)
+def refresh_amenity_mask_on_profile_amenities_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recalcula la máscara de amenities de los perfiles afectados.
+    """
+    if reverse and action == 'pre_clear':
+        instance._cleared_profile_ids = list(instance.searchprofile_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from utils.match_features import refresh_profile_amenity_masks
+    if not reverse:
+        masks = refresh_profile_amenity_masks([instance.pk])
+        # Mantener consistente la instancia en memoria (se usa enseguida para puntuar)
+        instance.amenity_mask = masks[instance.pk]
+    elif action == 'post_clear':
+        refresh_profile_amenity_masks(getattr(instance, '_cleared_profile_ids', []))
+    elif pk_set:
+        refresh_profile_amenity_masks(pk_set)
+
+
+def _deleted_with_property(kwargs) -> bool:
+    """True si el borrado viene en cascada desde una Property (no hay nada que refrescar)."""
+    origin = kwargs.get('origin')
+    return getattr(origin, 'model', type(origin)) is Property
+
+
+def _spatial_key(location, is_active):
+    """Coordenadas y estado comparables (el SRID de un Point nuevo puede no estar asignado)."""
+    return (location.coords if location is not None else None, bool(is_active))
+
+
+@receiver(pre_save, sender=Property)
+def remember_previous_location(sender, instance, raw=False, **kwargs):
+    """
+    Guarda la ubicación y el estado anteriores para saber si cambia el conteo de cercanas de las vecinas.
+    """
+    instance._previous_spatial = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_spatial = Property.objects.filter(pk=instance.pk).values_list('location', 'is_active').first()
+
+
+@receiver(post_save, sender=Property)
+def refresh_match_features_on_property_save(sender, instance, raw=False, created=False, **kwargs):
+    """
+    Mantiene PropertyMatchFeatures al día cuando cambia precio, ubicación, tags u ocupación.
+    Si la propiedad es nueva, se movió o cambió is_active, recalcula también nearby_count
+    de la propiedad y de sus vecinas (antes y después del cambio).
+    """
+    if raw:
+        return
+    from utils.match_features import refresh_nearby_counts_around, refresh_property_match_features
+    refresh_property_match_features([instance.pk])
+    previous = getattr(instance, '_previous_spatial', None)
+    if created or previous is None or _spatial_key(*previous) != _spatial_key(instance.location, instance.is_active):
+        refresh_nearby_counts_around(instance.pk, [instance.location, previous[0] if previous else None])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_match_features_on_review_change(sender, instance, **kwargs):
+    """
+    Recalcula promedio y cantidad de reseñas de la propiedad.
+    """
+    if kwargs.get('raw') or _deleted_with_property(kwargs):
+        return
+    from utils.match_features import refresh_property_match_features
+    refresh_property_match_features([instance.property_id])
+
+
+@receiver(m2m_changed, sender=Property.amenities.through)
+def refresh_match_features_on_amenities_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recalcula la máscara de amenities cuando se agregan o quitan amenities de una propiedad.
+    """
+    if reverse and action == 'pre_clear':
+        # Desde Amenity, post_clear no informa qué propiedades perdieron la amenity
+        instance._cleared_property_ids = list(instance.property_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from utils.match_features import refresh_property_match_features
+    if not reverse:
+        refresh_property_match_features([instance.pk])
+    elif action == 'post_clear':
+        refresh_property_match_features(getattr(instance, '_cleared_property_ids', []))
+    elif pk_set:
+        refresh_property_match_features(pk_set)
+
+
+@receiver(pre_save, sender=Property)
+def remember_managed_zone_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Guarda el agente y la zona previos de la propiedad para detectar cambios en
+    las zonas gestionadas de los agentes.
+    """
+    instance._previous_agent_zone = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'agent', 'zone'}.intersection(update_fields):
+        instance._previous_agent_zone = (instance.agent_id, instance.zone_id)
+        return
+    instance._previous_agent_zone = Property.objects.filter(pk=instance.pk).values_list('agent_id', 'zone_id').first()
+
+
+def _agents_with_changed_zones(instance, created, deleted):
+    current = (instance.agent_id, instance.zone_id)
+    if created or deleted:
+        return [instance.agent_id] if instance.zone_id else []
+    previous = getattr(instance, '_previous_agent_zone', None)
+    if previous is None or previous == current:
+        return []
+    return [previous[0], current[0]]
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_agent_roster_on_change(sender, instance, raw=False, **kwargs):
+    """
+    Invalida el roster de agentes cuando cambia un perfil de usuario (tipo, comisión)
+    o una propiedad (agente o zona gestionada). Si cambian las zonas gestionadas, se
+    actualiza la marca de agua de los agentes afectados antes de invalidar.
+    """
+    from utils.agent_roster import invalidate_agent_roster, touch_agents
+    if sender is Property and not raw:
+        touch_agents(_agents_with_changed_zones(instance, kwargs.get('created', False), 'created' not in kwargs))
+    invalidate_agent_roster()
+
+
+@receiver(post_delete, sender=Property)
+def refresh_nearby_counts_on_property_delete(sender, instance, **kwargs):
+    """
+    Descuenta la propiedad borrada del nearby_count de sus vecinas.
+    """
+    from utils.match_features import refresh_nearby_counts_around
+    refresh_nearby_counts_around(None, [instance.location])
+
+
+@receiver(post_delete, sender=Property)
+def invalidate_listing_index_on_delete(sender, instance, **kwargs):
+    """
+    Un borrado no deja rastro en updated_at: el índice de embeddings se reconstruye.
+    """
+    from utils.embedding_index import invalidate_listing_index
+    invalidate_listing_index()
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_tiles_on_property_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Invalida los vector tiles del mapa. Los guardados con update_fields que no tocan
+    campos del tile (contadores, embeddings...) no los invalidan.
+    """
+    if raw:
+        return
+    from utils.vector_tiles import TILE_FIELDS, invalidate_tiles
+    if update_fields is not None and not TILE_FIELDS.intersection(update_fields):
+        return
+    invalidate_tiles()
@@ -1,13 +1,130 @@
 from celery import shared_task
+from django.conf import settings
+from django.utils.timezone import now
 from .models import SearchProfile
 from utils.matching import (
-    create_property_matches_for_profile, create_roommate_matches_for_profile, create_agent_matches_for_profile
+    MATCH_CREATORS, MatchWriter, notify_matches_updated, refresh_matches_for_profile, release_refresh_lock
 )
 
 
 @shared_task
-def compute_matches_for_profile(profile_id: int):
-    profile = SearchProfile.objects.get(id=profile_id)
-    create_property_matches_for_profile(profile)
-    create_roommate_matches_for_profile(profile)
-    create_agent_matches_for_profile(profile)
\ No newline at end of file
+def compute_matches_for_profile(profile_id: int, match_type: str = None):
+    """
+    Recalcula (de forma incremental) los matches del perfil para un tipo o para
+    todos, libera el lock de recálculo y avisa al usuario por su grupo de notificaciones.
+    """
+    match_types = [match_type] if match_type else list(MATCH_CREATORS)
+    try:
+        profile = SearchProfile.objects.get(id=profile_id)
+        for current_type in match_types:
+            refresh_matches_for_profile(profile, current_type)
+    finally:
+        for current_type in match_types:
+            release_refresh_lock(profile_id, current_type)
+    notify_matches_updated(profile, match_types, now())
+
+
+@shared_task
+def compute_reverse_matches_for_property(property_id: int, chunk_size: int = 1000):
+    """
+    Matching inverso al crear una propiedad: el índice de perfiles descarta los
+    que no pueden alcanzar MATCH_MIN_SCORE y el resto se puntúa por lotes.
+    """
+    from property.models import Property
+    from utils.batch_matching import score_profiles_for_property
+    from utils.candidate_index import get_profile_index
+
+    try:
+        prop = Property.objects.get(id=property_id)
+    except Property.DoesNotExist:
+        return {'property_id': property_id, 'candidates': 0, 'matches': 0}
+    threshold = getattr(settings, 'MATCH_MIN_SCORE', 70)
+    candidate_ids = get_profile_index().candidates_for_property(prop, threshold)
+    writer = MatchWriter(threshold=threshold, update_zone_activity=False)
+    for start in range(0, len(candidate_ids), chunk_size):
+        profiles = SearchProfile.objects.filter(id__in=candidate_ids[start:start + chunk_size]).select_related('user')
+        for profile, score, meta in score_profiles_for_property(prop, profiles):
+            writer.add('property', prop.id, profile.user, score, meta)
+    written = writer.flush()
+    return {'property_id': property_id, 'candidates': len(candidate_ids), 'matches': written}
+
+
+@shared_task
+def compute_all_roommate_matches(flush_every: int = 5000):
+    """
+    Matching nocturno de roomies entre todos los buscadores (roommate_preference
+    looking/open). Las features se cargan una vez y cada perfil se puntúa contra
+    la población completa con bloqueo por zonas y presupuesto.
+    """
+    from utils.roommate_matching import RoommateEngine, RoommateFeatures
+
+    threshold = getattr(settings, 'MATCH_MIN_SCORE', 70)
+    engine = RoommateEngine(RoommateFeatures.seekers())
+    writer = MatchWriter(threshold=threshold, update_zone_activity=False)
+    written = 0
+    for user_id, matches in engine.all_pairs(threshold):
+        for other_id, _, score, meta in matches:
+            writer.add('roommate', other_id, user_id, score, meta)
+        if len(writer) >= flush_every:
+            written += writer.flush()
+    written += writer.flush()
+    return {
+        'profiles': len(engine.candidates),
+        'pairs_considered': engine.pairs_considered,
+        'pairs_scored': engine.pairs_scored,
+        'matches': written,
+    }
+
+
+@shared_task
+def compute_all_agent_matches(flush_every: int = 5000):
+    """
+    Refresca los matches de agentes de todos los perfiles en un solo barrido
+    contra el roster de agentes (zonas preferidas cargadas en una consulta).
+    """
+    from utils.agent_roster import get_agent_roster
+
+    threshold = getattr(settings, 'MATCH_MIN_SCORE', 70)
+    roster = get_agent_roster()
+    profile_zones = {user_id: [] for user_id in SearchProfile.objects.values_list('user_id', flat=True)}
+    links = SearchProfile.preferred_zones.through.objects.values_list('searchprofile__user_id', 'zone_id')
+    for user_id, zone_id in links:
+        profile_zones[user_id].append(zone_id)
+    writer = MatchWriter(threshold=threshold, update_zone_activity=False)
+    written = 0
+    for user_id, results in roster.score_profiles(profile_zones):
+        for agent_id, score, meta in results:
+            writer.add('agent', agent_id, user_id, score, meta)
+        if len(writer) >= flush_every:
+            written += writer.flush()
+    written += writer.flush()
+    return {'profiles': len(profile_zones), 'agents': len(roster), 'matches': written}
+
+
+@shared_task
+def prune_expired_matches(mode: str = 'archive'):
+    """
+    Tarea periódica de retención: mueve a ArchivedMatch (o elimina) los matches
+    pendientes y rechazados que superaron su TTL.
+    """
+    from utils.match_retention import prune_expired_matches as prune
+
+    return prune(mode=mode)
+
+
+@shared_task
+def refresh_all_nearby_counts(chunk_size: int = 2000):
+    """
+    Recalcula PropertyMatchFeatures.nearby_count de todas las propiedades. Las
+    señales lo mantienen al día; esta pasada corrige los cambios hechos con
+    ``QuerySet.update`` (sin señales) y completa las filas aún sin calcular.
+    """
+    from property.models import Property
+    from utils.match_features import refresh_nearby_counts, refresh_property_match_features
+
+    refresh_property_match_features(Property.objects.filter(match_features__isnull=True).values_list('id', flat=True))
+    ids = list(Property.objects.order_by('id').values_list('id', flat=True))
+    updated = 0
+    for start in range(0, len(ids), chunk_size):
+        updated += refresh_nearby_counts(ids[start:start + chunk_size])
+    return {'properties': len(ids), 'updated': updated}
@@ -1,7 +1,10 @@
+from unittest import mock
+
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.test import override_settings
 from django.contrib.gis.geos import Point
 from decimal import Decimal
 from property.models import Property
@@ -9,6 +12,7 @@ from notification.models import Notification
 from message.models import Message
 from matching.models import SearchProfile, Match
 from matching.models import MatchFeedback
+from utils.batch_matching import score_properties_for_profile
 
 
 class MatchingAPITestCase(APITestCase):
@@ -121,8 +125,10 @@ class MatchingAPITestCase(APITestCase):
             desired_types=['departamento']
         )
 
-        # Obtener recomendaciones mixtas
-        resp = self.client.get('/api/recommendations/?type=mixed')
+        # Obtener recomendaciones mixtas (los recálculos encolados se ejecutan en línea)
+        from matching.tasks import compute_matches_for_profile
+        with mock.patch('matching.tasks.compute_matches_for_profile.delay', side_effect=compute_matches_for_profile):
+            resp = self.client.get('/api/recommendations/?type=mixed')
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertIn('results', resp.data)
         results = resp.data['results']
@@ -177,8 +183,10 @@ class MatchingAPITestCase(APITestCase):
             is_active=True
         )
 
-        # Solicitar recomendaciones solo de propiedades
-        resp = self.client.get('/api/recommendations/?type=property')
+        # Solicitar recomendaciones solo de propiedades (el recálculo encolado se ejecuta en línea)
+        from matching.tasks import compute_matches_for_profile
+        with mock.patch('matching.tasks.compute_matches_for_profile.delay', side_effect=compute_matches_for_profile):
+            resp = self.client.get('/api/recommendations/?type=property')
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertIn('results', resp.data)
         results = resp.data['results']
@@ -199,19 +207,31 @@ class MatchingAPITestCase(APITestCase):
             budget_max=Decimal('800.00'),
             desired_types=['departamento']
         )
-        # Otro usuario con perfil compatible para generar match de roomie
+        # Otro usuario que busca roomie con perfil compatible para generar match de roomie
         other_user = User.objects.create_user(username='roomie_other', email='roomie_other@example.com', password='roomiepass123')
-        SearchProfile.objects.create(
+        other = SearchProfile.objects.create(
             user=other_user,
             location=Point(-63.1821, -17.7834),
             budget_min=Decimal('450.00'),
             budget_max=Decimal('750.00'),
-            desired_types=['departamento']
+            desired_types=['departamento'],
+            roommate_preference='looking'
+        )
+        # Perfil compatible que no busca roomie: no es candidato
+        not_seeking_user = User.objects.create_user(username='roomie_no', email='roomie_no@example.com', password='roomiepass123')
+        SearchProfile.objects.create(
+            user=not_seeking_user,
+            budget_min=Decimal('450.00'),
+            budget_max=Decimal('750.00'),
         )
 
-        # Solicitar recomendaciones solo de roomies
-        resp = self.client.get('/api/recommendations/?type=roommate')
+        # Solicitar recomendaciones solo de roomies: el recálculo se encola (aquí se ejecuta en línea)
+        from matching.tasks import compute_matches_for_profile
+        with mock.patch('matching.tasks.compute_matches_for_profile.delay', side_effect=compute_matches_for_profile) as delay:
+            resp = self.client.get('/api/recommendations/?type=roommate')
+        delay.assert_called_once_with(SearchProfile.objects.get(user=self.user).id, 'roommate')
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['refresh_enqueued'], ['roommate'])
         self.assertIn('results', resp.data)
         results = resp.data['results']
         self.assertTrue(results, msg='Debe retornar al menos una recomendación de roomie')
@@ -220,4 +240,219 @@ class MatchingAPITestCase(APITestCase):
             self.assertEqual(item.get('type'), 'roommate')
             match = item.get('match')
             self.assertIsInstance(match, dict)
-            self.assertEqual(match.get('match_type'), 'roommate')
\ No newline at end of file
+            self.assertEqual(match.get('match_type'), 'roommate')
+        self.assertEqual([item['match']['subject_id'] for item in results], [other.id])
+
+    def test_matches_rescore_only_changed_properties(self):
+        sp = SearchProfile.objects.create(
+            user=self.user,
+            location=Point(-63.1821, -17.7834),
+            budget_min=Decimal('400.00'),
+            budget_max=Decimal('800.00'),
+        )
+        owner_user = User.objects.create_user(username='inc_owner', email='inc_owner@example.com', password='ownerpass123')
+        props = [
+            Property.objects.create(
+                owner=owner_user, type='departamento', address=f'Inc {i}', location=Point(-63.1821, -17.7834),
+                price=Decimal('600.00'), description='Inc Prop', bedrooms=1, bathrooms=1, is_active=True
+            )
+            for i in range(3)
+        ]
+
+        # Primer cálculo: se puntúan todos los candidatos
+        resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/?refresh=sync')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['candidates_rescored'], 3)
+
+        # Sin cambios: no se recalcula nada y se sirven los matches almacenados
+        resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/?refresh=sync')
+        self.assertEqual(resp.data['candidates_rescored'], 0)
+        self.assertEqual(len(resp.data['results']), 3)
+
+        # Solo la propiedad modificada se recalcula
+        props[0].price = Decimal('700.00')
+        props[0].save()
+        resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/?refresh=sync')
+        self.assertEqual(resp.data['candidates_rescored'], 1)
+
+        # Un cambio en el perfil fuerza el recálculo completo
+        sp.budget_max = Decimal('900.00')
+        sp.save()
+        resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/?refresh=sync')
+        self.assertEqual(resp.data['candidates_rescored'], 3)
+
+    def test_matches_keyset_pagination(self):
+        sp = SearchProfile.objects.create(user=self.user)
+        scores = [90.0, 80.0, 80.0, 80.0, 70.0]
+        created = [
+            Match.objects.create(match_type='property', subject_id=1000 + i, target_user=self.user, score=score, metadata={})
+            for i, score in enumerate(scores)
+        ]
+        expected = [m.id for m in sorted(created, key=lambda m: (-m.score, m.id))]
+
+        seen = []
+        url = f'/api/search_profiles/{sp.id}/matches/?page_size=2'
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in resp.data['results'])
+            url = resp.data['next']
+            # Un match nuevo con score alto no desplaza las páginas siguientes
+            if len(seen) == 2:
+                Match.objects.create(match_type='property', subject_id=2000, target_user=self.user, score=95.0, metadata={})
+        self.assertEqual(seen, expected)
+
+        resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/?cursor=manipulado')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_matches_cursor_survives_concurrent_rescore(self):
+        from django.utils.timezone import now
+        from matching.models import MatchRefreshState
+        sp = SearchProfile.objects.create(user=self.user)
+        created = [
+            Match.objects.create(match_type='property', subject_id=1000 + i, target_user=self.user, score=90.0 - i, metadata={})
+            for i in range(4)
+        ]
+
+        with mock.patch('matching.tasks.compute_matches_for_profile.delay') as delay:
+            # Perfil vencido: la primera página encola el recálculo y sirve lo almacenado
+            resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/?page_size=2')
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertTrue(resp.data['refresh_enqueued'])
+            delay.assert_called_once_with(sp.id, 'property')
+            first = [item['id'] for item in resp.data['results']]
+
+            # El recálculo termina entre páginas: nuevo scored_at y scores actualizados
+            MatchRefreshState.objects.create(profile=sp, match_type='property', scored_at=now(), full_rescore_at=now())
+            Match.objects.filter(pk=created[3].pk).update(score=88.5)
+            resp = self.client.get(resp.data['next'])
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        second = [item['id'] for item in resp.data['results']]
+        self.assertEqual(first, [created[0].id, created[1].id])
+        self.assertEqual(second, [created[3].id, created[2].id])
+        self.assertIsNone(resp.data['next'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_matches_served_stale_and_refresh_enqueued_once(self):
+        sp = SearchProfile.objects.create(user=self.user)
+        Match.objects.create(match_type='property', subject_id=3000, target_user=self.user, score=75.0, metadata={})
+
+        with mock.patch('matching.tasks.compute_matches_for_profile.delay') as delay:
+            resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/')
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            # Se sirven los matches almacenados sin esperar el recálculo
+            self.assertEqual(len(resp.data['results']), 1)
+            self.assertTrue(resp.data['is_stale'])
+            self.assertIsNone(resp.data['computed_at'])
+            self.assertTrue(resp.data['refresh_enqueued'])
+            self.assertEqual(resp.data['candidates_rescored'], 0)
+
+            # Mientras el recálculo está en curso el lock evita encolarlo de nuevo
+            resp = self.client.get(f'/api/search_profiles/{sp.id}/matches/')
+            self.assertTrue(resp.data['is_stale'])
+            self.assertFalse(resp.data['refresh_enqueued'])
+            delay.assert_called_once_with(sp.id, 'property')
+
+    @override_settings(MATCH_PROFILING=True, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_match_profiling_staff_only(self):
+        sp = SearchProfile.objects.create(user=self.user)
+        resp = self.client.get('/api/match_profiling/')
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.get(f'/api/search_profiles/{sp.id}/matches/?refresh=sync')
+        self.user.is_staff = True
+        self.user.save()
+        resp = self.client.get('/api/match_profiling/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.data['enabled'])
+        self.assertEqual(resp.data['phases']['refresh.property']['calls'], 1)
+        self.assertIn('property', resp.data['candidates'])
+
+        resp = self.client.get('/api/match_profiling/metrics/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn('habitto_match_phase_seconds_total{phase="refresh.property"}', resp.content.decode())
+
+    @mock.patch('matching.tasks.compute_matches_for_profile.delay')
+    def test_property_list_scores_from_stored_matches(self, delay):
+        SearchProfile.objects.create(user=self.user, location=Point(-63.1821, -17.7834), budget_min=Decimal('400.00'), budget_max=Decimal('800.00'))
+        owner_user = User.objects.create_user(username='owner_list', email='owner_list@example.com', password='ownerpass123')
+        props = [
+            Property.objects.create(owner=owner_user, type='departamento', address=f'Lista {i}', location=Point(-63.1821 + i * 0.01, -17.7834),
+                                    price=Decimal('600.00'), description='Y', bedrooms=1, bathrooms=1)
+            for i in range(4)
+        ]
+        url = reverse('property-list')
+
+        # Primera consulta: los pares se puntúan por lotes y se guardan en Match
+        resp = self.client.get(url, {'order_by_match': 'true'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(Match.objects.filter(match_type='property', target_user=self.user).count(), len(props))
+
+        # Una petición repetida no vuelve a puntuar
+        with mock.patch('utils.matching.score_properties_for_profile') as scorer:
+            resp = self.client.get(url, {'order_by_match': 'true'})
+        self.assertEqual(scorer.call_count, 0)
+        self.assertEqual(len(resp.data['results']), len(props))
+
+        # El score del Match guardado se reutiliza sin puntuar
+        Match.objects.filter(subject_id=props[0].id, target_user=self.user).update(score=99.0)
+        with mock.patch('utils.matching.score_properties_for_profile') as scorer:
+            resp = self.client.get(url, {'order_by_match': 'true'})
+        self.assertEqual(scorer.call_count, 0)
+        self.assertEqual(resp.data['results'][0]['id'], props[0].id)
+        self.assertEqual(resp.data['results'][0]['_match_score'], 99.0)
+
+        # Una propiedad modificada después del cálculo se vuelve a puntuar y se escribe de vuelta
+        props[0].description = 'Departamento actualizado'
+        props[0].save()
+        resp = self.client.get(url, {'order_by_match': 'true', 'match_score': 0})
+        scores = {item['id']: item['_match_score'] for item in resp.data['results']}
+        self.assertNotEqual(scores[props[0].id], 99.0)
+        self.assertEqual(Match.objects.get(subject_id=props[0].id, target_user=self.user).score, scores[props[0].id])
+
+    @mock.patch('matching.tasks.compute_matches_for_profile.delay')
+    def test_property_list_filters_by_match_before_paginating(self, delay):
+        SearchProfile.objects.create(user=self.user, location=Point(-63.1821, -17.7834), budget_min=Decimal('400.00'), budget_max=Decimal('800.00'))
+        owner_user = User.objects.create_user(username='owner_page', email='owner_page@example.com', password='ownerpass123')
+        props = [
+            Property.objects.create(owner=owner_user, type='departamento', address=f'Pagina {i}', location=Point(-63.1821 + i * 0.01, -17.7834),
+                                    price=Decimal('600.00'), description='Y', bedrooms=1, bathrooms=1)
+            for i in range(4)
+        ]
+        url = reverse('property-list')
+        self.client.get(url, {'order_by_match': 'true'})
+        for prop, score in zip(props, (10.0, 90.0, 20.0, 80.0)):
+            Match.objects.filter(subject_id=prop.id, target_user=self.user).update(score=score)
+
+        # count cuenta solo las propiedades que cumplen el umbral y la página se llena con ellas
+        resp = self.client.get(url, {'match_score': 50, 'order_by_match': 'true', 'page_size': 1})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['count'], 2)
+        self.assertEqual([item['id'] for item in resp.data['results']], [props[1].id])
+        self.assertIsNotNone(resp.data['next'])
+        resp = self.client.get(resp.data['next'])
+        self.assertEqual([item['_match_score'] for item in resp.data['results']], [80.0])
+        self.assertIsNone(resp.data['next'])
+
+    def test_property_list_scores_only_the_page(self):
+        profile = SearchProfile.objects.create(user=self.user, location=Point(-63.1821, -17.7834), budget_min=Decimal('400.00'), budget_max=Decimal('800.00'))
+        owner_user = User.objects.create_user(username='owner_bound', email='owner_bound@example.com', password='ownerpass123')
+        for i in range(5):
+            Property.objects.create(owner=owner_user, type='departamento', address=f'Cota {i}', location=Point(-63.1821 + i * 0.01, -17.7834),
+                                    price=Decimal('600.00'), description='Y', bedrooms=1, bathrooms=1)
+        url = reverse('property-list')
+
+        # Sin Match guardados: se encola el recálculo del perfil y solo se puntúan las filas de la página
+        with mock.patch('matching.tasks.compute_matches_for_profile.delay') as delay, \
+                mock.patch('utils.matching.score_properties_for_profile', wraps=score_properties_for_profile) as scorer:
+            resp = self.client.get(url, {'order_by_match': 'true', 'page_size': 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        delay.assert_called_once_with(profile.id, 'property')
+        self.assertEqual(resp.data['count'], 5)
+        self.assertEqual(scorer.call_count, 1)
+        page_ids = {item['id'] for item in resp.data['results']}
+        self.assertEqual(set(scorer.call_args[0][1].values_list('id', flat=True)), page_ids)
+        self.assertEqual(len(page_ids), 2)
+        self.assertTrue(all('_match_score' in item for item in resp.data['results']))
+        self.assertEqual(set(Match.objects.filter(match_type='property', target_user=self.user).values_list('subject_id', flat=True)), page_ids)
@@ -0,0 +1,67 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.utils.timezone import now
+from matching.factories import make_property, make_user, make_profile, make_zone
+from matching.models import Match
+from matching.tasks import compute_all_agent_matches
+from property.models import Property
+from user.models import UserProfile
+from utils.agent_roster import AgentRoster, get_agent_roster
+from utils.bitsets import mask_ids
+from utils.matching import calculate_agent_match_score
+
+
+class AgentRosterTests(TestCase):
+    """
+    Tests del roster de agentes: mismos scores que calculate_agent_match_score
+    con las zonas de las propiedades gestionadas.
+    """
+
+    def setUp(self):
+        self.zones = [make_zone(f'Zona Agente {i}') for i in range(3)]
+        self.agents = []
+        for i, commission in enumerate([Decimal('1.50'), Decimal('12.00'), Decimal('0')]):
+            agent = make_user(f'agent_roster_{i}')
+            UserProfile.objects.create(user=agent, user_type='agente', agent_commission_rate=commission)
+            self.agents.append(agent)
+        owner = make_user('owner_roster')
+        for agent, zone in [(self.agents[0], self.zones[0]), (self.agents[0], self.zones[1]), (self.agents[1], self.zones[2])]:
+            make_property(
+                owner, f'Agente {zone.id}', agent=agent, zone=zone, type='casa', location=None,
+                price=Decimal('500.00'), description='Casa',
+            )
+        self.profile = make_profile('tenant_roster')
+        self.profile.preferred_zones.set(self.zones[:2])
+        self.no_zones = make_profile('tenant_roster_2')
+
+    def test_roster_scores_match_scalar_scores(self):
+        roster = AgentRoster.build()
+        for profile in (self.profile, self.no_zones):
+            results = {agent_id: (score, meta) for agent_id, score, meta in roster.score(profile.preferred_zones.values_list('id', flat=True))}
+            self.assertEqual(set(results), {a.id for a in self.agents})
+            for agent in self.agents:
+                self.assertEqual(results[agent.id], calculate_agent_match_score(profile, agent))
+        self.assertEqual(results[self.agents[0].id][1]['details']['zones_overlap'], 50)
+
+    def test_roster_is_invalidated_when_managed_property_changes(self):
+        Property.objects.filter(agent=self.agents[1]).first().delete()
+        roster = get_agent_roster()
+        row = roster.user_ids.tolist().index(self.agents[1].id)
+        self.assertEqual(mask_ids(roster.zone_masks[row]), [])
+
+    def test_managed_zone_change_bumps_agent_watermark(self):
+        since = now()
+        self.assertEqual(get_agent_roster().score([self.zones[0].id], since=since), [])
+        prop = Property.objects.get(agent=self.agents[1])
+        prop.zone = self.zones[0]
+        prop.save()
+        # El cambio de zona gestionada vuelve a puntuar al agente en el recálculo incremental
+        results = get_agent_roster().score([self.zones[0].id], since=since)
+        self.assertEqual([agent_id for agent_id, _, _ in results], [self.agents[1].id])
+        self.assertEqual(results[0][2]['details']['zones_overlap'], 100.0)
+
+    def test_sweep_refreshes_agent_matches_for_all_profiles(self):
+        with self.settings(MATCH_MIN_SCORE=0):
+            result = compute_all_agent_matches()
+        self.assertEqual(result['matches'], 6)
+        self.assertEqual(Match.objects.filter(match_type='agent', target_user=self.profile.user).count(), 3)
@@ -0,0 +1,80 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from matching.factories import ScoringFixtureMixin, make_property
+from matching.models import SearchProfile
+from property.models import Property
+from utils.matching import MatchWriter, calculate_property_match_score
+from utils.batch_matching import score_properties_for_profile, score_profiles_for_property, ScoringStats
+from utils.spatial import nearby_properties
+
+
+class BatchMatchingTests(ScoringFixtureMixin, TestCase):
+    """
+    Tests del motor de matching por lotes: debe producir exactamente los mismos
+    scores y detalles que calculate_property_match_score.
+    """
+
+    def test_batch_scores_match_scalar_scores(self):
+        results = score_properties_for_profile(self.profile, Property.objects.filter(id__in=[p.id for p in self.properties]))
+        self.assertEqual(len(results), len(self.properties))
+        by_id = {p.id: p for p in self.properties}
+        for prop_id, score, meta in results:
+            expected_score, expected_meta = calculate_property_match_score(self.profile, by_id[prop_id])
+            self.assertEqual(score, expected_score)
+            self.assertEqual(meta, expected_meta)
+
+    def test_reverse_batch_scores_match_scalar_scores(self):
+        prop = self.properties[2]
+        results = score_profiles_for_property(prop, SearchProfile.objects.all())
+        self.assertEqual(len(results), 1)
+        profile, score, meta = results[0]
+        expected_score, expected_meta = calculate_property_match_score(self.profile, prop)
+        self.assertEqual(profile.id, self.profile.id)
+        self.assertEqual(score, expected_score)
+        self.assertEqual(meta, expected_meta)
+
+    def test_batch_uses_fixed_number_of_queries(self):
+        # propiedades (con features y distancias de la etapa espacial) y favoritos
+        with self.assertNumQueries(2):
+            score_properties_for_profile(self.profile, nearby_properties(Property.objects.all(), self.profile.location))
+
+    def test_threshold_prunes_unreachable_candidates(self):
+        far = make_property(
+            self.owner, 'Calle Lejana', type='casa', location=Point(-68.1, -16.5), price=Decimal('9000.00'),
+            description='Lejos', allows_roommates=True, children_allowed=False, pets_allowed=False,
+        )
+        stats = ScoringStats()
+        results = score_properties_for_profile(self.profile, Property.objects.all(), threshold=60, stats=stats)
+        self.assertNotIn(far.id, [prop_id for prop_id, _, _ in results])
+        self.assertEqual(stats.candidates, len(self.properties) + 1)
+        self.assertGreaterEqual(stats.pruned, 1)
+        self.assertEqual(stats.pruned + stats.fully_scored, stats.candidates)
+        # Las propiedades no podadas conservan exactamente el score escalar
+        full = {prop_id: score for prop_id, score, _ in score_properties_for_profile(self.profile, Property.objects.all())}
+        for prop_id, score, _ in results:
+            self.assertEqual(score, full[prop_id])
+        self.assertLess(full[far.id], 60)
+
+    def test_top_k_floor_prunes_without_threshold(self):
+        stats = ScoringStats()
+        # Un piso inalcanzable tras el primer lote poda el resto sin puntuarlo
+        results = score_properties_for_profile(
+            self.profile, Property.objects.all(), threshold=0, stats=stats, floor=lambda chunk: 101.0, chunk_size=1,
+        )
+        self.assertEqual(len(results), 1)
+        self.assertEqual(stats.pruned, len(self.properties) - 1)
+        self.assertEqual(sorted(stats.pruned_ids + [results[0][0]]), sorted(p.id for p in self.properties))
+
+        # Con el piso del top-K de MatchWriter se conserva el mismo mejor candidato
+        full = {prop_id: score for prop_id, score, _ in score_properties_for_profile(self.profile, Property.objects.all())}
+        writer = MatchWriter(threshold=0, top_k=1)
+
+        def top_k_floor(chunk):
+            for prop_id, score, meta in chunk:
+                writer.add('property', prop_id, self.tenant, score, meta)
+            return writer.floor('property', self.tenant)
+
+        score_properties_for_profile(self.profile, Property.objects.all(), threshold=0, floor=top_k_floor, chunk_size=1)
+        self.assertEqual(len(writer), 1)
+        self.assertEqual(writer.floor('property', self.tenant), max(full.values()))
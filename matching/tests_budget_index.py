@@ -0,0 +1,32 @@
+from django.test import TestCase
+from matching.factories import make_roommate_seekers
+from matching.models import SearchProfile
+from utils.budget_index import BudgetIntervalIndex, budget_overlap_filter
+
+
+class BudgetIndexTests(TestCase):
+    """
+    Tests del índice de intervalos de presupuesto y de su equivalente en SQL.
+    """
+
+    def setUp(self):
+        _, self.profiles = make_roommate_seekers()
+        self.index = BudgetIntervalIndex.for_profiles(SearchProfile.objects.all())
+
+    def ids(self, positions):
+        return set(self.index.ids[positions].tolist())
+
+    def test_budget_index_returns_overlapping_and_near_intervals(self):
+        a, b, c, d, e = self.profiles
+        self.assertEqual(self.ids(self.index.overlapping(750, 1000)), {a.id, b.id})
+        # [400, 800] no se solapa con [1500, 2000]; su budget_min está a 100 de 1400
+        self.assertEqual(self.ids(self.index.near_misses(1000, 1400, 100)), {c.id})
+        self.assertEqual(self.ids(self.index.overlapping(900, 900)), set())
+
+    def test_budget_overlap_filter_matches_index(self):
+        for lo, hi, radius in [(750, 1000, 0), (1000, 1400, 100), (900, 900, 0), (900, 900, 200)]:
+            expected = self.ids(self.index.overlapping(lo, hi))
+            if radius:
+                expected |= self.ids(self.index.near_misses(lo, hi, radius))
+            found = set(SearchProfile.objects.filter(budget_overlap_filter(lo, hi, radius)).values_list('id', flat=True))
+            self.assertEqual(found, expected)
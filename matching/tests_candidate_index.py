@@ -0,0 +1,48 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from matching.factories import make_property, make_user, make_profile
+from matching.models import Match
+from matching.tasks import compute_reverse_matches_for_property
+from utils.candidate_index import ProfileCandidateIndex
+from utils.matching import calculate_property_match_score
+
+
+class ProfileCandidateIndexTests(TestCase):
+    """
+    Tests del índice invertido de perfiles usado en el matching inverso.
+    """
+
+    def setUp(self):
+        self.owner = make_user('owner_index')
+        self.near = make_profile(
+            'near_index', location=Point(-63.1821, -17.7834), budget_min=Decimal('400.00'), budget_max=Decimal('800.00'),
+        )
+        self.far = make_profile(
+            'far_index', location=Point(-68.1, -16.5), budget_min=Decimal('100.00'), budget_max=Decimal('200.00'),
+        )
+        self.prop = make_property(self.owner, 'Index 1', description='Depto')
+
+    def test_candidates_exclude_profiles_that_cannot_reach_threshold(self):
+        index = ProfileCandidateIndex.build()
+        candidates = index.candidates_for_property(self.prop, 70)
+        self.assertIn(self.near.id, candidates)
+        self.assertNotIn(self.far.id, candidates)
+        # Con umbral 0 todos los perfiles son candidatos
+        self.assertEqual(set(index.candidates_for_property(self.prop, 0)), {self.near.id, self.far.id})
+
+    def test_upper_bound_is_not_below_actual_score(self):
+        index = ProfileCandidateIndex.build()
+        bounds = dict(
+            (pid, bound) for ids, bound in zip(index.profile_ids, index.upper_bounds(self.prop)) for pid in ids
+        )
+        for profile in (self.near, self.far):
+            score, _ = calculate_property_match_score(profile, self.prop)
+            self.assertLessEqual(score, bounds[profile.id] + 1e-6)
+
+    def test_reverse_matching_task_creates_matches(self):
+        with self.settings(MATCH_MIN_SCORE=70):
+            result = compute_reverse_matches_for_property(self.prop.id)
+        self.assertEqual(result['candidates'], 1)
+        self.assertTrue(Match.objects.filter(match_type='property', subject_id=self.prop.id, target_user=self.near.user).exists())
+        self.assertFalse(Match.objects.filter(match_type='property', subject_id=self.prop.id, target_user=self.far.user).exists())
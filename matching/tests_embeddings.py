@@ -0,0 +1,66 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from matching.factories import make_property, make_user, make_profile
+from property.models import Property
+from utils.batch_matching import score_properties_for_profile
+from utils.embedding_index import ListingEmbeddingIndex, invalidate_listing_index
+from utils.embeddings import embed_fields, pack_embedding, semantic_score, unpack_embedding
+from utils.matching import calculate_property_match_score
+
+
+class SemanticEmbeddingTests(TestCase):
+    """
+    Tests de los embeddings locales y del índice de propiedades similares.
+    """
+
+    def setUp(self):
+        self.owner = make_user('owner_embed')
+        self.addCleanup(invalidate_listing_index)
+
+    def _property(self, description, tags):
+        return make_property(self.owner, 'Calle Embedding', description=description, tags=tags)
+
+    def test_embeddings_are_deterministic_and_semantic(self):
+        quiet = self._property('Departamento tranquilo y luminoso ideal para estudiar', ['tranquilo', 'estudiantes'])
+        also_quiet = self._property('Ambiente tranquilo para estudiantes, muy luminoso', ['tranquilo'])
+        party = self._property('Casa con terraza para fiestas y música', ['fiestas', 'música'])
+
+        vector = unpack_embedding(quiet.semantic_embedding)
+        self.assertIsNotNone(vector)
+        self.assertAlmostEqual(float(vector @ vector), 1.0, places=5)
+        self.assertEqual(pack_embedding(vector), quiet.semantic_embedding)
+        self.assertIsNone(pack_embedding(embed_fields({'description': ''}, {'description': 1.0})))
+        self.assertIsNone(unpack_embedding('hv1:corrupto'))
+
+        also_quiet_vector = unpack_embedding(also_quiet.semantic_embedding)
+        party_vector = unpack_embedding(party.semantic_embedding)
+        self.assertGreater(semantic_score(vector, also_quiet_vector), semantic_score(vector, party_vector))
+
+    def test_semantic_score_is_added_to_scalar_and_batch(self):
+        profile = make_profile(
+            'tenant_embed', location=Point(-63.1821, -17.7834), budget_min=Decimal('400.00'),
+            budget_max=Decimal('800.00'), vibes=['tranquilo', 'estudiantes'], occupation='Estudiante',
+        )
+        self.assertIsNotNone(profile.semantic_embedding)
+        prop = self._property('Departamento tranquilo para estudiantes', ['tranquilo'])
+        score, meta = calculate_property_match_score(profile, prop)
+        self.assertGreater(meta['details']['semantic_score'], 0)
+        [(_, batch_score, batch_meta)] = score_properties_for_profile(profile, Property.objects.filter(id=prop.id))
+        self.assertEqual((batch_score, batch_meta), (score, meta))
+
+    def test_listing_index_refreshes_incrementally(self):
+        quiet = self._property('Departamento tranquilo y luminoso', ['tranquilo'])
+        party = self._property('Casa para fiestas con terraza', ['fiestas'])
+        index = ListingEmbeddingIndex.build()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.refresh(), 0)
+
+        similar = self._property('Monoambiente tranquilo y luminoso', ['tranquilo'])
+        party.is_active = False
+        party.save()
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(sorted(index.ids.tolist()), sorted([quiet.id, similar.id]))
+
+        results = index.search(unpack_embedding(quiet.semantic_embedding), k=5, exclude={quiet.id})
+        self.assertEqual([pid for pid, _ in results], [similar.id])
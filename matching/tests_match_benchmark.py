@@ -0,0 +1,23 @@
+from django.test import TestCase
+from matching.models import PropertyMatchFeatures
+from utils.match_benchmark import run_benchmark, synthesize_dataset
+
+
+class MatchBenchmarkTests(TestCase):
+    """
+    Tests del benchmark: el dataset sintético es puntuable y el reporte trae las métricas por matcher.
+    """
+
+    def test_benchmark_reports_latency_and_throughput(self):
+        dataset = synthesize_dataset(zones=4, properties=30, profiles=40, agents=3, seed=7, batch_size=10)
+        self.assertEqual(len(dataset['property_ids']), 30)
+        self.assertEqual(len(dataset['profile_ids']), 40)
+        self.assertEqual(PropertyMatchFeatures.objects.filter(property_id__in=dataset['property_ids']).count(), 30)
+
+        report = run_benchmark(dataset, samples=3, seed=7)
+        self.assertEqual(set(report), {'property', 'roommate', 'agent', 'reverse'})
+        for row in report.values():
+            self.assertEqual(row['samples'], 3)
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertGreater(row['queries_per_call'], 0)
+        self.assertEqual(report['agent']['candidates'], 9)
@@ -0,0 +1,103 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from amenity.models import Amenity
+from matching.factories import make_property, make_user, make_profile
+from matching.models import PropertyMatchFeatures, VibeTag
+from matching.tasks import refresh_all_nearby_counts
+from property.models import Property
+from review.models import Review
+from utils.batch_matching import score_properties_for_profile
+from utils.bitsets import mask_ids
+from utils.matching import calculate_property_match_score
+
+
+class PropertyMatchFeaturesTests(TestCase):
+    """
+    Tests de la tabla desnormalizada PropertyMatchFeatures y sus señales.
+    """
+
+    def setUp(self):
+        self.owner = make_user('owner_features')
+        self.pool = Amenity.objects.create(name='Piscina')
+        self.prop = make_property(
+            self.owner, 'Features 1', location=Point(-63.18, -17.78), price=Decimal('900.00'), description='Depto',
+            bedrooms=2, max_occupancy=3, tags=[' Tranquilo', 'tranquilo', 'Céntrico '],
+        )
+
+    def test_signals_keep_features_current(self):
+        features = self.prop.match_features
+        self.assertEqual(features.rating_count, 0)
+        self.assertIsNone(features.rating_avg)
+        self.assertEqual(features.tags, ['céntrico', 'tranquilo'])
+        self.assertEqual(features.price_per_person, 300.0)
+        self.assertEqual((features.longitude, features.latitude), (-63.18, -17.78))
+
+        self.prop.amenities.add(self.pool)
+        Review.objects.create(property=self.prop, user=self.owner, rating=4, comment='Bien')
+        review = Review.objects.create(property=self.prop, user=self.owner, rating=2, comment='Regular')
+        features.refresh_from_db()
+        self.assertEqual(mask_ids(features.amenity_mask), [self.pool.id])
+        self.assertEqual((features.rating_avg, features.rating_count), (3.0, 2))
+
+        review.delete()
+        self.prop.amenities.clear()
+        features.refresh_from_db()
+        self.assertEqual((features.rating_avg, features.rating_count), (4.0, 1))
+        self.assertEqual(mask_ids(features.amenity_mask), [])
+
+    def test_profile_and_tag_bitsets(self):
+        profile = make_profile('tenant_bitsets', vibes=['Tranquilo', 'Céntrico '])
+        profile.amenities.add(self.pool)
+        profile.refresh_from_db()
+        self.assertEqual(mask_ids(profile.amenity_mask), [self.pool.id])
+        # Los vibes se comparan sin normalizar, igual que antes con sets
+        vibe_ids = dict(VibeTag.objects.values_list('name', 'id'))
+        self.assertEqual(mask_ids(profile.vibe_mask), sorted([vibe_ids['Tranquilo'], vibe_ids['Céntrico ']]))
+        self.assertEqual(mask_ids(self.prop.match_features.tag_mask), sorted([vibe_ids[' Tranquilo'], vibe_ids['tranquilo'], vibe_ids['Céntrico ']]))
+
+        self.pool.searchprofile_set.clear()
+        profile.refresh_from_db()
+        self.assertEqual(mask_ids(profile.amenity_mask), [])
+
+    def test_missing_features_are_rebuilt_on_read(self):
+        profile = make_profile('tenant_features', location=Point(-63.18, -17.78))
+        PropertyMatchFeatures.objects.filter(property=self.prop).delete()
+        results = score_properties_for_profile(profile, Property.objects.filter(id=self.prop.id))
+        self.assertEqual(results[0][1:], calculate_property_match_score(profile, self.prop))
+        self.assertTrue(PropertyMatchFeatures.objects.filter(property=self.prop).exists())
+
+    def test_deleting_property_removes_features(self):
+        Review.objects.create(property=self.prop, user=self.owner, rating=5, comment='Excelente')
+        self.prop.delete()
+        self.assertFalse(PropertyMatchFeatures.objects.exists())
+
+    def test_nearby_counts_follow_neighbours(self):
+        def counts():
+            return dict(PropertyMatchFeatures.objects.values_list('property_id', 'nearby_count'))
+
+        near = make_property(
+            self.owner, 'Features 2', type='casa', location=Point(-63.185, -17.78), price=Decimal('700.00'), description='Casa',
+        )
+        self.assertEqual(counts(), {self.prop.id: 1, near.id: 1})
+        self.assertEqual(counts()[self.prop.id], self.prop.get_nearby_properties().count())
+
+        # Mover la vecina lejos descuenta a la propiedad de su ubicación anterior
+        near.location = Point(-68.1, -16.5)
+        near.save()
+        self.assertEqual(counts(), {self.prop.id: 0, near.id: 0})
+
+        near.location = Point(-63.181, -17.781)
+        near.save()
+        self.prop.is_active = False
+        self.prop.save()
+        self.assertEqual(counts(), {self.prop.id: 1, near.id: 0})
+
+        self.prop.delete()
+        self.assertEqual(counts(), {near.id: 0})
+
+        # La pasada periódica corrige cambios hechos sin señales
+        Property.objects.filter(id=near.id).update(location=Point(-63.18, -17.78, srid=4326))
+        PropertyMatchFeatures.objects.update(nearby_count=None)
+        self.assertEqual(refresh_all_nearby_counts()['properties'], 1)
+        self.assertEqual(counts(), {near.id: 0})
@@ -0,0 +1,36 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from matching.factories import make_property, make_user, make_profile
+from property.models import Property
+from utils.batch_matching import score_properties_for_profile
+from utils.match_profiling import profiling
+from utils.matching import calculate_property_match_score
+
+
+class MatchProfilingTests(TestCase):
+    """
+    Tests de la instrumentación: registra fases y sub-scores sin alterar los scores.
+    """
+
+    def setUp(self):
+        owner = make_user('owner_profiling')
+        self.profile = make_profile(
+            'tenant_profiling', location=Point(-63.1821, -17.7834), budget_min=Decimal('400.00'), budget_max=Decimal('800.00'),
+        )
+        self.prop = make_property(owner, 'Calle Profiling')
+
+    def test_profiler_records_components_and_phases(self):
+        expected = calculate_property_match_score(self.profile, self.prop)
+        with profiling(publish=False) as profiler:
+            self.assertEqual(calculate_property_match_score(self.profile, self.prop), expected)
+            score_properties_for_profile(self.profile, Property.objects.filter(id=self.prop.id), threshold=0)
+        summary = profiler.as_dict()['phases']
+        for component in ('location', 'price', 'amenities', 'roommate', 'reputation', 'freshness', 'family',
+                          'owner_prefs', 'engagement'):
+            self.assertEqual(summary[f'component.{component}']['calls'], 1)
+        # La distancia y la reputación se consultan a la base de datos
+        self.assertGreaterEqual(summary['component.location']['queries'], 1)
+        self.assertIn('batch.score', summary)
+        self.assertIn('batch.features', summary)
+
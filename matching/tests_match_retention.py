@@ -0,0 +1,50 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from django.test import TestCase
+from django.utils.timezone import now
+from matching.factories import make_user
+from matching.models import ArchivedMatch, Match, MatchFeedback
+from utils.match_retention import prune_expired_matches
+
+
+class MatchRetentionTests(TestCase):
+    """
+    Tests de la política de retención: solo se archivan matches vencidos sin feedback.
+    """
+
+    def setUp(self):
+        self.tenant = make_user('tenant_retention')
+        old = now() - timedelta(days=60)
+        self.stale = Match.objects.create(match_type='property', subject_id=1, target_user=self.tenant, score=40.0, metadata={'details': {}})
+        self.fresh = Match.objects.create(match_type='property', subject_id=2, target_user=self.tenant, score=40.0, metadata={})
+        self.accepted = Match.objects.create(match_type='property', subject_id=3, target_user=self.tenant, score=90.0,
+                                             metadata={}, status='accepted')
+        self.rejected = Match.objects.create(match_type='property', subject_id=4, target_user=self.tenant, score=20.0,
+                                             metadata={}, status='rejected')
+        MatchFeedback.objects.create(match=self.rejected, user=self.tenant, feedback_type='dislike')
+        Match.objects.filter(id__in=[self.stale.id, self.accepted.id, self.rejected.id]).update(updated_at=old)
+
+    def test_archive_moves_only_expired_matches_without_feedback(self):
+        dry = prune_expired_matches(pending_days=30, rejected_days=7, dry_run=True)
+        self.assertEqual(dry['rows'], 1)
+        self.assertTrue(Match.objects.filter(id=self.stale.id).exists())
+
+        report = prune_expired_matches(pending_days=30, rejected_days=7, batch_size=1)
+        self.assertEqual(report['rows'], 1)
+        self.assertGreater(report['bytes_reclaimed'], 0)
+        self.assertEqual(set(Match.objects.values_list('id', flat=True)), {self.fresh.id, self.accepted.id, self.rejected.id})
+        archived = ArchivedMatch.objects.get()
+        self.assertEqual((archived.original_id, archived.subject_id, archived.target_user_id), (self.stale.id, 1, self.tenant.id))
+
+    def test_export_writes_compressed_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'matches.jsonl.gz')
+            report = prune_expired_matches(mode='export', pending_days=30, export_path=path)
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual(report['rows'], 1)
+        self.assertEqual([row['id'] for row in rows], [self.stale.id])
+        self.assertEqual(rows[0]['metadata'], {'details': {}})
@@ -0,0 +1,71 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from matching.factories import make_property, make_user
+from matching.models import Match, MatchFeedback, SearchProfile
+from property.models import Property
+from utils.batch_matching import score_properties_for_profile
+from utils.match_weights import (
+    WEIGHT_KEYS, activate_weight_set, get_property_weights, invalidate_match_weights, save_weight_set,
+    training_data, tune_property_weights,
+)
+from utils.matching import calculate_property_match_score
+
+
+class MatchWeightTuningTests(TestCase):
+    """
+    Tests del ajuste offline de pesos: etiquetas desde estado/feedback y pesos
+    versionados que usan ambos scorers por igual.
+    """
+
+    def setUp(self):
+        self.tenant = make_user('tenant_weights')
+        self.owner = make_user('owner_weights')
+        self.addCleanup(invalidate_match_weights)
+
+    def _match(self, subject_id, location, price, status='pending'):
+        details = {
+            'location_score': location, 'price_score': price, 'amenities_score': 100, 'roommate_score': 100,
+            'reputation_score': 80, 'freshness_score': 100, 'family_score': 100, 'owner_prefs_score': 100,
+            'engagement_boost': 0,
+        }
+        return Match.objects.create(match_type='property', subject_id=subject_id, target_user=self.tenant,
+                                    score=50.0, metadata={'details': details}, status=status)
+
+    def test_labels_and_tuned_weights(self):
+        # Los usuarios aceptan las propiedades cercanas sin importar el precio
+        for i in range(40):
+            location = 90 if i % 2 else 10
+            self._match(i, location, (i * 37) % 100, status='accepted' if i % 2 else 'rejected')
+        liked = self._match(100, 95, 20)
+        MatchFeedback.objects.create(match=liked, user=self.tenant, feedback_type='like')
+        self._match(101, 95, 20)  # pendiente sin feedback: sin etiqueta
+
+        X, y, ids = training_data()
+        self.assertEqual(len(y), 41)
+        self.assertEqual(y[list(ids).index(liked.id)], 1)
+
+        result = tune_property_weights(min_samples=20, holdout=0)
+        weights = result['weights']
+        self.assertEqual(set(weights), set(WEIGHT_KEYS))
+        self.assertAlmostEqual(sum(weights.values()), 1.0, places=3)
+        self.assertEqual(max(weights, key=weights.get), 'location')
+
+    def test_active_weight_set_used_by_scalar_and_batch(self):
+        profile = SearchProfile.objects.create(user=self.tenant, location=Point(-63.1821, -17.7834),
+                                               budget_min=Decimal('400.00'), budget_max=Decimal('800.00'))
+        prop = make_property(self.owner, 'Calle Pesos', price=Decimal('1500.00'))
+        default_score, _ = calculate_property_match_score(profile, prop)
+
+        weights = {'location': 0.0, 'price': 1.0, 'amenities': 0.0, 'roommate': 0.0, 'reputation': 0.0,
+                   'freshness': 0.0, 'family': 0.0, 'owner_prefs': 0.0}
+        save_weight_set(weights, activate=True)
+        self.assertEqual(get_property_weights(), weights)
+        score, meta = calculate_property_match_score(profile, prop)
+        self.assertNotEqual(score, default_score)
+        self.assertEqual(score, round(meta['details']['price_score'], 2))
+        [(_, batch_score, batch_meta)] = score_properties_for_profile(profile, Property.objects.filter(id=prop.id))
+        self.assertEqual((batch_score, batch_meta), (score, meta))
+
+        activate_weight_set(None)
+        self.assertEqual(calculate_property_match_score(profile, prop)[0], default_score)
@@ -0,0 +1,91 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.gis.geos import Point
+from matching.factories import ScoringFixtureMixin, make_property, make_user, make_zone
+from matching.models import Match
+from utils.matching import MatchWriter, calculate_property_match_score, property_scores_for_profile
+
+
+class MatchWriterTests(TestCase):
+    """
+    Tests del escritor de matches por lotes (upsert + actividad de zona agregada).
+    """
+
+    def setUp(self):
+        self.owner = make_user('owner_writer')
+        self.tenant = make_user('tenant_writer')
+        self.zone = make_zone('Zona Writer')
+        self.props = [self._property(f'Writer {i}') for i in range(2)]
+
+    def _property(self, address):
+        return make_property(
+            self.owner, address, type='casa', location=Point(-63.15, -17.75), zone=self.zone,
+            price=Decimal('500.00'), description='Casa', bedrooms=2,
+        )
+
+    def test_flush_upserts_and_aggregates_zone_activity(self):
+        Match.objects.create(match_type='property', subject_id=self.props[0].id, target_user=self.tenant,
+                             score=10.0, metadata={}, status='accepted')
+
+        writer = MatchWriter(threshold=0)
+        writer.add('property', self.props[0].id, self.tenant, 80.0, {'details': {}})
+        writer.add('property', self.props[1].id, self.tenant, 60.0, {'details': {}})
+        self.assertEqual(writer.flush(), 2)
+
+        updated = Match.objects.get(match_type='property', subject_id=self.props[0].id, target_user=self.tenant)
+        self.assertEqual(updated.score, 80.0)
+        self.assertEqual(updated.status, 'accepted')
+        self.assertEqual(Match.objects.filter(target_user=self.tenant).count(), 2)
+        self.zone.refresh_from_db()
+        self.assertAlmostEqual(self.zone.match_activity_score, 1.4)
+
+    def test_top_k_keeps_best_candidates_and_prunes_stale_rows(self):
+        extra = [self._property(f'Writer extra {i}') for i in range(2)]
+        stale = Match.objects.create(match_type='property', subject_id=extra[0].id, target_user=self.tenant, score=10.0, metadata={})
+        accepted = Match.objects.create(match_type='property', subject_id=extra[1].id, target_user=self.tenant,
+                                        score=5.0, metadata={}, status='accepted')
+
+        writer = MatchWriter(threshold=0, top_k=2)
+        self.assertTrue(writer.add('property', self.props[0].id, self.tenant, 80.0, {}))
+        self.assertTrue(writer.add('property', self.props[1].id, self.tenant, 90.0, {}))
+        # El tercero queda fuera del heap de 2; re-puntuar un candidato reemplaza su entrada
+        self.assertFalse(writer.add('property', extra[0].id, self.tenant, 60.0, {}))
+        self.assertTrue(writer.add('property', self.props[0].id, self.tenant, 85.0, {}))
+        self.assertEqual(writer.flush(), 2)
+
+        pending = dict(Match.objects.filter(target_user=self.tenant, status='pending').values_list('subject_id', 'score'))
+        self.assertEqual(pending, {self.props[0].id: 85.0, self.props[1].id: 90.0})
+        self.assertFalse(Match.objects.filter(id=stale.id).exists())
+        self.assertTrue(Match.objects.filter(id=accepted.id).exists())
+
+    def test_add_skips_scores_below_threshold(self):
+        writer = MatchWriter(threshold=70)
+        self.assertFalse(writer.add('property', self.props[0].id, self.tenant, 50.0, {}))
+        self.assertEqual(writer.flush(), 0)
+
+
+class PropertyScoresTests(ScoringFixtureMixin, TestCase):
+    """
+    Tests de los scores del listado: se leen de los Match vigentes y solo se
+    puntúan los pares que faltan.
+    """
+
+    def test_property_scores_reuse_stored_matches(self):
+        ids = [p.id for p in self.properties]
+        with CaptureQueriesContext(connection) as one_missing:
+            property_scores_for_profile(self.profile, ids[:1])
+        Match.objects.all().delete()
+        with CaptureQueriesContext(connection) as all_missing:
+            scores = property_scores_for_profile(self.profile, ids)
+        # El número de consultas no depende de cuántos pares faltan
+        self.assertEqual(len(one_missing), len(all_missing))
+        for prop in self.properties:
+            self.assertEqual(scores[prop.id], calculate_property_match_score(self.profile, prop)[0])
+        # Los scores se escriben de vuelta en Match
+        stored = dict(Match.objects.filter(match_type='property', target_user=self.tenant).values_list('subject_id', 'score'))
+        self.assertEqual(stored, scores)
+        # Con todos los Match vigentes basta una consulta
+        with self.assertNumQueries(1):
+            self.assertEqual(property_scores_for_profile(self.profile, ids), scores)
@@ -141,6 +141,29 @@ class RoomieFunctionalityTests(APITestCase):
         self.assertIn('budget_min', roomie['roomie_seeker_info'])
         self.assertIn('roommate_preference', roomie['roomie_seeker_info'])
 
+    def test_property_list_with_roomies_keyset_pages(self):
+        """El feed combinado se recorre por cursor sin repetir ni saltar elementos."""
+        self.client.force_authenticate(user=self.tenant)
+
+        full = self.client.get('/api/properties/?include_roomies=true&page_size=100')
+        self.assertEqual(full.status_code, status.HTTP_200_OK)
+        self.assertIsNone(full.data['next'])
+        expected = [(item['type'] == 'roomie_seeker', item['id']) for item in full.data['results']]
+        self.assertEqual(len(expected), 4)
+
+        seen = []
+        url = '/api/properties/?include_roomies=true&page_size=1'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 1)
+            seen.extend((item['type'] == 'roomie_seeker', item['id']) for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+        response = self.client.get('/api/properties/?include_roomies=true&cursor=invalido')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_property_list_without_roomies(self):
         """Test que el endpoint de propiedades funcione normalmente sin roomie seekers."""
         self.client.force_authenticate(user=self.tenant)
@@ -223,6 +246,20 @@ class RoomieFunctionalityTests(APITestCase):
             self.assertTrue(roomie['is_roomie_listing'])
             self.assertIn('roomie_seeker_info', roomie)
 
+    def test_available_roomies_budget_filter(self):
+        """Con budget_min/budget_max solo se devuelven roomies con presupuesto solapado."""
+        self.client.force_authenticate(user=self.tenant)
+
+        response = self.client.get('/api/roomie_search/available/?budget_min=700&budget_max=900')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [roomie['id'] for roomie in response.data]
+        self.assertIn(self.tenant.id, ids)
+        self.assertNotIn(self.roomie_seeker.id, ids)
+
+        response = self.client.get('/api/roomie_search/available/?budget_min=700&budget_max=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_all_seekers_endpoint(self):
         """Test del endpoint de todos los roomie seekers."""
         self.client.force_authenticate(user=self.tenant)
@@ -0,0 +1,41 @@
+from django.test import TestCase
+from matching.factories import make_roommate_seekers
+from matching.models import Match, SearchProfile
+from matching.tasks import compute_all_roommate_matches
+from utils.matching import calculate_roommate_match_score
+from utils.roommate_matching import RoommateEngine, RoommateFeatures
+
+
+class RoommateEngineTests(TestCase):
+    """
+    Tests del motor de roomies por lotes: mismos scores que calculate_roommate_match_score
+    y bloqueo de pares que no pueden alcanzar el umbral.
+    """
+
+    def setUp(self):
+        _, self.profiles = make_roommate_seekers()
+
+    def test_batch_scores_match_scalar_scores(self):
+        features = RoommateFeatures(SearchProfile.objects.order_by('id'))
+        engine = RoommateEngine(features)
+        for row, profile in enumerate(SearchProfile.objects.order_by('id')):
+            results = {pid: (score, meta) for pid, _, score, meta in engine.score_profile(features, row, 0)}
+            for other in SearchProfile.objects.exclude(user=profile.user):
+                self.assertEqual(results[other.id], calculate_roommate_match_score(profile, other))
+
+    def test_blocking_skips_pairs_without_shared_zones(self):
+        a, b, c = self.profiles[:3]
+        engine = RoommateEngine(RoommateFeatures(SearchProfile.objects.exclude(user=a.user)))
+        matches = engine.score_profile(RoommateFeatures([a]), 0, 70)
+        self.assertEqual({m[0] for m in matches}, {b.id, self.profiles[4].id})
+        self.assertLess(calculate_roommate_match_score(a, c)[0], 70)
+        # Solo se puntúan los perfiles que comparten zona con ``a``
+        self.assertEqual(engine.pairs_considered, 2)
+
+    def test_nightly_task_matches_seekers_only(self):
+        with self.settings(MATCH_MIN_SCORE=0):
+            result = compute_all_roommate_matches()
+        self.assertEqual(result['profiles'], 4)
+        self.assertEqual(result['matches'], 12)
+        self.assertFalse(Match.objects.filter(match_type='roommate', subject_id=self.profiles[4].id).exists())
+        self.assertFalse(Match.objects.filter(match_type='roommate', target_user=self.profiles[4].user).exists())
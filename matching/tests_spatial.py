@@ -0,0 +1,41 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.gis.geos import Point
+from matching.factories import make_property, make_user, make_profile
+from property.models import Property
+from utils.batch_matching import score_properties_for_profile
+from utils.matching import calculate_property_match_score
+from utils.spatial import nearby_properties
+
+
+class SpatialStageTests(TestCase):
+    """
+    Tests de la etapa espacial: prefiltro ST_DWithin y distancias geodésicas de PostGIS.
+    """
+
+    def setUp(self):
+        owner = make_user('owner_spatial')
+        self.profile = make_profile('tenant_spatial', location=Point(-63.1821, -17.7834, srid=4326))
+        # 0.01 grados de longitud a esta latitud son ~1.06 km; 0.2 grados son ~21 km
+        self.near = make_property(
+            owner, 'Spatial 1', type='casa', location=Point(-63.1721, -17.7834, srid=4326),
+            price=Decimal('500.00'), description='Cerca',
+        )
+        self.far = make_property(
+            owner, 'Spatial 2', type='casa', location=Point(-62.9821, -17.7834, srid=4326),
+            price=Decimal('500.00'), description='Lejos',
+        )
+
+    def test_prefilter_keeps_only_properties_within_radius(self):
+        qs = nearby_properties(Property.objects.all(), self.profile.location, 10)
+        distances = dict(qs.values_list('id', 'match_distance'))
+        self.assertEqual(set(distances), {self.near.id})
+        self.assertAlmostEqual(distances[self.near.id].km, 1.06, places=1)
+
+    def test_location_score_uses_geodesic_distance(self):
+        score, meta = calculate_property_match_score(self.profile, self.near)
+        self.assertAlmostEqual(meta['details']['location_score'], 89.4, delta=0.5)
+        # El scorer usa la distancia anotada por la etapa espacial sin recalcularla
+        qs = nearby_properties(Property.objects.filter(id=self.near.id), self.profile.location, 10)
+        results = score_properties_for_profile(self.profile, qs)
+        self.assertEqual(results[0][1:], (score, meta))
@@ -1,7 +1,8 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import (
-    SearchProfileViewSet, RoommateRequestViewSet, MatchViewSet, MatchFeedbackViewSet, RecommendationViewSet, RoomieSearchViewSet
+    SearchProfileViewSet, RoommateRequestViewSet, MatchViewSet, MatchFeedbackViewSet, RecommendationViewSet, RoomieSearchViewSet,
+    MatchProfilingViewSet
 )
 
 
@@ -12,6 +13,7 @@ router.register(r'matches', MatchViewSet, basename='match')
 router.register(r'match_feedback', MatchFeedbackViewSet, basename='match-feedback')
 router.register(r'recommendations', RecommendationViewSet, basename='recommendation')
 router.register(r'roomie_search', RoomieSearchViewSet, basename='roomie-search')
+router.register(r'match_profiling', MatchProfilingViewSet, basename='match-profiling')
 
 urlpatterns = [
     path('', include(router.urls)),
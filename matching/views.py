@@ -1,20 +1,25 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from django.db.models import F, Q
+from django.http import HttpResponse
 from django.contrib.auth.models import User
-from .models import SearchProfile, RoommateRequest, Match, MatchFeedback
+from .models import SearchProfile, RoommateRequest, Match, MatchFeedback, MatchRefreshState
 from .serializers import (
     SearchProfileSerializer, RoommateRequestSerializer, MatchSerializer, MatchFeedbackSerializer
 )
 from bk_habitto.mixins import MessageConfigMixin
+from .pagination import MatchKeysetPagination
+from utils.batch_matching import ScoringStats
 from utils.matching import (
     calculate_property_match_score, calculate_roommate_match_score, calculate_agent_match_score,
-    create_property_matches_for_profile, create_roommate_matches_for_profile, create_agent_matches_for_profile
+    refresh_matches_for_profile, matches_are_stale, enqueue_stale_refresh
 )
 from property.models import Property
 from property.serializers import RoomieSeekerPropertySerializer
+from utils.budget_index import budget_overlap_filter
+from utils.match_profiling import collected_profile, profiling_enabled, prometheus_text, reset_profile
 
 
 class SearchProfileViewSet(MessageConfigMixin, viewsets.ModelViewSet):
@@ -53,21 +58,38 @@ class SearchProfileViewSet(MessageConfigMixin, viewsets.ModelViewSet):
         match_type = request.query_params.get('type', 'property')
         status_filter = request.query_params.get('status')  # opcional: pending|accepted|rejected
 
-        # Generar matches on-demand si no existen recientes
-        if match_type == 'property':
-            create_property_matches_for_profile(profile)
-        elif match_type == 'roommate':
-            create_roommate_matches_for_profile(profile)
-        elif match_type == 'agent':
-            create_agent_matches_for_profile(profile)
-
-        qs = Match.objects.filter(target_user=profile.user, match_type=match_type).order_by('-score')
+        # Stale-while-revalidate: se sirven los matches almacenados y, si están vencidos, el
+        # recálculo incremental se encola en Celery (un solo recálculo por perfil gracias al lock).
+        # ?refresh=sync recalcula dentro de la solicitud. Las páginas siguientes (con cursor)
+        # no recalculan para no reordenar el recorrido en curso.
+        keyset = 'page' not in request.query_params
+        continuing = keyset and request.query_params.get(MatchKeysetPagination.cursor_query_param)
+        refresh_stats = ScoringStats()
+        refresh_enqueued = False
+        if request.query_params.get('refresh') == 'sync' and not continuing:
+            refresh_stats = refresh_matches_for_profile(profile, match_type)
+        elif not continuing:
+            refresh_enqueued, refresh_stats = enqueue_stale_refresh(profile, match_type)
+        state = MatchRefreshState.objects.filter(profile=profile, match_type=match_type).first()
+        freshness = {
+            'is_stale': matches_are_stale(profile, state),
+            'computed_at': state.scored_at.isoformat() if state else None,
+            'refresh_enqueued': refresh_enqueued,
+        }
+
+        qs = Match.objects.filter(target_user=profile.user, match_type=match_type).order_by('-score', 'id')
         if status_filter in ['pending', 'accepted', 'rejected']:
             qs = qs.filter(status=status_filter)
-        page = self.paginate_queryset(qs)
+        # Paginación por cursor sobre (score, id); ?page=N mantiene la paginación por número de página
+        paginator = MatchKeysetPagination() if keyset else self.paginator
+        page = paginator.paginate_queryset(qs, request, view=self) if paginator is not None else None
         if page is not None:
             serializer = MatchSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            resp = paginator.get_paginated_response(serializer.data)
+            resp.data['candidates_rescored'] = refresh_stats.candidates
+            resp.data['candidates_pruned'] = refresh_stats.pruned
+            resp.data.update(freshness)
+            return resp
         serializer = MatchSerializer(qs, many=True)
         resp = Response(serializer.data)
         self.set_response_message(resp, 'Matches obtenidos exitosamente')
@@ -120,6 +142,8 @@ class RoomieSearchViewSet(MessageConfigMixin, viewsets.ViewSet):
     def available_roomies(self, request):
         """
         Obtener todos los usuarios que buscan roomie y no tienen propiedad asignada.
+        Con ``budget_min``/``budget_max`` solo devuelve los de presupuesto solapado
+        (más los vecinos a ``budget_radius`` o menos del máximo indicado).
         """
         # Obtener usuarios que buscan roomie
         roomie_seekers = SearchProfile.objects.filter(
@@ -130,6 +154,16 @@ class RoomieSearchViewSet(MessageConfigMixin, viewsets.ViewSet):
         roomie_seekers = roomie_seekers.filter(
             roomie_properties__isnull=True
         ).distinct()
+
+        # Primer filtro opcional por presupuesto: ?budget_min=&budget_max=[&budget_radius=]
+        if request.query_params.get('budget_min') and request.query_params.get('budget_max'):
+            try:
+                budget_min = float(request.query_params['budget_min'])
+                budget_max = float(request.query_params['budget_max'])
+                budget_radius = float(request.query_params.get('budget_radius', 0))
+            except ValueError:
+                return Response({'error': 'budget_min, budget_max y budget_radius deben ser numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+            roomie_seekers = roomie_seekers.filter(budget_overlap_filter(budget_min, budget_max, budget_radius))
         
         # Serializar usando el serializer de roomie seekers
         serializer = RoomieSeekerPropertySerializer(roomie_seekers, many=True, context={'request': request})
@@ -454,22 +488,41 @@ class RecommendationViewSet(MessageConfigMixin, viewsets.ViewSet):
         if not profile:
             return Response({'error': 'Debe crear su SearchProfile primero'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Se sirven los matches almacenados; los tipos vencidos se recalculan en Celery
         results = []
-        if rec_type in ['mixed', 'property']:
-            create_property_matches_for_profile(profile)
-            pmatches = Match.objects.filter(target_user=request.user, match_type='property').order_by('-score')[:20]
-            results.extend([{'type': 'property', 'match': MatchSerializer(m).data} for m in pmatches])
-
-        if rec_type in ['mixed', 'roommate']:
-            create_roommate_matches_for_profile(profile)
-            rmatches = Match.objects.filter(target_user=request.user, match_type='roommate').order_by('-score')[:20]
-            results.extend([{'type': 'roommate', 'match': MatchSerializer(m).data} for m in rmatches])
-
-        if rec_type in ['mixed', 'agent']:
-            create_agent_matches_for_profile(profile)
-            amatches = Match.objects.filter(target_user=request.user, match_type='agent').order_by('-score')[:20]
-            results.extend([{'type': 'agent', 'match': MatchSerializer(m).data} for m in amatches])
-
-        resp = Response({'results': results})
+        refresh_enqueued = []
+        for match_type in ('property', 'roommate', 'agent'):
+            if rec_type not in ['mixed', match_type]:
+                continue
+            enqueued, _ = enqueue_stale_refresh(profile, match_type)
+            if enqueued:
+                refresh_enqueued.append(match_type)
+            matches = Match.objects.filter(target_user=request.user, match_type=match_type).order_by('-score')[:20]
+            results.extend([{'type': match_type, 'match': MatchSerializer(m).data} for m in matches])
+
+        resp = Response({'results': results, 'refresh_enqueued': refresh_enqueued})
         self.set_response_message(resp, 'Recomendaciones obtenidas exitosamente')
-        return resp
\ No newline at end of file
+        return resp
+
+
+class MatchProfilingViewSet(viewsets.ViewSet):
+    """
+    Desglose de tiempos del matching (solo staff): tiempo, llamadas y consultas por
+    fase y sub-score, y candidatos por segundo. Se registra con MATCH_PROFILING activo.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def list(self, request):
+        data = collected_profile()
+        data['enabled'] = profiling_enabled()
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def metrics(self, request):
+        # Formato de exposición de texto de Prometheus
+        return HttpResponse(prometheus_text(collected_profile()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        reset_profile()
+        return Response(status=status.HTTP_204_NO_CONTENT)
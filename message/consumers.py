@@ -151,5 +151,9 @@ class InboxConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps(payload))
 
     async def inbox_message(self, event):
+        payload = event.get('payload') or event
+        await self.send(text_data=json.dumps(payload))
+
+    async def matches_updated(self, event):
         payload = event.get('payload') or event
         await self.send(text_data=json.dumps(payload))
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Pipeline del listado de propiedades (``GET /api/properties/``).
+
+Etapas: filtro, recálculo de matches vencidos, ranking, paginación,
+enriquecimiento con el score de match y serialización. Cada etapa se mide como fase ``listing.<etapa>`` del
+profiler de matching (no-op si no hay uno activo) y se omite cuando la petición
+no la necesita: sin ``match_score`` ni ``order_by_match`` el queryset filtrado se
+pagina directamente, como en el listado estándar de DRF.
+
+Con match, el filtro por score y el orden se aplican en SQL sobre los Match
+guardados antes de paginar, así que ``count`` refleja las propiedades que cumplen
+el umbral y solo se lee y serializa la página pedida. Dentro de la solicitud solo
+se puntúan las filas de la página sin Match vigente; si los matches del perfil
+están vencidos, el recálculo del resto del catálogo se encola en Celery
+(``enqueue_stale_refresh``) y aparece en las siguientes peticiones.
+"""
+from typing import Optional
+
+from django.db.models import F
+from rest_framework.response import Response
+
+from matching.models import SearchProfile
+from utils.match_profiling import maybe_profiling, phase
+from utils.matching import enqueue_stale_refresh, match_score_expression, property_scores_for_profile
+
+from .pagination import MergedFeedPagination
+from .serializers import RoomieSeekerPropertySerializer
+
+
+class PropertyListPipeline:
+    """Ejecuta las etapas del listado para una petición de ``PropertyViewSet``."""
+
+    def __init__(self, view, request):
+        self.view = view
+        self.request = request
+        params = request.query_params
+        self.include_roomies = params.get('include_roomies', 'false').lower() == 'true'
+        self.min_score = None
+        self.order_by_match = False
+        if request.user.is_authenticated:
+            try:
+                self.min_score = float(params['match_score']) if params.get('match_score') else None
+            except ValueError:
+                self.min_score = None
+            self.order_by_match = params.get('order_by_match') in ['1', 'true', 'True']
+        self.profile: Optional[SearchProfile] = None
+
+    @property
+    def uses_match(self) -> bool:
+        return self.min_score is not None or self.order_by_match
+
+    def run(self):
+        with maybe_profiling():
+            with phase('listing.filter'):
+                queryset = self.view.filter_queryset(self.view.get_queryset())
+            if self.include_roomies:
+                return self.merged_feed(queryset)
+            if self.uses_match:
+                self.profile = SearchProfile.objects.filter(user=self.request.user).first()
+            if self.profile is None:
+                with phase('listing.paginate'):
+                    page = self.view.paginate_queryset(queryset)
+                if page is None:
+                    return self.respond(queryset, paginated=False)
+                return self.respond(page)
+
+            with phase('listing.refresh'):
+                enqueue_stale_refresh(self.profile, 'property')
+            with phase('listing.rank'):
+                queryset = self.rank(queryset)
+            with phase('listing.paginate'):
+                page = self.view.paginate_queryset(queryset)
+            rows = list(queryset) if page is None else page
+            with phase('listing.enrich'):
+                self.enrich(rows)
+            if page is None:
+                return self.respond(rows, paginated=False, scored=True)
+            return self.respond(page, scored=True)
+
+    def rank(self, queryset):
+        """
+        Anota ``listing_match_score`` desde Match y aplica ``match_score`` y
+        ``order_by_match`` en SQL, así la paginación cuenta y recorta en la base de
+        datos. Los empates conservan el orden del queryset.
+        """
+        queryset = queryset.annotate(listing_match_score=match_score_expression(self.profile))
+        if self.min_score is not None:
+            queryset = queryset.filter(listing_match_score__gte=self.min_score)
+        if self.order_by_match:
+            queryset = queryset.order_by(F('listing_match_score').desc(nulls_last=True), *queryset.query.order_by)
+        return queryset
+
+    def enrich(self, rows):
+        """
+        Completa el score de las filas de la página: ``property_scores_for_profile``
+        lee los Match vigentes y puntúa solo los pares sin Match o desactualizados,
+        así el trabajo síncrono queda acotado al tamaño de página.
+        """
+        scores = property_scores_for_profile(self.profile, [obj.pk for obj in rows])
+        for obj in rows:
+            obj.listing_match_score = scores.get(obj.pk)
+
+    def respond(self, page, paginated: bool = True, scored: bool = False):
+        with phase('listing.serialize'):
+            data = self.view.get_serializer(page, many=True).data
+            if scored:
+                for obj, item in zip(page, data):
+                    if obj.listing_match_score is not None:
+                        item['_match_score'] = obj.listing_match_score
+        if paginated:
+            return self.view.get_paginated_response(data)
+        return Response(data)
+
+    def merged_feed(self, queryset):
+        """
+        Feed combinado de propiedades y buscadores de roomie: merge de k vías por
+        ``created_at`` con paginación por cursor (ver ``MergedFeedPagination``).
+        """
+        roomie_seekers = SearchProfile.objects.filter(
+            roommate_preference__in=['looking', 'open']
+        ).select_related('user').prefetch_related('preferred_zones', 'amenities')
+        paginator = MergedFeedPagination()
+        with phase('listing.paginate'):
+            page = paginator.paginate_sources([queryset, roomie_seekers], self.request)
+        with phase('listing.serialize'):
+            context = self.view.get_serializer_context()
+            sources = (
+                self.view.get_serializer([obj for source, obj in page if source == 0], many=True).data,
+                RoomieSeekerPropertySerializer([obj for source, obj in page if source == 1], many=True, context=context).data,
+            )
+            iterators = [iter(data) for data in sources]
+            data = [next(iterators[source]) for source, _ in page]
+        return paginator.get_paginated_response(data)
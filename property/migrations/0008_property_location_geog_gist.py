@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:30
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0007_property_is_roomie_listing_property_roomie_profile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('location', output_field=django.contrib.gis.db.models.fields.PointField(geography=True)), name='property_location_geog_gist'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models.functions import Cast
 from django.contrib.auth.models import User
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.geos import Point
+from django.contrib.postgres.indexes import GistIndex
 
 
 class Property(models.Model):
@@ -68,6 +70,12 @@ class Property(models.Model):
     students_only = models.BooleanField(default=False)
     stable_job_required = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Índice GiST sobre el cast a geography: prefiltro ST_DWithin en metros (utils.spatial)
+            GistIndex(Cast('location', output_field=gis_models.PointField(geography=True)), name='property_location_geog_gist'),
+        ]
+
     def __str__(self):
         return f'{self.type} en {self.address} - {self.price} BOB'
 
@@ -0,0 +1,106 @@
+import heapq
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PropertyPagination(PageNumberPagination):
+    """Paginación por número de página del listado de propiedades, con ``page_size`` configurable."""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MergedFeedPagination(BasePagination):
+    """
+    Feed combinado de varias fuentes (propiedades y buscadores de roomie) ordenado
+    por (created_at DESC, fuente, id DESC). Cada página lee a lo sumo
+    page_size + 1 filas de cada fuente a partir de la posición del cursor (keyset)
+    y las mezcla con un merge de k vías, así que la memoria y el costo por página
+    no crecen con el catálogo. El cursor es opaco y va firmado.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    signing_salt = 'property.feed_cursor'
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+        self.next_position = None
+        self.request = None
+
+    def encode_cursor(self, created_at: datetime, source: int, obj_id: int) -> str:
+        return signing.dumps([created_at.isoformat(), source, obj_id], salt=self.signing_salt, compress=True)
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            created_at, source, obj_id = signing.loads(raw, salt=self.signing_salt)
+            return datetime.fromisoformat(created_at), int(source), int(obj_id)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValidationError({'cursor': 'Cursor inválido'})
+
+    def get_page_size(self, request) -> int:
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    @staticmethod
+    def _after(queryset, source: int, position):
+        """Filas de la fuente ``source`` posteriores al cursor en el orden del feed."""
+        created_at, cursor_source, cursor_id = position
+        if source < cursor_source:
+            return queryset.filter(created_at__lt=created_at)
+        if source > cursor_source:
+            return queryset.filter(created_at__lte=created_at)
+        return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=cursor_id))
+
+    def paginate_sources(self, querysets, request):
+        """
+        Retorna la página como [(índice de la fuente, objeto), ...] en el orden del feed.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        streams = []
+        for source, queryset in enumerate(querysets):
+            queryset = queryset.order_by('-created_at', '-id')
+            if position is not None:
+                queryset = self._after(queryset, source, position)
+            # Un elemento extra por fuente basta para saber si hay página siguiente
+            streams.append([(source, obj) for obj in queryset[:page_size + 1]])
+        merged = heapq.merge(
+            *streams, key=lambda item: (item[1].created_at, -item[0], item[1].id), reverse=True,
+        )
+        page = [item for _, item in zip(range(page_size + 1), merged)]
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            source, obj = page[-1]
+            self.next_position = (obj.created_at, source, obj.id)
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
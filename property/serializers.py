@@ -1,9 +1,40 @@
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from django.contrib.gis.geos import Point
+from django.db.models import Prefetch
 from .models import Property
+from photo.models import Photo
 from matching.serializers import AmenityFlexibleField, SearchProfileSerializer
-from matching.models import SearchProfile, RoommateRequest
+from matching.models import PropertyMatchFeatures, SearchProfile, RoommateRequest
+from utils.match_features import NEARBY_RADIUS_KM
+
+
+def main_photo_prefetch():
+    """
+    Prefetch de la primera foto (por ``created_at``) de cada propiedad: una sola
+    consulta con ROW_NUMBER para toda la página, sin importar su tamaño.
+    """
+    return Prefetch('photos', queryset=Photo.objects.order_by('created_at', 'id')[:1], to_attr='prefetched_main_photo')
+
+
+def main_photo_url(obj, context):
+    """
+    URL absoluta de la foto principal. Usa ``prefetched_main_photo`` si el QuerySet
+    vino con ``main_photo_prefetch()`` y si no la consulta para esta propiedad.
+    """
+    prefetched = getattr(obj, 'prefetched_main_photo', None)
+    if prefetched is not None:
+        photo = prefetched[0] if prefetched else None
+    else:
+        photo = obj.photos.order_by('created_at', 'id').first()
+    if not photo or not photo.image:
+        return None
+    try:
+        url = photo.image.url
+        request = context.get('request') if context else None
+        return request.build_absolute_uri(url) if request else url
+    except Exception:
+        return None
 
 
 class PropertySerializer(serializers.ModelSerializer):
@@ -23,13 +54,27 @@ class PropertySerializer(serializers.ModelSerializer):
     class Meta:
         model = Property
         fields = '__all__'
-        read_only_fields = ['id', 'location', 'zone', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'location', 'zone', 'created_at', 'updated_at', 'semantic_embedding']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Los listados pueden omitir el conteo de cercanas (?include_nearby_count=false)
+        if not self.context.get('include_nearby_count', True):
+            fields.pop('nearby_properties_count', None)
+        return fields
 
     def get_nearby_properties_count(self, obj):
         """
-        Retorna el número de propiedades cercanas.
+        Retorna el número de propiedades cercanas, precalculado en PropertyMatchFeatures.nearby_count
+        (sin consultas con ``select_related('match_features')``). Si aún no se calculó se cuenta en vivo.
         """
-        return obj.get_nearby_properties().count()
+        try:
+            nearby_count = obj.match_features.nearby_count
+        except PropertyMatchFeatures.DoesNotExist:
+            nearby_count = None
+        if nearby_count is None:
+            return obj.get_nearby_properties(distance_km=NEARBY_RADIUS_KM).count()
+        return nearby_count
 
     def validate(self, data):
         """
@@ -62,15 +107,7 @@ class PropertySerializer(serializers.ModelSerializer):
         """
         Retorna la URL absoluta de la primera foto de la propiedad si existe.
         """
-        photo = obj.photos.order_by('created_at').first()
-        if not photo or not photo.image:
-            return None
-        try:
-            url = photo.image.url
-            request = self.context.get('request') if hasattr(self, 'context') else None
-            return request.build_absolute_uri(url) if request else url
-        except Exception:
-            return None
+        return main_photo_url(obj, self.context)
     
     def get_is_roomie_listing(self, obj):
         """
@@ -239,7 +276,8 @@ class PropertyCreateSerializer(serializers.ModelSerializer):
             'preferred_tenant_gender', 'children_allowed', 'pets_allowed',
             'smokers_allowed', 'students_only', 'stable_job_required'
         ]
-        read_only_fields = ['id', 'owner']
+        # El embedding lo calcula la señal pre_save (utils.embeddings)
+        read_only_fields = ['id', 'owner', 'semantic_embedding']
 
     def validate(self, data):
         """
@@ -305,15 +343,7 @@ class PropertyMapSerializer(serializers.ModelSerializer):
         ]
 
     def get_main_photo(self, obj):
-        photo = obj.photos.order_by('created_at').first()
-        if not photo or not photo.image:
-            return None
-        try:
-            url = photo.image.url
-            request = self.context.get('request') if hasattr(self, 'context') else None
-            return request.build_absolute_uri(url) if request else url
-        except Exception:
-            return None
+        return main_photo_url(obj, self.context)
 
 
 class PropertySearchSerializer(serializers.Serializer):
@@ -2,6 +2,7 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.test import override_settings
 from django.contrib.gis.geos import Point
 from decimal import Decimal
 from .models import Property
@@ -105,6 +106,60 @@ class PropertyAPITestCase(APITestCase):
         property_data = response.data['results'][0]
         self.assertEqual(property_data['latitude'], -17.7834)
         self.assertEqual(property_data['longitude'], -63.1821)
+
+    def test_list_main_photo_constant_queries(self):
+        """Test foto principal prefetcheada: consultas constantes por página"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from photo.models import Photo
+        Photo.objects.create(property=self.property, image='properties/segunda.jpg')
+        Photo.objects.create(property=self.property, image='properties/tercera.jpg')
+        Photo.objects.filter(image='properties/segunda.jpg').update(created_at='2020-01-01T00:00:00Z')
+        url = reverse('property-list')
+
+        with CaptureQueriesContext(connection) as one_property:
+            response = self.client.get(url)
+        self.assertTrue(response.data['results'][0]['main_photo'].endswith('properties/segunda.jpg'))
+
+        for i in range(3):
+            extra = Property.objects.create(
+                owner=self.owner, type='casa', address=f'Calle Foto {i}', location=Point(-63.19 - i * 0.01, -17.79),
+                price=Decimal(1000 + i), description='Casa con foto', bedrooms=2, bathrooms=1
+            )
+            Photo.objects.create(property=extra, image=f'properties/extra_{i}.jpg')
+        with CaptureQueriesContext(connection) as four_properties:
+            response = self.client.get(url, {'ordering': 'price'})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertTrue(response.data['results'][0]['main_photo'].endswith('properties/extra_0.jpg'))
+        self.assertEqual(len(one_property), len(four_properties))
+
+        url = reverse('property-map')
+        with CaptureQueriesContext(connection) as map_queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 4)
+        self.assertLessEqual(len(map_queries), 3)
+
+    def test_list_nearby_count_from_features(self):
+        """Test conteo de cercanas precalculado y omitible en listados"""
+        Property.objects.create(
+            owner=self.owner,
+            type='departamento',
+            address='Calle Vecina 11',
+            location=Point(-63.1825, -17.7838),
+            price=Decimal('900.00'),
+            description='Departamento vecino',
+            bedrooms=1,
+            bathrooms=1
+        )
+        self.client.force_authenticate(user=self.owner)
+        url = reverse('property-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['nearby_properties_count'] for item in response.data['results']], [1, 1])
+
+        response = self.client.get(url, {'include_nearby_count': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('nearby_properties_count', response.data['results'][0])
         
     def test_retrieve_property(self):
         """Test obtener propiedad específica"""
@@ -190,4 +245,64 @@ class PropertyAPITestCase(APITestCase):
         response = self.client.get(url, {'radius': 2})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
-        self.assertEqual(response.data['results'][0]['id'], nearby_property.id)
\ No newline at end of file
+        self.assertEqual(response.data['results'][0]['id'], nearby_property.id)
+
+    def test_similar_properties(self):
+        """Test propiedades similares por embedding semántico"""
+        from utils.embedding_index import invalidate_listing_index
+        self.addCleanup(invalidate_listing_index)
+        invalidate_listing_index()
+        similar = Property.objects.create(
+            owner=self.owner,
+            type='casa',
+            address='Calle Similar 321',
+            location=Point(-63.1900, -17.7900),
+            price=Decimal('1400.00'),
+            description='Casa de prueba con jardín',
+            bedrooms=3,
+            bathrooms=2
+        )
+        Property.objects.create(
+            owner=self.owner,
+            type='habitacion',
+            address='Calle Distinta 654',
+            location=Point(-63.2000, -17.8000),
+            price=Decimal('300.00'),
+            description='Cuarto amoblado para estudiantes',
+            bedrooms=1,
+            bathrooms=1
+        )
+
+        url = reverse('property-similar', kwargs={'pk': self.property.pk})
+        response = self.client.get(url, {'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], similar.id)
+        self.assertGreater(response.data['results'][0]['similarity'], 0)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_vector_tiles(self):
+        """Test vector tiles MVT del mapa con filtros e invalidación al guardar"""
+        # Tile z10 que contiene (-63.1821, -17.7834)
+        url = reverse('property-tiles', kwargs={'z': 10, 'x': 332, 'y': 563})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertGreater(len(response.content), 0)
+
+        # Tile lejano y filtro que excluye la propiedad: tiles vacíos
+        response = self.client.get(reverse('property-tiles', kwargs={'z': 10, 'x': 0, 'y': 0}))
+        self.assertEqual(response.content, b'')
+        response = self.client.get(url, {'price_max': '1000'})
+        self.assertEqual(response.content, b'')
+
+        # Guardar la propiedad invalida los tiles en caché
+        self.property.price = Decimal('900.00')
+        self.property.save()
+        response = self.client.get(url, {'price_max': '1000'})
+        self.assertGreater(len(response.content), 0)
+
+        response = self.client.get(reverse('property-tiles', kwargs={'z': 2, 'x': 4, 'y': 0}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'price_min': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -6,5 +6,7 @@ router = DefaultRouter()
 router.register(r'properties', PropertyViewSet)
 
 urlpatterns = [
+    # Fuera del router: la extensión .mvt no admite la barra final de DefaultRouter
+    path('properties/tiles/<int:z>/<int:x>/<int:y>.mvt', PropertyViewSet.as_view({'get': 'tiles'}), name='property-tiles'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
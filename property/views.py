@@ -8,27 +8,37 @@ from django.contrib.gis.measure import Distance
 from django.contrib.gis.db.models.functions import Distance as DistanceFunction
 from django.db.models import Q, Count, Avg
 from .models import Property, PropertyView, PropertyViewEvent
+from .listing import PropertyListPipeline
+from .pagination import PropertyPagination
 from .serializers import (
     PropertySerializer, PropertyGeoSerializer, PropertyCreateSerializer,
-    PropertyMapSerializer, PropertySearchSerializer, RoomieSeekerPropertySerializer
+    PropertyMapSerializer, PropertySearchSerializer, main_photo_prefetch
 )
 from zone.models import Zone
 from bk_habitto.mixins import MessageConfigMixin
 from matching.models import SearchProfile
-from utils.matching import calculate_property_match_score, create_property_matches_for_profile
-from django.conf import settings
+from utils.matching import calculate_property_match_score
+from utils.embedding_index import get_listing_index
+from utils.embeddings import embed_property, unpack_embedding
+from utils.vector_tiles import get_tile, tile_filters, valid_tile
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
 
 class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar propiedades con funcionalidades GIS y filtros por zona.
     Personaliza la respuesta según el tipo de usuario (inquilino, propietario, agente).
     """
-    queryset = Property.objects.select_related('zone', 'owner').prefetch_related('amenities', 'accepted_payment_methods')
+    # Foto principal prefetcheada: listados, mapa y búsqueda no consultan fotos por fila
+    queryset = Property.objects.select_related('zone', 'owner', 'match_features', 'roomie_profile').prefetch_related(
+        'amenities', 'accepted_payment_methods', main_photo_prefetch()
+    )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['type', 'is_active', 'owner', 'zone', 'bedrooms', 'bathrooms']
     search_fields = ['address', 'description', 'zone__name']
     ordering_fields = ['price', 'created_at', 'size']
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PropertyPagination
     success_messages = {
         'list': 'Propiedades obtenidas exitosamente',
         'retrieve': 'Propiedad obtenida exitosamente',
@@ -48,6 +58,13 @@ class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
             return PropertyGeoSerializer
         return PropertySerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # ?include_nearby_count=false omite nearby_properties_count en la respuesta
+        if self.request is not None:
+            context['include_nearby_count'] = self.request.query_params.get('include_nearby_count', 'true').lower() != 'false'
+        return context
+
     def get_queryset(self):
         """
         Personaliza el queryset según el tipo de usuario:
@@ -80,62 +97,19 @@ class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
         
         return queryset
     
-    def list(self, request, *args, **kwargs):
-        """
-        Override list to include roomie seekers when requested.
-        """
-        include_roomies = request.query_params.get('include_roomies', 'false').lower() == 'true'
-        
-        if include_roomies:
-            # Get regular properties
-            properties = self.filter_queryset(self.get_queryset())
-            
-            # Get roomie seekers
-            roomie_seekers = SearchProfile.objects.filter(
-                roommate_preference__in=['looking', 'open']
-            ).select_related('user').prefetch_related('preferred_zones')
-            
-            # Serialize both
-            properties_serializer = self.get_serializer(properties, many=True)
-            roomie_serializer = RoomieSeekerPropertySerializer(roomie_seekers, many=True, context=self.get_serializer_context())
-            
-            # Combine results
-            combined_data = properties_serializer.data + roomie_serializer.data
-            
-            # Sort by created_at or other criteria (handle mixed types)
-            def get_sort_key(item):
-                created_at = item.get('created_at', '')
-                if created_at:
-                    # Convert to string for consistent comparison
-                    return str(created_at)
-                return ''
-            
-            combined_data.sort(key=get_sort_key, reverse=True)
-            
-            return Response(combined_data)
-        else:
-            return super().list(request, *args, **kwargs)
-
     def perform_create(self, serializer):
         """Asigna el propietario automáticamente al crear una propiedad."""
         prop = serializer.save(owner=self.request.user)
-        # Trigger de matches automáticos con perfiles cercanos
+        # Trigger de matches automáticos: el índice de perfiles filtra candidatos y se puntúa en Celery
+        from matching.tasks import compute_reverse_matches_for_property
         try:
-            # Buscar perfiles con ubicación definida cerca de la propiedad
-            profiles = SearchProfile.objects.all()
-            for profile in profiles[:500]:
-                score, meta = calculate_property_match_score(profile, prop)
-                from matching.models import Match
-                threshold = getattr(settings, 'MATCH_MIN_SCORE', 70)
-                if score >= threshold:
-                    Match.objects.update_or_create(
-                        match_type='property',
-                        subject_id=prop.id,
-                        target_user=profile.user,
-                        defaults={'score': score, 'metadata': meta}
-                    )
+            compute_reverse_matches_for_property.delay(prop.id)
         except Exception:
-            pass
+            # Fallback: ejecutar directamente si Celery/broker no está disponible
+            try:
+                compute_reverse_matches_for_property(prop.id)
+            except Exception:
+                pass
 
     def retrieve(self, request, *args, **kwargs):
         obj = self.get_object()
@@ -152,77 +126,11 @@ class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         """
-        Override list to include roomie seekers when requested, and handle match scoring.
+        Listado por etapas (filtro, candidatos, score de match, ranking, paginación y
+        serialización); ver ``property.listing.PropertyListPipeline``.
         """
-        include_roomies = request.query_params.get('include_roomies', 'false').lower() == 'true'
-        min_score = request.query_params.get('match_score')
-        order_by_match = request.query_params.get('order_by_match') in ['1', 'true', 'True']
-        
-        if min_score and request.user.is_authenticated:
-            try:
-                min_score = float(min_score)
-            except ValueError:
-                min_score = None
-        else:
-            min_score = None
-        
-        if include_roomies:
-            # Get regular properties
-            properties = self.filter_queryset(self.get_queryset())
-            
-            # Get roomie seekers
-            roomie_seekers = SearchProfile.objects.filter(
-                roommate_preference__in=['looking', 'open']
-            ).select_related('user').prefetch_related('preferred_zones')
-            
-            # Serialize both
-            properties_serializer = self.get_serializer(properties, many=True)
-            roomie_serializer = RoomieSeekerPropertySerializer(roomie_seekers, many=True, context=self.get_serializer_context())
-            
-            # Combine results
-            combined_data = properties_serializer.data + roomie_serializer.data
-            
-            # Sort by created_at or other criteria (handle mixed types)
-            def get_sort_key(item):
-                created_at = item.get('created_at', '')
-                if created_at:
-                    # Convert to string for consistent comparison
-                    return str(created_at)
-                return ''
-            
-            combined_data.sort(key=get_sort_key, reverse=True)
-            
-            return Response(combined_data)
-        else:
-            response = super().list(request, *args, **kwargs)
-            if (min_score is not None or order_by_match) and request.user.is_authenticated:
-                profile = SearchProfile.objects.filter(user=request.user).first()
-                if not profile:
-                    return response
-                results = response.data.get('results') if isinstance(response.data, dict) else response.data
-                processed = []
-                # results puede ser lista de dicts de propiedades serializadas
-                from property.models import Property as PropertyModel
-                id_key = 'id'
-                for item in results:
-                    try:
-                        prop_id = item.get(id_key)
-                        prop_obj = PropertyModel.objects.get(id=prop_id)
-                        score, _ = calculate_property_match_score(profile, prop_obj)
-                        item['_match_score'] = score
-                        if (min_score is None) or (score >= min_score):
-                            processed.append(item)
-                    except Exception:
-                        processed.append(item)
-                if order_by_match:
-                    processed.sort(key=lambda x: x.get('_match_score', 0), reverse=True)
-                if isinstance(response.data, dict):
-                    response.data['results'] = processed
-                    response.data['count'] = len(processed)
-                else:
-                    response.data = processed
-            return response
-    
+        return PropertyListPipeline(self, request).run()
+
     @action(detail=True, methods=['post'], url_path='convert-to-roomie')
     def convert_to_roomie_listing(self, request, pk=None):
         """
@@ -347,6 +255,26 @@ class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
             'features': serializer.data
         })
 
+    def tiles(self, request, z, x, y):
+        """
+        Vector tile (Mapbox Vector Tile) de las propiedades activas, sin tope de filas.
+        Ruta: /api/properties/tiles/{z}/{x}/{y}.mvt (ver property/urls.py).
+
+        Parámetros (los mismos del mapa):
+        - zone_id: ID de la zona
+        - price_min, price_max: Rango de precios
+        - type: Tipo de propiedad
+        """
+        if not valid_tile(z, x, y):
+            return Response({'error': 'Tile fuera de rango'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filters = tile_filters(request.query_params)
+        except ValueError:
+            return Response({'error': 'Filtros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        response = HttpResponse(get_tile(z, x, y, filters), content_type='application/vnd.mapbox-vector-tile')
+        patch_cache_control(response, public=True, max_age=60)
+        return response
+
     @action(detail=False, methods=['post'], url_path='search')
     def search(self, request):
         """
@@ -427,7 +355,9 @@ class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
         nearby_properties = property_obj.get_nearby_properties(distance_km=radius)
         
         # Excluir la propiedad actual
-        nearby_properties = nearby_properties.exclude(id=property_obj.id)
+        nearby_properties = nearby_properties.exclude(id=property_obj.id).select_related('zone', 'match_features').prefetch_related(
+            'amenities', main_photo_prefetch()
+        )
         
         serializer = PropertySerializer(nearby_properties[:20], many=True, context={'request': request})
         return Response({
@@ -435,6 +365,35 @@ class PropertyViewSet(MessageConfigMixin, viewsets.ModelViewSet):
             'results': serializer.data
         })
 
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, pk=None):
+        """
+        Propiedades activas más parecidas por embedding semántico (descripción, tipo y tags).
+        """
+        property_obj = self.get_object()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except (TypeError, ValueError):
+            limit = 10
+
+        vector = unpack_embedding(property_obj.semantic_embedding)
+        if vector is None:
+            vector = embed_property(property_obj)
+        neighbours = get_listing_index().search(vector, k=limit, exclude={property_obj.id})
+        similarity = dict(neighbours)
+        found = {p.id: p for p in self.get_queryset().filter(id__in=similarity)}
+        ordered = [found[pid] for pid, _ in neighbours if pid in found]
+
+        serializer = PropertySerializer(ordered, many=True, context={'request': request})
+        results = []
+        for item in serializer.data:
+            item['similarity'] = similarity[item['id']]
+            results.append(item)
+        return Response({
+            'count': len(results),
+            'results': results
+        })
+
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
         """
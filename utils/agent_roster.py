@@ -0,0 +1,156 @@
+"""
+Snapshot de agentes para el matching de tipo ``agent``.
+
+Guarda por agente (UserProfile con user_type 'agente') la comisión, el flag de
+agente y la máscara de bits de las zonas que gestiona (zonas de sus
+``managed_properties``). Se construye con dos consultas y se puntúa contra un
+perfil de forma vectorizada con los mismos valores que
+``calculate_agent_match_score``. El snapshot vive en memoria del proceso y en
+caché, y se invalida por versión desde las señales de UserProfile y Property.
+
+El recálculo incremental (``score(since=...)``) usa ``UserProfile.updated_at`` del
+agente como marca de agua; cuando cambian sus zonas gestionadas (agente o zona de
+una propiedad) las señales la actualizan con ``touch_agents``.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from property.models import Property
+from user.models import UserProfile
+from utils.bitsets import mask_matrix, mask_words, row_popcount, to_mask
+
+logger = logging.getLogger(__name__)
+
+AGENT_MATCH_WEIGHTS = {'base': 0.4, 'commission': 0.4, 'zones': 0.2}
+
+ROSTER_VERSION_KEY = 'matching:agent_roster:version'
+ROSTER_CACHE_KEY = 'matching:agent_roster:{version}'
+ROSTER_CACHE_TIMEOUT = 60 * 60 * 6
+
+_local_roster = {'version': None, 'roster': None}
+
+
+class AgentRoster:
+    """Columnas NumPy con los datos de matching de todos los agentes."""
+
+    def __init__(self, rows: List[Dict], zones: Dict[int, List[int]]):
+        self.user_ids = np.array([r['user_id'] for r in rows], dtype=np.int64)
+        self.updated_at = [r['updated_at'] for r in rows]
+        self.commission = np.array([float(r['agent_commission_rate'] or 2.0) for r in rows], dtype=np.float64)
+        self.is_agent = np.array([r['user_type'] == 'agente' or bool(r['is_agent']) for r in rows], dtype=bool)
+        self.zone_masks = [to_mask(zones.get(r['user_id'], [])) for r in rows]
+        self.zone_words = mask_words(self.zone_masks)
+        self.zone_matrix = mask_matrix(self.zone_masks, self.zone_words)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def build(cls) -> 'AgentRoster':
+        rows = list(UserProfile.objects.filter(user_type='agente').values(
+            'user_id', 'agent_commission_rate', 'user_type', 'is_agent', 'updated_at',
+        ))
+        zones: Dict[int, List[int]] = {}
+        managed = Property.objects.filter(
+            agent__profile__user_type='agente', zone__isnull=False
+        ).values_list('agent_id', 'zone_id').distinct()
+        for agent_id, zone_id in managed:
+            zones.setdefault(agent_id, []).append(zone_id)
+        return cls(rows, zones)
+
+    def score_profiles(self, profile_zones: Dict[int, List[int]]) -> Iterable[Tuple[int, List[Tuple[int, float, Dict]]]]:
+        """Barrido de varios perfiles: genera (profile_key, resultados) para {profile_key: zone_ids}."""
+        for key, zone_ids in profile_zones.items():
+            yield key, self.score(zone_ids)
+
+    def score(self, profile_zone_ids: Iterable[int], since=None) -> List[Tuple[int, float, Dict]]:
+        """
+        Scores de todos los agentes (o solo los actualizados después de ``since``)
+        para un perfil con esas zonas preferidas. Retorna [(agent_user_id, score, metadata), ...].
+        """
+        selected = np.arange(len(self))
+        if since is not None:
+            selected = np.array([i for i, updated in enumerate(self.updated_at) if updated > since], dtype=np.int64)
+        if not len(selected):
+            return []
+        w = AGENT_MATCH_WEIGHTS
+        zone_ids = set(profile_zone_ids)
+        base = np.where(self.is_agent[selected], 50, 0)
+        commission_score = np.maximum(0, 100 - self.commission[selected] * 10)
+        if zone_ids:
+            # Los bits más allá del ancho del roster no pueden coincidir con ningún agente
+            profile_mask = mask_matrix([to_mask(zone_ids)[:self.zone_words * 8]], self.zone_words)
+            zones_overlap = (row_popcount(self.zone_matrix[selected] & profile_mask) / max(len(zone_ids), 1)) * 100
+        else:
+            zones_overlap = np.full(len(selected), 50.0)
+        total = base * w['base'] + commission_score * w['commission'] + zones_overlap * w['zones']
+
+        # Mismos tipos que la versión escalar: max(0, x) devuelve el 0 entero y sin zonas el overlap es 50
+        results = []
+        for user_id, score, commission, overlap in zip(
+            self.user_ids[selected].tolist(), total.tolist(), commission_score.tolist(), zones_overlap.tolist()
+        ):
+            details = {
+                'commission_score': commission if commission > 0 else 0,
+                'zones_overlap': overlap if zone_ids else 50,
+            }
+            results.append((user_id, round(score, 2), {'details': details}))
+        return results
+
+
+def _current_version() -> int:
+    try:
+        return cache.get_or_set(ROSTER_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        logger.warning('Caché no disponible para el roster de agentes; se reconstruye en memoria')
+        return 0
+
+
+def invalidate_agent_roster():
+    """Invalida el roster (se llama desde las señales de UserProfile y Property)."""
+    try:
+        cache.incr(ROSTER_VERSION_KEY)
+    except ValueError:
+        cache.set(ROSTER_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        pass
+    _local_roster['version'] = None
+    _local_roster['roster'] = None
+
+
+def touch_agents(user_ids: Iterable[Optional[int]]):
+    """Actualiza la marca de agua de los agentes cuyas zonas gestionadas cambiaron."""
+    user_ids = {uid for uid in user_ids if uid is not None}
+    if user_ids:
+        UserProfile.objects.filter(user_id__in=user_ids, user_type='agente').update(updated_at=now())
+
+
+def get_agent_roster() -> AgentRoster:
+    """
+    Retorna el roster vigente: memoria del proceso, luego caché y por último
+    reconstrucción desde la base de datos.
+    """
+    version = _current_version()
+    if version and _local_roster['version'] == version and _local_roster['roster'] is not None:
+        return _local_roster['roster']
+    roster: Optional[AgentRoster] = None
+    if version:
+        try:
+            roster = cache.get(ROSTER_CACHE_KEY.format(version=version))
+        except Exception:
+            roster = None
+    if roster is None:
+        roster = AgentRoster.build()
+        if version:
+            try:
+                cache.set(ROSTER_CACHE_KEY.format(version=version), roster, timeout=ROSTER_CACHE_TIMEOUT)
+            except Exception:
+                pass
+    if version:
+        _local_roster['version'] = version
+        _local_roster['roster'] = roster
+    return roster
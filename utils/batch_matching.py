@@ -0,0 +1,444 @@
+"""
+Motor de matching por lotes (vectorizado con NumPy).
+
+Calcula los mismos sub-scores que ``calculate_property_match_score`` para muchos
+pares (SearchProfile, Property) a la vez. Reseñas, amenities y coordenadas de las
+propiedades se leen de la tabla desnormalizada PropertyMatchFeatures junto con las
+columnas de Property, y las amenities de ambos lados son máscaras de bits, así que
+el barrido de candidatos es una sola consulta más la de favoritos. La distancia
+de cada par la calcula PostGIS (ver ``utils.spatial``).
+"""
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from django.db.models import Max, QuerySet
+from django.utils.timezone import now
+
+from matching.models import PropertyMatchFeatures, SearchProfile
+from property.models import Property
+from user.models import UserProfile
+from utils.bitsets import mask_matrix, mask_words, row_popcount
+from utils.embeddings import SEMANTIC_BOOST, semantic_scores, unpack_embedding
+from utils.match_features import MATCH_FEATURE_FIELDS, match_feature_rows
+from utils.match_profiling import phase
+from utils.match_weights import get_property_weights
+from utils.spatial import profile_distances_km, property_distances_km
+
+PROPERTY_FEATURE_FIELDS = (
+    'id', 'price', 'zone_id', 'allows_roommates', 'max_occupancy', 'bedrooms',
+    'created_at', 'preferred_tenant_gender', 'children_allowed', 'pets_allowed',
+    'smokers_allowed', 'students_only', 'stable_job_required', 'semantic_embedding',
+)
+
+PROFILE_FEATURE_FIELDS = (
+    'id', 'user_id', 'location', 'budget_min', 'budget_max', 'roommate_preference',
+    'children_count', 'pets_count', 'smoker', 'gender', 'occupation', 'stable_job', 'amenity_mask',
+    'semantic_embedding',
+)
+
+# Candidatos por lote cuando la poda usa el piso del top-K
+TOP_K_CHUNK = 128
+
+
+def _rows(objects, fields: Sequence[str]) -> List[Dict]:
+    """Normaliza un QuerySet o una lista de instancias a una lista de dicts."""
+    if isinstance(objects, QuerySet):
+        return list(objects.values(*fields))
+    return [obj if isinstance(obj, dict) else {f: getattr(obj, f, None) for f in fields} for obj in objects]
+
+
+def _float_column(values: Iterable, default: float = np.nan) -> np.ndarray:
+    return np.array([default if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _bool_column(values: Iterable, default: bool = False) -> np.ndarray:
+    return np.array([default if v is None else bool(v) for v in values], dtype=bool)
+
+
+def _property_rows(properties) -> List[Dict]:
+    """
+    Filas de Property con las columnas de PropertyMatchFeatures ya unidas. Para un
+    QuerySet es una sola consulta (join 1:1 por clave primaria).
+    """
+    if isinstance(properties, QuerySet):
+        joined = tuple(f'match_features__{f}' for f in MATCH_FEATURE_FIELDS)
+        # Distancia anotada por la etapa espacial (utils.spatial.nearby_properties)
+        distance = ('match_distance',) if 'match_distance' in properties.query.annotations else ()
+        rows = []
+        missing = []
+        for row in properties.values(*PROPERTY_FEATURE_FIELDS, 'match_features__property_id', *joined, *distance):
+            has_features = row.pop('match_features__property_id') is not None
+            for field in MATCH_FEATURE_FIELDS:
+                row[field] = row.pop(f'match_features__{field}')
+            if distance:
+                value = row.pop('match_distance')
+                row['distance_km'] = value.km if value is not None else None
+            if not has_features:
+                missing.append(row)
+            rows.append(row)
+    else:
+        rows = _rows(properties, PROPERTY_FEATURE_FIELDS + MATCH_FEATURE_FIELDS)
+        # Las filas de ``subset`` ya traen las features; las instancias no
+        missing = [r for r in rows if r.get('amenity_mask') is None]
+    if missing:
+        features = match_feature_rows([r['id'] for r in missing])
+        for row in missing:
+            row.update({f: features.get(row['id'], {}).get(f) for f in MATCH_FEATURE_FIELDS})
+    return rows
+
+
+class PropertyFeatures:
+    """
+    Columnas de Property necesarias para el scoring, cargadas en bloque junto con
+    su fila de PropertyMatchFeatures. Reseñas y amenities se decodifican aparte
+    con ``load_related`` para poder podar candidatos antes.
+    """
+
+    def __init__(self, properties, reference_time=None, load_related: bool = True):
+        self.rows = _property_rows(properties)
+        self.ids = [r['id'] for r in self.rows]
+        self.reference_time = reference_time or now()
+
+        self.price = _float_column(r['price'] for r in self.rows)
+        self.has_location = np.array([r['latitude'] is not None and r['longitude'] is not None for r in self.rows], dtype=bool)
+        self.distance_km = _float_column(r.get('distance_km') for r in self.rows)
+        self.allows_roommates = _bool_column(r['allows_roommates'] for r in self.rows)
+        self.max_occupancy = np.array([r['max_occupancy'] or 0 for r in self.rows], dtype=np.int64)
+        self.price_per_person = _float_column(r['price_per_person'] for r in self.rows)
+        self.bedrooms = np.array([r['bedrooms'] or 0 for r in self.rows], dtype=np.int64)
+        self.freshness_days = np.array(
+            [(self.reference_time - r['created_at']).days if r['created_at'] else 0 for r in self.rows],
+            dtype=np.int64,
+        )
+        self.preferred_gender = np.array([r['preferred_tenant_gender'] or 'any' for r in self.rows], dtype=object)
+        self.children_allowed = _bool_column((r['children_allowed'] for r in self.rows), default=True)
+        self.pets_allowed = _bool_column((r['pets_allowed'] for r in self.rows), default=True)
+        self.smokers_allowed = _bool_column((r['smokers_allowed'] for r in self.rows), default=True)
+        self.students_only = _bool_column(r['students_only'] for r in self.rows)
+        self.stable_job_required = _bool_column(r['stable_job_required'] for r in self.rows)
+
+        self.avg_rating = None
+        self.amenity_masks = None
+        self.embeddings = None
+        if load_related:
+            self.load_related()
+
+    def load_related(self):
+        # Reseñas y amenities vienen precalculadas en PropertyMatchFeatures: sin consultas
+        self.avg_rating = _float_column((r['rating_avg'] for r in self.rows), default=0.0)
+        self.amenity_masks = [r['amenity_mask'] for r in self.rows]
+        self.embeddings = [unpack_embedding(r['semantic_embedding']) for r in self.rows]
+
+    def load_distances(self, point):
+        """
+        Completa ``distance_km`` (a ``point``) de las propiedades ubicadas que no
+        vienen anotadas desde la etapa espacial, en una sola consulta a PostGIS.
+        """
+        pending = [r['id'] for r, has, d in zip(self.rows, self.has_location, self.distance_km) if has and np.isnan(d)]
+        if point is None or not pending:
+            return
+        distances = property_distances_km(point, pending)
+        for row in self.rows:
+            if row['id'] in distances:
+                row['distance_km'] = distances[row['id']]
+        self.distance_km = _float_column(r.get('distance_km') for r in self.rows)
+
+    def subset(self, indices) -> 'PropertyFeatures':
+        """Nuevo conjunto de features con solo las filas indicadas (sin consultas)."""
+        return PropertyFeatures([self.rows[i] for i in indices], reference_time=self.reference_time, load_related=False)
+
+
+class ProfileFeatures:
+    """Columnas de SearchProfile necesarias para el scoring, cargadas en bloque."""
+
+    def __init__(self, profiles):
+        self.rows = _rows(profiles, PROFILE_FEATURE_FIELDS)
+        self.ids = [r['id'] for r in self.rows]
+        self.user_ids = [r['user_id'] for r in self.rows]
+
+        self.locations = [r['location'] for r in self.rows]
+        self.has_location = np.array([loc is not None for loc in self.locations], dtype=bool)
+        self.budget_min = _float_column(r['budget_min'] for r in self.rows)
+        self.budget_max = _float_column(r['budget_max'] for r in self.rows)
+        self.wants_roommates = np.array([r['roommate_preference'] != 'no' for r in self.rows], dtype=bool)
+        self.children_count = np.array([int(r['children_count'] or 0) for r in self.rows], dtype=np.int64)
+        self.pets_count = np.array([int(r['pets_count'] or 0) for r in self.rows], dtype=np.int64)
+        self.smoker = _bool_column(r['smoker'] for r in self.rows)
+        self.gender = np.array([r['gender'] or '' for r in self.rows], dtype=object)
+        self.is_student = np.array(['estud' in (r['occupation'] or '').lower() for r in self.rows], dtype=bool)
+        self.stable_job = _bool_column(r['stable_job'] for r in self.rows)
+
+        self.amenity_masks = [r['amenity_mask'] for r in self.rows]
+        self.embeddings = [unpack_embedding(r['semantic_embedding']) for r in self.rows]
+
+
+def _favorite_pairs(profiles: ProfileFeatures, properties: PropertyFeatures) -> set:
+    """Pares (user_id, property_id) marcados como favoritos, en una sola consulta."""
+    return set(
+        UserProfile.favorites.through.objects.filter(
+            userprofile__user_id__in=set(profiles.user_ids), property_id__in=properties.ids
+        ).values_list('userprofile__user_id', 'property_id')
+    )
+
+
+class ScoringStats:
+    """Contadores de una corrida de matching (candidatos podados vs puntuados)."""
+
+    def __init__(self):
+        self.candidates = 0
+        self.pruned = 0
+        self.fully_scored = 0
+        # Ids de las propiedades podadas (sus matches almacenados quedaron obsoletos)
+        self.pruned_ids: List[int] = []
+
+    def as_dict(self) -> Dict[str, int]:
+        return {'candidates': self.candidates, 'pruned': self.pruned, 'fully_scored': self.fully_scored}
+
+
+def cheap_component_scores(profiles: ProfileFeatures, properties: PropertyFeatures,
+                           profile_idx: np.ndarray, property_idx: np.ndarray,
+                           distance_km: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Sub-scores que dependen solo de columnas de SearchProfile y Property:
+    ubicación, precio, roomie, frescura, familia y preferencias del propietario.
+    ``distance_km`` es la distancia geodésica de cada par, calculada por PostGIS.
+    """
+    s, p = profile_idx, property_idx
+    price = properties.price[p]
+
+    # 1. Location: distancia geodésica de PostGIS (no se recalcula en Python)
+    both_located = profiles.has_location[s] & properties.has_location[p] & ~np.isnan(distance_km)
+    location = np.where(both_located, np.maximum(0, 100 - np.nan_to_num(distance_km) * 10), 50.0)
+
+    # 2. Price
+    min_b = profiles.budget_min[s]
+    max_b = profiles.budget_max[s]
+    has_budget = ~np.isnan(min_b) & ~np.isnan(max_b)
+    in_range = (min_b <= price) & (price <= max_b)
+    diff = np.abs(price - max_b) / np.maximum(max_b, 1)
+    price_score = np.where(has_budget, np.where(in_range, 100.0, np.maximum(0, 100 - diff * 100)), 80.0)
+    occupancy = properties.max_occupancy[p]
+    shared = properties.allows_roommates[p] & profiles.wants_roommates[s] & (occupancy != 0) & ~np.isnan(max_b)
+    per_person = properties.price_per_person[p]
+    price_score = np.where(shared, np.maximum(price_score, np.where(per_person <= max_b, 100.0, 80.0)), price_score)
+
+    # 4. Roommate
+    roommate = np.where(properties.allows_roommates[p] == profiles.wants_roommates[s], 100.0, 50.0)
+
+    # 5. Freshness
+    freshness = np.maximum(0, 100 - properties.freshness_days[p] * 2).astype(np.float64)
+
+    # 6. Familia
+    needed_bedrooms = np.where(profiles.children_count[s] >= 1, 2, 1)
+    family = np.where(properties.bedrooms[p] >= needed_bedrooms, 100.0, 60.0)
+
+    # 7. Preferencias del propietario
+    owner_prefs = np.full(len(s), 100.0)
+    pref_gender = properties.preferred_gender[p]
+    gender = profiles.gender[s]
+    owner_prefs -= np.where((pref_gender != 'any') & (gender != '') & (pref_gender != gender), 25, 0)
+    owner_prefs -= np.where((profiles.children_count[s] > 0) & ~properties.children_allowed[p], 40, 0)
+    owner_prefs -= np.where((profiles.pets_count[s] > 0) & ~properties.pets_allowed[p], 30, 0)
+    owner_prefs -= np.where(profiles.smoker[s] & ~properties.smokers_allowed[p], 25, 0)
+    owner_prefs -= np.where(properties.students_only[p] & ~profiles.is_student[s], 35, 0)
+    owner_prefs -= np.where(properties.stable_job_required[p] & ~profiles.stable_job[s], 35, 0)
+    owner_prefs = np.maximum(0, owner_prefs)
+
+    return {
+        'location_score': location,
+        'price_score': price_score,
+        'roommate_score': roommate,
+        'freshness_score': freshness,
+        'family_score': family,
+        'owner_prefs_score': owner_prefs,
+    }
+
+
+def upper_bound_scores(cheap: Dict[str, np.ndarray], weights: Dict[str, float], reputation_cap: float) -> np.ndarray:
+    """
+    Cota superior del score total a partir de los sub-scores baratos, asumiendo
+    el máximo posible para amenities (100), reputación, boost por favorito (3) y
+    similitud semántica (SEMANTIC_BOOST).
+    """
+    total = (
+        cheap['location_score'] * weights['location']
+        + cheap['price_score'] * weights['price']
+        + 100 * weights['amenities']
+        + cheap['roommate_score'] * weights['roommate']
+        + reputation_cap * weights['reputation']
+        + cheap['freshness_score'] * weights['freshness']
+        + cheap['family_score'] * weights['family']
+        + cheap['owner_prefs_score'] * weights['owner_prefs']
+    )
+    return np.minimum(100.0, total + 3 + SEMANTIC_BOOST)
+
+
+def _reputation_cap() -> float:
+    """Máximo score de reputación posible según el mayor promedio de reseñas registrado."""
+    max_rating = PropertyMatchFeatures.objects.aggregate(max_rating=Max('rating_avg'))['max_rating']
+    return max(80.0, float(max_rating or 0) * 20)
+
+
+def score_pairs(profiles: ProfileFeatures, properties: PropertyFeatures,
+                profile_idx: np.ndarray, property_idx: np.ndarray, weights: Dict[str, float],
+                distance_km: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Calcula los ocho sub-scores y el total para los pares alineados
+    (profiles[profile_idx[i]], properties[property_idx[i]]).
+    Replica exactamente las reglas de ``calculate_property_match_score``.
+    """
+    s, p = profile_idx, property_idx
+    cheap = cheap_component_scores(profiles, properties, s, p, distance_km)
+
+    # 3. Amenities: AND + popcount sobre palabras uint64 de las máscaras
+    words = max(mask_words(profiles.amenity_masks), mask_words(properties.amenity_masks))
+    s_matrix = mask_matrix(profiles.amenity_masks, words)
+    p_matrix = mask_matrix(properties.amenity_masks, words)
+    s_count = row_popcount(s_matrix)[s]
+    overlap = row_popcount(s_matrix[s] & p_matrix[p])
+    amenities = np.where(s_count > 0, (overlap / np.maximum(s_count, 1)) * 100, 100.0)
+
+    # 5. Reputation
+    rating = properties.avg_rating[p]
+    reputation = np.where(rating != 0, rating * 20, 80.0)
+
+    # 8. Boost por favorito
+    favorites = _favorite_pairs(profiles, properties)
+    engagement = np.array(
+        [3.0 if (profiles.user_ids[si], properties.ids[pi]) in favorites else 0.0 for si, pi in zip(s, p)],
+        dtype=np.float64,
+    )
+
+    # 9. Similitud semántica
+    semantic = semantic_scores(profiles.embeddings, properties.embeddings, s, p)
+
+    # Mismo orden de suma que la versión escalar para obtener resultados idénticos
+    total = cheap['location_score'] * weights['location']
+    total = total + cheap['price_score'] * weights['price']
+    total = total + amenities * weights['amenities']
+    total = total + cheap['roommate_score'] * weights['roommate']
+    total = total + reputation * weights['reputation']
+    total = total + cheap['freshness_score'] * weights['freshness']
+    total = total + cheap['family_score'] * weights['family']
+    total = total + cheap['owner_prefs_score'] * weights['owner_prefs']
+    total = np.minimum(100.0, total + engagement + semantic * SEMANTIC_BOOST / 100)
+
+    return {
+        'total': total,
+        'location_score': cheap['location_score'],
+        'price_score': cheap['price_score'],
+        'amenities_score': amenities,
+        'roommate_score': cheap['roommate_score'],
+        'reputation_score': reputation,
+        'freshness_score': cheap['freshness_score'],
+        'family_score': cheap['family_score'],
+        'owner_prefs_score': cheap['owner_prefs_score'],
+        'engagement_boost': engagement,
+        'semantic_score': semantic,
+    }
+
+
+def _to_results(scores: Dict[str, np.ndarray]) -> List[Tuple[float, Dict]]:
+    # round() de Python sobre floats nativos para coincidir con la versión escalar
+    columns = {k: v.tolist() for k, v in scores.items()}
+    detail_keys = [k for k in columns if k != 'total']
+    results = []
+    for i, total in enumerate(columns['total']):
+        details = {k: round(columns[k][i], 2) for k in detail_keys}
+        results.append((round(total, 2), {'details': details}))
+    return results
+
+
+def score_properties_for_profile(profile: SearchProfile, properties, threshold: float = None,
+                                 stats: ScoringStats = None,
+                                 floor: Callable[[List[Tuple[int, float, Dict]]], float] = None,
+                                 chunk_size: int = TOP_K_CHUNK) -> List[Tuple[int, float, Dict]]:
+    """
+    Puntúa N propiedades contra un perfil. ``properties`` puede ser un QuerySet
+    o una lista de instancias. Retorna [(property_id, score, metadata), ...].
+
+    Si se indica ``threshold``, primero se calculan los sub-scores baratos y se
+    descartan (sin decodificar amenities ni consultar favoritos) los candidatos
+    cuya cota superior no alcanza el umbral; esos candidatos no se retornan.
+
+    Con ``floor`` los candidatos se puntúan en lotes de ``chunk_size`` por cota
+    superior descendente. Cada lote se entrega a ``floor``, que retorna el piso
+    vigente (p. ej. el k-ésimo mejor score de ``MatchWriter``), y los candidatos
+    restantes cuya cota no lo alcanza se podan sin puntuar. Así la poda aplica
+    también con umbral 0.
+    """
+    weights = get_property_weights()
+    stats = stats if stats is not None else ScoringStats()
+    with phase('batch.features'):
+        prop_features = PropertyFeatures(properties, load_related=False)
+    n = len(prop_features.ids)
+    stats.candidates += n
+    if not n:
+        return []
+    with phase('batch.distances'):
+        profile_features = ProfileFeatures([profile])
+        prop_features.load_distances(profile_features.locations[0])
+
+    cutoff = threshold if threshold is not None and threshold > 0 else None
+    if cutoff is not None or floor is not None:
+        with phase('batch.prune'):
+            cheap = cheap_component_scores(
+                profile_features, prop_features, np.zeros(n, dtype=np.int64), np.arange(n), prop_features.distance_km,
+            )
+            bounds = upper_bound_scores(cheap, weights, _reputation_cap())
+            keep = np.arange(n) if cutoff is None else np.nonzero(bounds + 1e-6 >= cutoff)[0]
+            if floor is not None:
+                keep = keep[np.argsort(-bounds[keep], kind='stable')]
+    else:
+        keep = np.arange(n)
+
+    results: List[Tuple[int, float, Dict]] = []
+    scored = np.zeros(n, dtype=bool)
+    step = chunk_size if floor is not None else max(len(keep), 1)
+    current = None
+    for start in range(0, len(keep), step):
+        indices = keep[start:start + step]
+        if current is not None:
+            # Orden descendente por cota: los que no alcanzan el piso cierran el recorrido
+            indices = indices[bounds[indices] + 1e-6 >= current]
+            if not len(indices):
+                break
+        scored[indices] = True
+        chunk = prop_features.subset(indices)
+        with phase('batch.related'):
+            chunk.load_related()
+        with phase('batch.score'):
+            scores = score_pairs(
+                profile_features, chunk, np.zeros(len(indices), dtype=np.int64), np.arange(len(indices)), weights,
+                chunk.distance_km,
+            )
+            chunk_results = [(pid, score, meta) for pid, (score, meta) in zip(chunk.ids, _to_results(scores))]
+        results.extend(chunk_results)
+        if floor is not None:
+            current = floor(chunk_results)
+    stats.fully_scored += len(results)
+    stats.pruned += n - len(results)
+    stats.pruned_ids.extend(prop_features.ids[i] for i in np.nonzero(~scored)[0])
+    return results
+
+
+def score_profiles_for_property(property_obj: Property, profiles: Sequence[SearchProfile]) -> List[Tuple[SearchProfile, float, Dict]]:
+    """
+    Puntúa una propiedad contra N perfiles (matching inverso al crear una propiedad).
+    Retorna [(profile, score, metadata), ...] en el mismo orden que ``profiles``.
+    """
+    profiles = list(profiles)
+    if not profiles:
+        return []
+    profile_features = ProfileFeatures(profiles)
+    prop_features = PropertyFeatures([property_obj])
+    n = len(profiles)
+    distances = {}
+    if property_obj.location is not None:
+        located = [pid for pid, has in zip(profile_features.ids, profile_features.has_location) if has]
+        distances = profile_distances_km(property_obj.location, located)
+    distance_km = _float_column(distances.get(pid) for pid in profile_features.ids)
+    scores = score_pairs(
+        profile_features, prop_features, np.arange(n), np.zeros(n, dtype=np.int64), get_property_weights(), distance_km,
+    )
+    return [(profile, score, meta) for profile, (score, meta) in zip(profiles, _to_results(scores))]
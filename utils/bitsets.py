@@ -0,0 +1,62 @@
+"""
+Conjuntos de enteros codificados como máscaras de bits.
+
+Amenities y vibes/tags tienen un id entero estable; un conjunto se guarda como
+bytes little-endian con el bit ``id`` encendido, así la intersección de dos
+conjuntos es un AND y su tamaño un popcount. Para el scoring por lotes las
+máscaras se convierten en matrices de palabras uint64.
+"""
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+
+def to_mask(ids: Iterable[int]) -> bytes:
+    """Máscara de bits (bytes little-endian) con el bit ``id`` encendido por elemento."""
+    value = 0
+    for item_id in ids:
+        value |= 1 << item_id
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def mask_int(mask) -> int:
+    """Máscara como entero de Python (acepta bytes, memoryview o None)."""
+    return int.from_bytes(bytes(mask or b''), 'little')
+
+
+def mask_ids(mask) -> List[int]:
+    """IDs encendidos en la máscara, en orden ascendente."""
+    value = mask_int(mask)
+    ids = []
+    while value:
+        lowest = value & -value
+        ids.append(lowest.bit_length() - 1)
+        value ^= lowest
+    return ids
+
+
+def popcount(value: int) -> int:
+    return value.bit_count()
+
+
+def mask_matrix(masks: Sequence, words: int = None) -> np.ndarray:
+    """
+    Matriz (n x words) de uint64 con una fila por máscara. ``words`` permite
+    alinear dos matrices al mismo ancho para operar entre ellas.
+    """
+    raw = [bytes(m or b'') for m in masks]
+    if words is None:
+        words = mask_words(raw)
+    width = words * 8
+    buffer = b''.join(m.ljust(width, b'\0') for m in raw)
+    return np.frombuffer(buffer, dtype='<u8').reshape(len(raw), words).astype(np.uint64)
+
+
+def mask_words(masks: Sequence) -> int:
+    """Cantidad de palabras de 64 bits necesarias para la máscara más larga (mínimo 1)."""
+    return max([(len(bytes(m or b'')) + 7) // 8 for m in masks] + [1])
+
+
+def row_popcount(matrix: np.ndarray) -> np.ndarray:
+    """Cantidad de bits encendidos por fila."""
+    return np.bitwise_count(matrix).sum(axis=1, dtype=np.int64)
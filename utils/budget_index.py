@@ -0,0 +1,132 @@
+"""
+Índice de intervalos de presupuesto ``[budget_min, budget_max]`` de SearchProfile.
+
+El scoring de roomies da 100 en presupuesto cuando los intervalos se solapan
+(``min(max1, max2) - max(min1, min2) > 0``) y un score parcial que depende de
+``|max1 - min2|`` cuando no. El índice guarda los extremos ordenados y un árbol
+de intervalos centrado, así que para un perfil se obtienen los intervalos
+solapados y los vecinos no solapados más cercanos sin recorrer la población.
+Las posiciones devueltas son índices de fila de las columnas con que se construyó.
+
+Para filtrar un QuerySet (p. ej. ``/roomie_search/available/``) se usa
+``budget_overlap_filter``, la misma regla como condiciones SQL indexables.
+"""
+from typing import Optional
+
+import numpy as np
+from django.db.models import F, Q
+
+
+class _Node:
+    __slots__ = ('center', 'by_min', 'min_keys', 'by_max', 'neg_max_keys', 'left', 'right')
+
+
+class BudgetIntervalIndex:
+    """
+    Árbol de intervalos estático sobre arrays NumPy. El árbol solo contiene
+    intervalos completos y válidos (ambos extremos no vacíos y ``min < max``):
+    los demás nunca se solapan según la regla de ``calculate_roommate_match_score``.
+    Los extremos vacíos se representan con NaN.
+    """
+
+    def __init__(self, mins: np.ndarray, maxs: np.ndarray):
+        self.mins = np.asarray(mins, dtype=np.float64)
+        self.maxs = np.asarray(maxs, dtype=np.float64)
+        complete = ~np.isnan(self.mins) & ~np.isnan(self.maxs)
+        with np.errstate(invalid='ignore'):
+            valid = complete & (self.mins < self.maxs)
+        positions = np.nonzero(valid)[0]
+        self._by_min = positions[np.argsort(self.mins[positions], kind='stable')]
+        self._sorted_mins = self.mins[self._by_min]
+        # Los intervalos invertidos no se solapan pero sí reciben score parcial
+        complete_positions = np.nonzero(complete)[0]
+        self._complete_by_min = complete_positions[np.argsort(self.mins[complete_positions], kind='stable')]
+        self._complete_sorted_mins = self.mins[self._complete_by_min]
+        self._root = self._build(positions)
+
+    def __len__(self):
+        return len(self._complete_by_min)
+
+    @classmethod
+    def for_profiles(cls, queryset) -> 'BudgetIntervalIndex':
+        """Índice sobre un QuerySet de SearchProfile (una consulta); ``ids`` alinea posiciones con ids."""
+        rows = list(queryset.values_list('id', 'budget_min', 'budget_max'))
+        index = cls(
+            [float(lo) if lo else np.nan for _, lo, _ in rows],
+            [float(hi) if hi else np.nan for _, _, hi in rows],
+        )
+        index.ids = np.array([pid for pid, _, _ in rows], dtype=np.int64)
+        return index
+
+    def _build(self, positions: np.ndarray) -> Optional[_Node]:
+        if not len(positions):
+            return None
+        mins, maxs = self.mins[positions], self.maxs[positions]
+        node = _Node()
+        node.center = float(np.median(np.concatenate([mins, maxs])))
+        here = (mins <= node.center) & (maxs >= node.center)
+        current = positions[here]
+        by_min = np.argsort(self.mins[current], kind='stable')
+        node.by_min = current[by_min]
+        node.min_keys = self.mins[node.by_min]
+        by_max = np.argsort(-self.maxs[current], kind='stable')
+        node.by_max = current[by_max]
+        node.neg_max_keys = -self.maxs[node.by_max]
+        node.left = self._build(positions[maxs < node.center])
+        node.right = self._build(positions[mins > node.center])
+        return node
+
+    def _stab(self, x: float) -> np.ndarray:
+        """Intervalos con ``min <= x < max``."""
+        found = []
+        node = self._root
+        while node is not None:
+            if x < node.center:
+                # Todos los del nodo terminan después de x; se toman los que empiezan antes
+                found.append(node.by_min[:np.searchsorted(node.min_keys, x, side='right')])
+                node = node.left
+            else:
+                # Todos los del nodo empiezan antes de x; se toman los que terminan después
+                found.append(node.by_max[:np.searchsorted(node.neg_max_keys, -x, side='left')])
+                node = node.right
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def overlapping(self, lo: float, hi: float) -> np.ndarray:
+        """Posiciones cuyo intervalo se solapa estrictamente con ``[lo, hi]``."""
+        if not lo < hi:
+            return np.zeros(0, dtype=np.int64)
+        start = np.searchsorted(self._sorted_mins, lo, side='right')
+        end = np.searchsorted(self._sorted_mins, hi, side='left')
+        # Empiezan dentro de (lo, hi) o contienen a lo: conjuntos disjuntos
+        return np.concatenate([self._by_min[start:end], self._stab(lo)])
+
+    def within(self, reference: float, radius: float) -> np.ndarray:
+        """Posiciones con ``|reference - budget_min| <= radius`` (base del score parcial)."""
+        start = np.searchsorted(self._complete_sorted_mins, reference - radius, side='left')
+        end = np.searchsorted(self._complete_sorted_mins, reference + radius, side='right')
+        return self._complete_by_min[start:end]
+
+    def near_misses(self, lo: float, hi: float, radius: float) -> np.ndarray:
+        """
+        Vecinos no solapados más cercanos: intervalos que no se solapan con
+        ``[lo, hi]`` y cuyo ``budget_min`` está a ``radius`` o menos de ``hi``.
+        """
+        positions = self.within(hi, radius)
+        overlap = (np.minimum(self.maxs[positions], hi) - np.maximum(self.mins[positions], lo)) > 0
+        return positions[~overlap]
+
+
+def budget_overlap_filter(budget_min: float, budget_max: float, radius: float = 0) -> Q:
+    """
+    Filtro SQL de SearchProfile con la misma regla que ``overlapping`` (más
+    ``near_misses`` con ``radius``): rangos simples sobre ``budget_min`` y
+    ``budget_max`` que resuelve el índice ``searchprofile_budget`` sin cargar la
+    población. Los extremos vacíos (NULL o 0) nunca califican, igual que en el índice.
+    """
+    complete = Q(budget_min__isnull=False, budget_max__isnull=False) & ~Q(budget_min=0) & ~Q(budget_max=0)
+    compatible = Q(pk__in=[])
+    if budget_min < budget_max:
+        compatible = Q(budget_min__lt=budget_max, budget_max__gt=budget_min) & Q(budget_min__lt=F('budget_max'))
+    if radius > 0:
+        compatible |= Q(budget_min__gte=budget_max - radius, budget_min__lte=budget_max + radius)
+    return complete & compatible
@@ -0,0 +1,235 @@
+"""
+Índice invertido de SearchProfile para matching inverso (nueva Property -> perfiles).
+
+Los perfiles se agrupan por celda geográfica, tramo de presupuesto y rasgos que
+determinan las preferencias del propietario (género, hijos, mascotas, fumador,
+estudiante, trabajo estable, busca roomie). Para una propiedad se calcula una cota
+superior del score por grupo y solo se devuelven los perfiles de los grupos que
+pueden alcanzar el umbral. El índice se guarda en caché y se invalida por versión
+cuando cambia cualquier SearchProfile.
+"""
+import logging
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from matching.models import SearchProfile
+from user.models import UserProfile
+from utils.embeddings import SEMANTIC_BOOST, unpack_embedding
+from utils.match_features import match_feature_rows
+from utils.match_weights import get_property_weights
+
+logger = logging.getLogger(__name__)
+
+# Celdas de ~11 km: con la fórmula actual la ubicación vale 0 a partir de 10 km
+CELL_SIZE_DEG = 0.1
+# Longitud mínima de un grado sobre el elipsoide WGS84 (latitud y longitud en el ecuador)
+KM_PER_DEG_LAT_MIN = 110.5
+KM_PER_DEG_LON_EQUATOR_MIN = 111.0
+BUDGET_EDGES = [0, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 12000, 20000, 50000]
+
+INDEX_VERSION_KEY = 'matching:profile_index:version'
+INDEX_CACHE_KEY = 'matching:profile_index:{version}'
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+
+_local_index = {'version': None, 'index': None}
+
+
+def _budget_bucket(budget_max) -> int:
+    """Índice del tramo de presupuesto (-1 si no hay budget_max)."""
+    if budget_max is None:
+        return -1
+    value = float(budget_max)
+    for i, edge in enumerate(BUDGET_EDGES[1:]):
+        if value < edge:
+            return i
+    return len(BUDGET_EDGES) - 1
+
+
+def _bucket_upper(bucket: int) -> float:
+    return BUDGET_EDGES[bucket + 1] if bucket + 1 < len(BUDGET_EDGES) else math.inf
+
+
+class ProfileCandidateIndex:
+    """
+    Grupos de perfiles con columnas NumPy por grupo para calcular cotas
+    superiores de score de forma vectorizada.
+    """
+
+    def __init__(self, groups: Dict[tuple, List[int]]):
+        keys = list(groups)
+        self.profile_ids = [groups[k] for k in keys]
+        self.has_location = np.array([k[0] is not None for k in keys], dtype=bool)
+        self.cell_x = np.array([k[0][0] if k[0] is not None else 0 for k in keys], dtype=np.float64)
+        self.cell_y = np.array([k[0][1] if k[0] is not None else 0 for k in keys], dtype=np.float64)
+        self.budget_bucket = np.array([k[1] for k in keys], dtype=np.int64)
+        self.has_budget_min = np.array([k[2] for k in keys], dtype=bool)
+        self.budget_upper = np.array([_bucket_upper(b) if b >= 0 else np.nan for b in self.budget_bucket], dtype=np.float64)
+        self.gender = np.array([k[3] for k in keys], dtype=object)
+        self.has_children = np.array([k[4] for k in keys], dtype=bool)
+        self.has_pets = np.array([k[5] for k in keys], dtype=bool)
+        self.smoker = np.array([k[6] for k in keys], dtype=bool)
+        self.is_student = np.array([k[7] for k in keys], dtype=bool)
+        self.stable_job = np.array([k[8] for k in keys], dtype=bool)
+        self.wants_roommates = np.array([k[9] for k in keys], dtype=bool)
+
+    @classmethod
+    def build(cls) -> 'ProfileCandidateIndex':
+        groups: Dict[tuple, List[int]] = {}
+        rows = SearchProfile.objects.values_list(
+            'id', 'location', 'budget_min', 'budget_max', 'roommate_preference', 'children_count',
+            'pets_count', 'smoker', 'gender', 'occupation', 'stable_job',
+        )
+        for pid, location, bmin, bmax, roommate_pref, children, pets, smoker, gender, occupation, stable_job in rows.iterator():
+            cell = None
+            if location is not None:
+                cell = (math.floor(location.x / CELL_SIZE_DEG), math.floor(location.y / CELL_SIZE_DEG))
+            key = (
+                cell,
+                _budget_bucket(bmax),
+                bmin is not None,
+                gender or '',
+                (children or 0) > 0,
+                (pets or 0) > 0,
+                bool(smoker),
+                'estud' in (occupation or '').lower(),
+                bool(stable_job),
+                roommate_pref != 'no',
+            )
+            groups.setdefault(key, []).append(pid)
+        return cls(groups)
+
+    def upper_bounds(self, property_obj) -> np.ndarray:
+        """
+        Cota superior del score de cada grupo para la propiedad. Los componentes
+        que dependen solo de la propiedad y de los rasgos del grupo son exactos;
+        ubicación y precio se acotan por celda y tramo; amenities se asume 100.
+        """
+        w = get_property_weights()
+        n = len(self.profile_ids)
+
+        # Ubicación: cota inferior de la distancia geodésica de la propiedad al rectángulo de la celda
+        location = np.full(n, 50.0)
+        if property_obj.location is not None:
+            px, py = property_obj.location.x, property_obj.location.y
+            x0, y0 = self.cell_x * CELL_SIZE_DEG, self.cell_y * CELL_SIZE_DEG
+            dx = np.maximum(np.maximum(x0 - px, px - (x0 + CELL_SIZE_DEG)), 0)
+            dy = np.maximum(np.maximum(y0 - py, py - (y0 + CELL_SIZE_DEG)), 0)
+            # Km por grado mínimos en el rango de latitudes de la celda y la propiedad
+            max_lat = np.minimum(np.maximum(np.abs(py), np.maximum(np.abs(y0), np.abs(y0 + CELL_SIZE_DEG))), 89.9)
+            dx_km = dx * KM_PER_DEG_LON_EQUATOR_MIN * np.cos(np.radians(max_lat))
+            dy_km = dy * KM_PER_DEG_LAT_MIN
+            # Holgura para la aproximación plana y el redondeo en el borde de la celda
+            min_distance_km = np.sqrt(dx_km * dx_km + dy_km * dy_km) * 0.99
+            location = np.where(self.has_location, np.maximum(0, 100 - min_distance_km * 10), 50.0)
+
+        # Precio: el mejor caso dentro del tramo es budget_max en su límite superior
+        price = float(property_obj.price)
+        upper = self.budget_upper
+        full_budget = (self.budget_bucket >= 0) & self.has_budget_min
+        with np.errstate(invalid='ignore'):
+            best_diff = np.abs(price - upper) / np.maximum(upper, 1)
+            price_score = np.where(
+                full_budget,
+                np.where(price <= upper, 100.0, np.maximum(0, 100 - best_diff * 100)),
+                80.0,
+            )
+            if property_obj.allows_roommates and property_obj.max_occupancy:
+                per_person = price / max(property_obj.max_occupancy, 1)
+                shared = self.wants_roommates & (self.budget_bucket >= 0)
+                price_score = np.where(shared, np.maximum(price_score, np.where(per_person <= upper, 100.0, 80.0)), price_score)
+
+        roommate = np.where(self.wants_roommates == bool(property_obj.allows_roommates), 100.0, 50.0)
+
+        avg_rating = match_feature_rows([property_obj.id]).get(property_obj.id, {}).get('rating_avg')
+        reputation = float(avg_rating) * 20 if avg_rating else 80
+        freshness_days = (now() - property_obj.created_at).days if property_obj.created_at else 0
+        freshness = max(0, 100 - freshness_days * 2)
+
+        family = np.where(property_obj.bedrooms >= np.where(self.has_children, 2, 1), 100.0, 60.0)
+
+        owner_prefs = np.full(n, 100.0)
+        pref_gender = property_obj.preferred_tenant_gender or 'any'
+        if pref_gender != 'any':
+            owner_prefs -= np.where((self.gender != '') & (self.gender != pref_gender), 25, 0)
+        if not property_obj.children_allowed:
+            owner_prefs -= np.where(self.has_children, 40, 0)
+        if not property_obj.pets_allowed:
+            owner_prefs -= np.where(self.has_pets, 30, 0)
+        if not property_obj.smokers_allowed:
+            owner_prefs -= np.where(self.smoker, 25, 0)
+        if property_obj.students_only:
+            owner_prefs -= np.where(~self.is_student, 35, 0)
+        if property_obj.stable_job_required:
+            owner_prefs -= np.where(~self.stable_job, 35, 0)
+        owner_prefs = np.maximum(0, owner_prefs)
+
+        engagement = 3 if UserProfile.favorites.through.objects.filter(property_id=property_obj.id).exists() else 0
+        # Similitud semántica: a lo sumo SEMANTIC_BOOST si la propiedad tiene embedding
+        if unpack_embedding(property_obj.semantic_embedding) is not None:
+            engagement += SEMANTIC_BOOST
+
+        total = (
+            location * w['location'] + price_score * w['price'] + 100 * w['amenities']
+            + roommate * w['roommate'] + reputation * w['reputation'] + freshness * w['freshness']
+            + family * w['family'] + owner_prefs * w['owner_prefs']
+        )
+        return np.minimum(100.0, total + engagement)
+
+    def candidates_for_property(self, property_obj, threshold: float) -> List[int]:
+        """IDs de perfiles que pueden alcanzar ``threshold`` para la propiedad."""
+        if not self.profile_ids:
+            return []
+        bounds = self.upper_bounds(property_obj)
+        selected = np.nonzero(bounds + 1e-6 >= threshold)[0]
+        return [pid for i in selected for pid in self.profile_ids[i]]
+
+
+def _current_version() -> int:
+    try:
+        return cache.get_or_set(INDEX_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        logger.warning('Caché no disponible para el índice de perfiles; se reconstruye en memoria')
+        return 0
+
+
+def invalidate_profile_index():
+    """Invalida el índice (se llama desde las señales de SearchProfile)."""
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(INDEX_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        pass
+    _local_index['version'] = None
+    _local_index['index'] = None
+
+
+def get_profile_index() -> ProfileCandidateIndex:
+    """
+    Retorna el índice vigente: memoria del proceso, luego caché y por último
+    reconstrucción desde la base de datos.
+    """
+    version = _current_version()
+    if version and _local_index['version'] == version and _local_index['index'] is not None:
+        return _local_index['index']
+    index: Optional[ProfileCandidateIndex] = None
+    if version:
+        try:
+            index = cache.get(INDEX_CACHE_KEY.format(version=version))
+        except Exception:
+            index = None
+    if index is None:
+        index = ProfileCandidateIndex.build()
+        if version:
+            try:
+                cache.set(INDEX_CACHE_KEY.format(version=version), index, timeout=INDEX_CACHE_TIMEOUT)
+            except Exception:
+                pass
+    if version:
+        _local_index['version'] = version
+        _local_index['index'] = index
+    return index
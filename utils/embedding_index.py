@@ -0,0 +1,176 @@
+"""
+Índice de vecinos más cercanos sobre los embeddings de las propiedades activas.
+
+Búsqueda exacta por fuerza bruta: un producto matriz-vector float32 y
+``argpartition`` para el top-k. Con EMBEDDING_DIM = 128, diez mil propiedades
+ocupan 5 MB y una consulta toma pocos milisegundos, así que no hace falta un
+índice aproximado (IVF).
+
+El índice se actualiza de forma incremental. Guarda la marca de agua
+``updated_at`` de la última propiedad leída y cada refresco (como máximo cada
+LISTING_INDEX_REFRESH_SECONDS) solo lee las propiedades modificadas desde
+entonces. Las que siguen activas y tienen embedding se insertan o reemplazan, y
+el resto se quitan. Vive en la memoria del proceso y en caché. Los borrados de
+propiedades y el backfill de embeddings lo invalidan por versión, lo que fuerza
+una reconstrucción completa.
+"""
+import logging
+from time import monotonic
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+
+from property.models import Property
+from utils.embeddings import EMBEDDING_DIM, EMBEDDING_DTYPE, unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+LISTING_INDEX_VERSION_KEY = 'matching:listing_index:version'
+LISTING_INDEX_CACHE_KEY = 'matching:listing_index:{version}'
+LISTING_INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+LISTING_INDEX_REFRESH_SECONDS = 30
+
+_local_index = {'version': None, 'index': None, 'checked_at': 0.0}
+
+
+class ListingEmbeddingIndex:
+    """Matriz (n, EMBEDDING_DIM) de embeddings con el id de propiedad de cada fila."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, EMBEDDING_DIM), dtype=EMBEDDING_DTYPE)
+        self.watermark = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, batch_size: int = 2000) -> 'ListingEmbeddingIndex':
+        index = cls()
+        index.refresh(batch_size=batch_size)
+        return index
+
+    def upsert(self, rows: Iterable[Tuple[int, np.ndarray]]):
+        rows = list(rows)
+        if not rows:
+            return
+        positions = {pid: i for i, pid in enumerate(self.ids.tolist())}
+        appended_ids, appended = [], []
+        for pid, vector in rows:
+            if pid in positions:
+                self.matrix[positions[pid]] = vector
+            else:
+                positions[pid] = len(self.ids) + len(appended_ids)
+                appended_ids.append(pid)
+                appended.append(vector)
+        if appended:
+            self.ids = np.concatenate([self.ids, np.array(appended_ids, dtype=np.int64)])
+            self.matrix = np.vstack([self.matrix, np.array(appended, dtype=EMBEDDING_DTYPE)])
+
+    def remove(self, property_ids: Iterable[int]):
+        property_ids = list(property_ids)
+        if not property_ids or not len(self.ids):
+            return
+        keep = ~np.isin(self.ids, np.array(property_ids, dtype=np.int64))
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.matrix = self.matrix[keep]
+
+    def refresh(self, batch_size: int = 2000) -> int:
+        """Aplica los cambios posteriores a la marca de agua. Retorna las propiedades leídas."""
+        qs = Property.objects.all()
+        if self.watermark is not None:
+            qs = qs.filter(updated_at__gt=self.watermark)
+        else:
+            qs = qs.filter(is_active=True, semantic_embedding__isnull=False)
+        changed = 0
+        upserts: List[Tuple[int, np.ndarray]] = []
+        removed: List[int] = []
+        rows = qs.order_by('updated_at', 'id').values_list('id', 'is_active', 'semantic_embedding', 'updated_at')
+        for pid, is_active, packed, updated_at in rows.iterator(chunk_size=batch_size):
+            changed += 1
+            vector = unpack_embedding(packed) if is_active else None
+            if vector is None:
+                removed.append(pid)
+            else:
+                upserts.append((pid, vector))
+            if self.watermark is None or updated_at > self.watermark:
+                self.watermark = updated_at
+        self.remove(removed)
+        self.upsert(upserts)
+        return changed
+
+    def search(self, vector: np.ndarray, k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Los ``k`` ids más similares a ``vector`` (coseno descendente) como [(property_id, similitud), ...]."""
+        if not len(self.ids) or vector is None:
+            return []
+        exclude = set(exclude)
+        scores = self.matrix @ np.asarray(vector, dtype=EMBEDDING_DTYPE)
+        wanted = min(len(scores), k + len(exclude))
+        if wanted <= 0:
+            return []
+        top = np.argpartition(-scores, wanted - 1)[:wanted]
+        top = top[np.lexsort((self.ids[top], -scores[top]))]
+        results = []
+        for i in top.tolist():
+            pid = int(self.ids[i])
+            if pid in exclude:
+                continue
+            results.append((pid, round(float(scores[i]), 4)))
+            if len(results) == k:
+                break
+        return results
+
+
+def _current_version() -> int:
+    try:
+        return cache.get_or_set(LISTING_INDEX_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        logger.warning('Caché no disponible para el índice de embeddings; se reconstruye en memoria')
+        return 0
+
+
+def invalidate_listing_index():
+    """Fuerza la reconstrucción completa del índice (borrados y backfill de embeddings)."""
+    try:
+        cache.incr(LISTING_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(LISTING_INDEX_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        pass
+    _local_index.update(version=None, index=None, checked_at=0.0)
+
+
+def _store(version: int, index: ListingEmbeddingIndex):
+    if version:
+        try:
+            cache.set(LISTING_INDEX_CACHE_KEY.format(version=version), index, timeout=LISTING_INDEX_CACHE_TIMEOUT)
+        except Exception:
+            pass
+
+
+def get_listing_index() -> ListingEmbeddingIndex:
+    """
+    Índice vigente: memoria del proceso (refrescada incrementalmente), luego caché
+    y por último construcción completa desde la base de datos.
+    """
+    version = _current_version()
+    current = monotonic()
+    index: Optional[ListingEmbeddingIndex] = None
+    if version and _local_index['version'] == version:
+        index = _local_index['index']
+    if index is not None and current - _local_index['checked_at'] < LISTING_INDEX_REFRESH_SECONDS:
+        return index
+    if index is None and version:
+        try:
+            index = cache.get(LISTING_INDEX_CACHE_KEY.format(version=version))
+        except Exception:
+            index = None
+    if index is None:
+        index = ListingEmbeddingIndex.build()
+        _store(version, index)
+    elif index.refresh():
+        _store(version, index)
+    _local_index.update(version=version or None, index=index, checked_at=current)
+    return index
@@ -0,0 +1,181 @@
+"""
+Embeddings semánticos locales para Property y SearchProfile.
+
+Un vectorizador por hashing (sin red ni vocabulario que entrenar) convierte
+el texto de cada objeto en un vector de EMBEDDING_DIM dimensiones. El texto de
+una propiedad sale de su descripción, tipo y tags, y el de un perfil de sus
+vibes, lifestyle, ocupación y tipos deseados. Los tokens son palabras y
+bigramas normalizados (minúsculas, sin tildes ni stopwords), se usa tf
+sublineal y el vector se normaliza a norma 1, así que el coseno es un producto
+punto.
+
+Los vectores se guardan en ``semantic_embedding`` como float32 little-endian
+empaquetado, en base64 y con un prefijo de versión porque la columna es de texto.
+Las señales ``pre_save`` los recalculan en cada guardado.
+
+En el matching de propiedades la similitud aporta un boost de hasta
+MATCH_SEMANTIC_BOOST puntos, igual que el boost por favorito.
+"""
+import base64
+import math
+import re
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+EMBEDDING_DIM = 128
+EMBEDDING_PREFIX = 'hv1:'
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+SEMANTIC_BOOST = float(getattr(settings, 'MATCH_SEMANTIC_BOOST', 5.0))
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset((
+    'con', 'de', 'del', 'el', 'en', 'es', 'la', 'las', 'lo', 'los', 'para', 'por', 'que', 'se', 'sin', 'su', 'sus',
+    'un', 'una', 'uno', 'unos', 'unas', 'al', 'muy', 'mas', 'como', 'este', 'esta', 'todo', 'todos', 'cerca',
+))
+
+# Peso de cada campo en el vector (los tags y vibes describen mejor que la prosa)
+PROPERTY_FIELD_WEIGHTS = {'description': 1.0, 'type': 1.0, 'tags': 2.0}
+PROFILE_FIELD_WEIGHTS = {'vibes': 2.0, 'lifestyle': 1.0, 'occupation': 1.0, 'desired_types': 1.0}
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras normalizadas y bigramas de palabras consecutivas."""
+    words = [w for w in TOKEN_RE.findall(_normalize(text)) if len(w) > 2 and w not in STOPWORDS]
+    return words + [f'{a}_{b}' for a, b in zip(words, words[1:])]
+
+
+def _texts(value) -> Iterable[str]:
+    """Textos de un valor JSON: strings y números, y las claves con valor True."""
+    if value is None or value is False:
+        return
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield str(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if item is True:
+                yield str(key)
+            else:
+                yield from _texts(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _texts(item)
+
+
+def embed_fields(fields: Dict[str, object], weights: Dict[str, float]) -> np.ndarray:
+    """
+    Vector normalizado de los campos indicados: cada token suma ``peso * (1 + log tf)``
+    con signo en la dimensión que le asigna su hash (crc32, estable entre procesos).
+    """
+    counts: Dict[str, float] = {}
+    for field, weight in weights.items():
+        field_counts: Dict[str, int] = {}
+        for text in _texts(fields.get(field)):
+            for token in tokenize(text):
+                field_counts[token] = field_counts.get(token, 0) + 1
+        for token, tf in field_counts.items():
+            counts[token] = counts.get(token, 0.0) + weight * (1.0 + math.log(tf))
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float64)
+    for token, value in counts.items():
+        h = zlib.crc32(token.encode('utf-8'))
+        vector[h % EMBEDDING_DIM] += value if h & 0x80000000 else -value
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.astype(EMBEDDING_DTYPE)
+
+
+def embed_property(property_obj) -> np.ndarray:
+    return embed_fields({
+        'description': getattr(property_obj, 'description', None),
+        'type': getattr(property_obj, 'type', None),
+        'tags': getattr(property_obj, 'tags', None),
+    }, PROPERTY_FIELD_WEIGHTS)
+
+
+def embed_profile(profile) -> np.ndarray:
+    return embed_fields({
+        'vibes': getattr(profile, 'vibes', None),
+        'lifestyle': getattr(profile, 'lifestyle', None),
+        'occupation': getattr(profile, 'occupation', None),
+        'desired_types': getattr(profile, 'desired_types', None),
+    }, PROFILE_FIELD_WEIGHTS)
+
+
+def pack_embedding(vector: np.ndarray) -> Optional[str]:
+    """float32 empaquetado en base64; None para un vector nulo (texto vacío)."""
+    if not np.any(vector):
+        return None
+    return EMBEDDING_PREFIX + base64.b64encode(np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()).decode('ascii')
+
+
+def unpack_embedding(value) -> Optional[np.ndarray]:
+    """Vector guardado o None si falta, es de otra versión o está corrupto."""
+    if not value or not isinstance(value, str) or not value.startswith(EMBEDDING_PREFIX):
+        return None
+    try:
+        raw = base64.b64decode(value[len(EMBEDDING_PREFIX):], validate=True)
+    except (ValueError, TypeError):
+        return None
+    if len(raw) != EMBEDDING_DIM * EMBEDDING_DTYPE.itemsize:
+        return None
+    return np.frombuffer(raw, dtype=EMBEDDING_DTYPE)
+
+
+def semantic_score(left: Optional[np.ndarray], right: Optional[np.ndarray]) -> float:
+    """Similitud coseno recortada a [0, 100]; 0 si falta alguno de los vectores."""
+    if left is None or right is None:
+        return 0.0
+    return max(0.0, float(np.dot(left, right))) * 100
+
+
+def semantic_scores(left: List[Optional[np.ndarray]], right: List[Optional[np.ndarray]], left_idx, right_idx) -> np.ndarray:
+    """
+    ``semantic_score`` de los pares alineados. Se calcula par a par con la misma
+    función que la versión escalar para obtener exactamente los mismos valores.
+    """
+    return np.array([semantic_score(left[i], right[j]) for i, j in zip(left_idx, right_idx)], dtype=np.float64)
+
+
+def backfill_embeddings(batch_size: int = 500, force: bool = False) -> Dict[str, int]:
+    """
+    Calcula los embeddings faltantes (o todos con ``force``) de propiedades y
+    perfiles con ``bulk_update``. Retorna la cantidad actualizada por modelo.
+    """
+    from matching.models import SearchProfile
+    from property.models import Property
+    from utils.embedding_index import invalidate_listing_index
+
+    updated = {}
+    for model, embed in ((Property, embed_property), (SearchProfile, embed_profile)):
+        qs = model.objects.all() if force else model.objects.filter(semantic_embedding__isnull=True)
+        pending = []
+        count = 0
+        for obj in qs.order_by('pk').iterator(chunk_size=batch_size):
+            packed = pack_embedding(embed(obj))
+            if packed == obj.semantic_embedding:
+                continue
+            obj.semantic_embedding = packed
+            pending.append(obj)
+            if len(pending) >= batch_size:
+                model.objects.bulk_update(pending, ['semantic_embedding'])
+                count += len(pending)
+                pending = []
+        if pending:
+            model.objects.bulk_update(pending, ['semantic_embedding'])
+            count += len(pending)
+        updated[model._meta.model_name] = count
+    # bulk_update no toca updated_at: el índice incremental no vería estos cambios
+    invalidate_listing_index()
+    return updated
@@ -0,0 +1,317 @@
+"""
+Benchmark del motor de matching.
+
+``synthesize_dataset`` genera con ``bulk_create`` un conjunto sintético a la
+escala pedida (zonas en grilla sobre Santa Cruz, propietarios, agentes,
+propiedades con amenities, reseñas y fotos, y perfiles de búsqueda con vibes,
+amenities y zonas preferidas) y reconstruye las features de matching que las
+señales calcularían una a una. ``run_benchmark`` mide sobre una muestra los
+matchers de propiedades, roomies y agentes y el matching inverso al crear una
+propiedad, y arma un reporte JSON (latencia p50/p95, consultas y throughput)
+pensado para comparar corridas entre commits.
+"""
+import random
+import subprocess
+import uuid
+from time import perf_counter
+from typing import Callable, Dict, List
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point, Polygon
+from django.utils.timezone import now
+
+from amenity.models import Amenity
+from matching.models import SearchProfile
+from photo.models import Photo
+from property.models import Property
+from review.models import Review
+from user.models import UserProfile
+from utils.agent_roster import invalidate_agent_roster
+from utils.batch_matching import ScoringStats
+from utils.bitsets import to_mask
+from utils.candidate_index import invalidate_profile_index
+from utils.match_features import refresh_property_match_features, vibe_mask_from_ids, vibe_tag_ids
+from utils.match_profiling import profiling
+
+BENCHMARK_SCALES = {
+    'small': {'zones': 5, 'properties': 500, 'profiles': 2000, 'agents': 10},
+    'medium': {'zones': 20, 'properties': 10000, 'profiles': 50000, 'agents': 50},
+    'large': {'zones': 50, 'properties': 50000, 'profiles': 200000, 'agents': 200},
+}
+
+MATCHERS = ('property', 'roommate', 'agent', 'reverse')
+
+# Centro de Santa Cruz de la Sierra y tamaño de cada celda de la grilla de zonas (grados)
+ORIGIN = (-63.18, -17.78)
+ZONE_CELL = 0.01
+
+VIBES = [
+    'estudiante', 'tranquilo', 'ordenado', 'trabajador', 'deportista', 'social', 'musico', 'creativo',
+    'programador', 'gamer', 'nocturno', 'lector', 'emprendedor', 'viajero',
+]
+OCCUPATIONS = ['Estudiante', 'Profesional', 'Empresario', 'Freelancer', 'Comerciante']
+PROPERTY_TYPES = ['casa', 'departamento', 'habitacion', 'anticretico']
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _zone_grid(count: int, tag: str) -> List:
+    """Zonas cuadradas contiguas alrededor del centro."""
+    side = max(1, int(np.ceil(np.sqrt(count))))
+    zones = []
+    for i in range(count):
+        x0 = ORIGIN[0] + (i % side - side / 2) * ZONE_CELL
+        y0 = ORIGIN[1] + (i // side - side / 2) * ZONE_CELL
+        x1, y1 = x0 + ZONE_CELL, y0 + ZONE_CELL
+        zones.append({
+            'name': f'Bench {tag} {i}',
+            'bounds': Polygon(((x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0))),
+            'center': ((x0 + x1) / 2, (y0 + y1) / 2),
+        })
+    return zones
+
+
+def _bulk_users(prefix: str, count: int, batch_size: int) -> List[int]:
+    User.objects.bulk_create(
+        [User(username=f'{prefix}{i}', password='!') for i in range(count)], batch_size=batch_size,
+    )
+    return list(User.objects.filter(username__startswith=prefix).order_by('id').values_list('id', flat=True))
+
+
+def synthesize_dataset(zones: int, properties: int, profiles: int, agents: int = 10, seed: int = 42,
+                       batch_size: int = 2000) -> Dict:
+    """
+    Crea el dataset sintético y retorna {'tag', 'zone_ids', 'property_ids', 'profile_ids', 'agent_ids'}.
+    Las filas se insertan con ``bulk_create`` (sin señales), así que las máscaras de
+    perfiles y la tabla PropertyMatchFeatures se calculan aquí en bloque.
+    """
+    from zone.models import Zone
+
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+
+    zone_specs = _zone_grid(zones, tag)
+    Zone.objects.bulk_create([Zone(name=z['name'], bounds=z['bounds']) for z in zone_specs], batch_size=batch_size)
+    zone_ids = list(Zone.objects.filter(name__startswith=f'Bench {tag} ').order_by('id').values_list('id', flat=True))
+    centers = [z['center'] for z in zone_specs]
+
+    amenity_ids = list(Amenity.objects.values_list('id', flat=True))
+    if len(amenity_ids) < 15:
+        Amenity.objects.bulk_create([Amenity(name=f'Bench {tag} amenity {i}') for i in range(15 - len(amenity_ids))])
+        amenity_ids = list(Amenity.objects.values_list('id', flat=True))
+
+    owner_ids = _bulk_users(f'bench_{tag}_owner_', max(1, properties // 10), batch_size)
+    agent_ids = _bulk_users(f'bench_{tag}_agent_', agents, batch_size)
+    tenant_ids = _bulk_users(f'bench_{tag}_tenant_', profiles, batch_size)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=uid, user_type='propietario') for uid in owner_ids]
+        + [UserProfile(user_id=uid, user_type='agente', is_agent=True,
+                       agent_commission_rate=round(rng.uniform(1.0, 8.0), 2)) for uid in agent_ids]
+        + [UserProfile(user_id=uid, user_type='inquilino') for uid in tenant_ids],
+        batch_size=batch_size,
+    )
+
+    # Propiedades: precio según tipo, ubicada dentro de una zona al azar
+    props = []
+    for i in range(properties):
+        zone_index = rng.randrange(len(zone_ids))
+        cx, cy = centers[zone_index]
+        prop_type = rng.choice(PROPERTY_TYPES)
+        price = rng.randint(300, 600) if prop_type == 'habitacion' else rng.randint(600, 2000)
+        allows_roommates = rng.random() < 0.4
+        props.append(Property(
+            owner_id=rng.choice(owner_ids),
+            agent_id=rng.choice(agent_ids) if agent_ids and rng.random() < 0.3 else None,
+            type=prop_type,
+            address=f'Bench {tag} #{i}',
+            location=Point(cx + rng.uniform(-ZONE_CELL / 2, ZONE_CELL / 2), cy + rng.uniform(-ZONE_CELL / 2, ZONE_CELL / 2)),
+            zone_id=zone_ids[zone_index],
+            price=price,
+            description='Propiedad sintética de benchmark',
+            bedrooms=rng.randint(1, 4),
+            bathrooms=rng.randint(1, 3),
+            allows_roommates=allows_roommates,
+            max_occupancy=rng.randint(2, 5) if allows_roommates else None,
+            preferred_tenant_gender=rng.choice(['any', 'any', 'male', 'female']),
+            children_allowed=rng.random() < 0.7,
+            pets_allowed=rng.random() < 0.6,
+            smokers_allowed=rng.random() < 0.4,
+            students_only=rng.random() < 0.1,
+            stable_job_required=rng.random() < 0.2,
+            tags=rng.sample(VIBES, rng.randint(0, 3)),
+        ))
+    Property.objects.bulk_create(props, batch_size=batch_size)
+    property_ids = list(Property.objects.filter(address__startswith=f'Bench {tag} #').order_by('id').values_list('id', flat=True))
+
+    Through = Property.amenities.through
+    Through.objects.bulk_create(
+        [Through(property_id=pid, amenity_id=aid) for pid in property_ids for aid in rng.sample(amenity_ids, rng.randint(2, 8))],
+        batch_size=batch_size,
+    )
+    Review.objects.bulk_create(
+        [
+            Review(property_id=pid, user_id=rng.choice(tenant_ids), rating=rng.randint(1, 5), comment='Reseña sintética')
+            for pid in property_ids for _ in range(rng.randint(0, 3))
+        ] if tenant_ids else [],
+        batch_size=batch_size,
+    )
+    Photo.objects.bulk_create(
+        [Photo(property_id=pid, image='properties/benchmark.jpg') for pid in property_ids for _ in range(rng.randint(1, 4))],
+        batch_size=batch_size,
+    )
+
+    # Perfiles de búsqueda con máscaras ya calculadas (pre_save/m2m_changed no corren con bulk_create)
+    vibe_ids = vibe_tag_ids(VIBES)
+    profile_amenities = {}
+    search_profiles = []
+    for uid in tenant_ids:
+        cx, cy = centers[rng.randrange(len(centers))]
+        budget_min = rng.randint(300, 900)
+        vibes = rng.sample(VIBES, rng.randint(1, 4))
+        amenities = rng.sample(amenity_ids, rng.randint(0, 5))
+        profile_amenities[uid] = amenities
+        search_profiles.append(SearchProfile(
+            user_id=uid,
+            location=Point(cx + rng.uniform(-0.01, 0.01), cy + rng.uniform(-0.01, 0.01)),
+            budget_min=budget_min,
+            budget_max=budget_min + rng.randint(100, 1200),
+            age=rng.randint(18, 45),
+            gender=rng.choice(['male', 'female']),
+            children_count=rng.choice([0, 0, 0, 1, 2]),
+            pets_count=rng.choice([0, 0, 1]),
+            smoker=rng.random() < 0.2,
+            stable_job=rng.random() < 0.6,
+            occupation=rng.choice(OCCUPATIONS),
+            roommate_preference=rng.choice(['no', 'looking', 'open']),
+            roommate_preferences={'gender': rng.choice(['any', 'male', 'female']), 'smoker_ok': rng.random() < 0.5},
+            vibes=vibes,
+            vibe_mask=vibe_mask_from_ids(vibes, vibe_ids),
+            amenity_mask=to_mask(amenities),
+        ))
+    SearchProfile.objects.bulk_create(search_profiles, batch_size=batch_size)
+    profile_rows = list(SearchProfile.objects.filter(user_id__in=tenant_ids).order_by('id').values_list('id', 'user_id'))
+    profile_ids = [pid for pid, _ in profile_rows]
+
+    ProfileAmenities = SearchProfile.amenities.through
+    ProfileZones = SearchProfile.preferred_zones.through
+    ProfileAmenities.objects.bulk_create(
+        [ProfileAmenities(searchprofile_id=pid, amenity_id=aid) for pid, uid in profile_rows for aid in profile_amenities[uid]],
+        batch_size=batch_size,
+    )
+    ProfileZones.objects.bulk_create(
+        [ProfileZones(searchprofile_id=pid, zone_id=zid) for pid, _ in profile_rows
+         for zid in rng.sample(zone_ids, min(len(zone_ids), rng.randint(1, 3)))],
+        batch_size=batch_size,
+    )
+
+    for chunk in _chunks(property_ids, batch_size):
+        refresh_property_match_features(chunk)
+    invalidate_profile_index()
+    invalidate_agent_roster()
+    return {
+        'tag': tag,
+        'zone_ids': zone_ids,
+        'property_ids': property_ids,
+        'profile_ids': profile_ids,
+        'agent_ids': agent_ids,
+    }
+
+
+def _measure(fn: Callable[[], int]) -> Dict:
+    """Ejecuta ``fn`` (retorna candidatos evaluados) midiendo tiempo, consultas y fases."""
+    with profiling(publish=False) as profiler:
+        started = perf_counter()
+        candidates = fn()
+        elapsed = perf_counter() - started
+    return {'seconds': elapsed, 'queries': profiler.queries, 'candidates': candidates or 0, 'phases': profiler.phases}
+
+
+def _summarize(samples: List[Dict]) -> Dict:
+    seconds = np.array([s['seconds'] for s in samples], dtype=np.float64)
+    total = float(seconds.sum())
+    candidates = sum(s['candidates'] for s in samples)
+    phases: Dict[str, Dict] = {}
+    for sample in samples:
+        for name, data in sample['phases'].items():
+            row = phases.setdefault(name, {'calls': 0, 'total_ms': 0.0, 'queries': 0})
+            row['calls'] += data['calls']
+            row['total_ms'] += data['seconds'] * 1000
+            row['queries'] += data['queries']
+    return {
+        'samples': len(samples),
+        'p50_ms': round(float(np.percentile(seconds, 50)) * 1000, 3),
+        'p95_ms': round(float(np.percentile(seconds, 95)) * 1000, 3),
+        'mean_ms': round(float(seconds.mean()) * 1000, 3),
+        'max_ms': round(float(seconds.max()) * 1000, 3),
+        'queries_per_call': round(sum(s['queries'] for s in samples) / len(samples), 2),
+        'calls_per_second': round(len(samples) / total, 2) if total else 0.0,
+        'candidates': candidates,
+        'candidates_per_second': round(candidates / total, 2) if total else 0.0,
+        'phases': {name: {**row, 'total_ms': round(row['total_ms'], 3)} for name, row in sorted(phases.items())},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+
+def run_benchmark(dataset: Dict, samples: int = 20, matchers=MATCHERS, seed: int = 42) -> Dict:
+    """
+    Mide cada matcher sobre ``samples`` perfiles (o propiedades para ``reverse``)
+    elegidos al azar del dataset y retorna el reporte por matcher.
+    """
+    from matching.tasks import compute_reverse_matches_for_property
+    from utils.matching import (
+        create_agent_matches_for_profile, create_property_matches_for_profile, create_roommate_matches_for_profile,
+    )
+
+    rng = random.Random(seed)
+    profile_ids = rng.sample(dataset['profile_ids'], min(samples, len(dataset['profile_ids'])))
+    property_ids = rng.sample(dataset['property_ids'], min(samples, len(dataset['property_ids'])))
+    profiles = list(SearchProfile.objects.filter(id__in=profile_ids).select_related('user'))
+
+    def scored(creator):
+        def run(profile):
+            stats = ScoringStats()
+            creator(profile, stats=stats)
+            return stats.candidates
+        return run
+
+    runners = {
+        'property': (profiles, scored(create_property_matches_for_profile)),
+        'roommate': (profiles, scored(create_roommate_matches_for_profile)),
+        'agent': (profiles, create_agent_matches_for_profile),
+        'reverse': (property_ids, lambda pid: compute_reverse_matches_for_property(pid)['candidates']),
+    }
+    report = {}
+    for name in matchers:
+        subjects, runner = runners[name]
+        if not subjects:
+            continue
+        report[name] = _summarize([_measure(lambda subject=subject: runner(subject)) for subject in subjects])
+    return report
+
+
+def benchmark_report(scale: Dict, dataset: Dict, results: Dict, seed: int, synth_seconds: float) -> Dict:
+    """Reporte JSON completo: commit, escala, tiempo de síntesis y resultados por matcher."""
+    return {
+        'commit': _git_commit(),
+        'created_at': now().isoformat(),
+        'seed': seed,
+        'scale': {
+            **scale,
+            'properties_created': len(dataset['property_ids']),
+            'profiles_created': len(dataset['profile_ids']),
+        },
+        'synth_seconds': round(synth_seconds, 3),
+        'matchers': results,
+    }
@@ -0,0 +1,201 @@
+"""
+Tabla desnormalizada de features de Property para el matching (PropertyMatchFeatures).
+
+Cada fila guarda el promedio y cantidad de reseñas, las máscaras de bits de
+amenities y tags (ver ``utils.bitsets``), los tags normalizados, la fecha de
+frescura, el precio por persona y la latitud/longitud de la propiedad. Las señales de ``matching.signals`` llaman a
+``refresh_property_match_features`` cuando cambia alguna de las fuentes.
+
+También guarda ``nearby_count``, la cantidad de propiedades activas a menos de
+NEARBY_RADIUS_KM que muestran los listados. Depende de las propiedades vecinas:
+al crear, mover, activar/desactivar o borrar una propiedad se recalcula la suya y
+la de sus vecinas (``refresh_nearby_counts_around``). La tarea periódica
+``refresh_all_nearby_counts`` corrige lo que cambie con ``QuerySet.update``.
+
+Los perfiles guardan sus propias máscaras (``SearchProfile.amenity_mask`` y
+``vibe_mask``) y los vibes/tags obtienen su id estable de la tabla VibeTag.
+"""
+from typing import Dict, Iterable, List
+
+from django.db.models import Avg, Count
+from django.utils.timezone import now
+
+from matching.models import PropertyMatchFeatures, SearchProfile, VibeTag
+from property.models import Property
+from review.models import Review
+from utils.bitsets import to_mask
+from utils.spatial import nearby_count_expression, nearby_properties
+
+VIBE_TAG_MAX_LENGTH = VibeTag._meta.get_field('name').max_length
+
+MATCH_FEATURE_FIELDS = ('rating_avg', 'amenity_mask', 'tag_mask', 'price_per_person', 'latitude', 'longitude')
+
+# Radio de nearby_count (el mismo que Property.get_nearby_properties por defecto)
+NEARBY_RADIUS_KM = 2
+
+
+def vibe_tag_ids(names: Iterable[str]) -> Dict[str, int]:
+    """
+    Id estable de cada vibe/tag (se crean los que no existen). Los nombres se usan
+    tal cual para conservar la semántica de comparación exacta del matching; los
+    que exceden el largo de VibeTag.name no reciben id.
+    """
+    names = {str(n) for n in names if len(str(n)) <= VIBE_TAG_MAX_LENGTH}
+    if not names:
+        return {}
+    ids = dict(VibeTag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - set(ids)
+    if missing:
+        VibeTag.objects.bulk_create([VibeTag(name=n) for n in missing], ignore_conflicts=True)
+        ids.update(VibeTag.objects.filter(name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def vibe_mask_from_ids(names, ids: Dict[str, int]) -> bytes:
+    """Máscara de bits de una lista de vibes/tags con ids ya resueltos."""
+    if not isinstance(names, (list, tuple)):
+        return b''
+    return to_mask(ids[str(n)] for n in names if str(n) in ids)
+
+
+def vibe_mask(names) -> bytes:
+    """Máscara de bits de una lista de vibes/tags."""
+    if not isinstance(names, (list, tuple)):
+        return b''
+    return vibe_mask_from_ids(names, vibe_tag_ids(names))
+
+
+def refresh_profile_amenity_masks(profile_ids: Iterable[int]) -> Dict[int, bytes]:
+    """
+    Recalcula ``SearchProfile.amenity_mask`` de los perfiles indicados. También
+    actualiza ``updated_at`` para que el siguiente refresh haga un recálculo completo.
+    Retorna {profile_id: máscara}.
+    """
+    ids = list(set(profile_ids))
+    amenities: Dict[int, List[int]] = {pid: [] for pid in ids}
+    for pid, amenity_id in SearchProfile.amenities.through.objects.filter(searchprofile_id__in=ids).values_list('searchprofile_id', 'amenity_id'):
+        amenities[pid].append(amenity_id)
+    masks = {pid: to_mask(amenity_ids) for pid, amenity_ids in amenities.items()}
+    changed_at = now()
+    for pid, mask in masks.items():
+        SearchProfile.objects.filter(pk=pid).update(amenity_mask=mask, updated_at=changed_at)
+    return masks
+
+
+def normalize_tags(tags) -> List[str]:
+    """Tags en minúsculas, sin espacios extremos ni duplicados, ordenados."""
+    if not isinstance(tags, (list, tuple)):
+        return []
+    return sorted({str(t).strip().lower() for t in tags if str(t).strip()})
+
+
+def refresh_property_match_features(property_ids: Iterable[int]) -> int:
+    """
+    Recalcula las features de las propiedades indicadas con un número fijo de
+    consultas (propiedades, reseñas agrupadas, amenities e ids de tags) y las guarda con upsert.
+    Retorna la cantidad de filas escritas.
+    """
+    ids = list(set(property_ids))
+    if not ids:
+        return 0
+    properties = list(Property.objects.filter(id__in=ids).values(
+        'id', 'price', 'max_occupancy', 'created_at', 'tags', 'location',
+    ))
+    ratings = {
+        pid: (avg, count)
+        for pid, avg, count in Review.objects.filter(property_id__in=ids)
+        .values('property_id').annotate(avg=Avg('rating'), count=Count('id'))
+        .values_list('property_id', 'avg', 'count')
+    }
+    amenities: Dict[int, List[int]] = {}
+    for pid, amenity_id in Property.amenities.through.objects.filter(property_id__in=ids).values_list('property_id', 'amenity_id'):
+        amenities.setdefault(pid, []).append(amenity_id)
+    tag_ids = vibe_tag_ids(t for prop in properties if isinstance(prop['tags'], (list, tuple)) for t in prop['tags'])
+
+    rows = []
+    for prop in properties:
+        avg, count = ratings.get(prop['id'], (None, 0))
+        per_person = None
+        if prop['max_occupancy']:
+            per_person = float(prop['price']) / max(prop['max_occupancy'], 1)
+        location = prop['location']
+        rows.append(PropertyMatchFeatures(
+            property_id=prop['id'],
+            rating_avg=avg,
+            rating_count=count,
+            amenity_mask=to_mask(amenities.get(prop['id'], [])),
+            tag_mask=vibe_mask_from_ids(prop['tags'], tag_ids),
+            tags=normalize_tags(prop['tags']),
+            fresh_since=prop['created_at'],
+            price_per_person=per_person,
+            latitude=location.y if location is not None else None,
+            longitude=location.x if location is not None else None,
+        ))
+    PropertyMatchFeatures.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['property'],
+        update_fields=[
+            'rating_avg', 'rating_count', 'amenity_mask', 'tag_mask', 'tags', 'fresh_since',
+            'price_per_person', 'latitude', 'longitude', 'updated_at',
+        ],
+    )
+    return len(rows)
+
+
+def match_feature_rows(property_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Features por property_id en una sola consulta. Las propiedades sin fila
+    (p. ej. escritas con ``QuerySet.update``) se recalculan antes de leer.
+    """
+    ids = list(property_ids)
+    features = {
+        row['property_id']: row
+        for row in PropertyMatchFeatures.objects.filter(property_id__in=ids).values('property_id', *MATCH_FEATURE_FIELDS)
+    }
+    missing = [pid for pid in ids if pid not in features]
+    if missing and refresh_property_match_features(missing):
+        features.update(
+            (row['property_id'], row)
+            for row in PropertyMatchFeatures.objects.filter(property_id__in=missing).values('property_id', *MATCH_FEATURE_FIELDS)
+        )
+    return features
+
+
+def property_match_features(property_obj) -> Dict:
+    """
+    Features de una sola propiedad. Usa ``property_obj.match_features`` si ya está
+    cargada (``select_related('match_features')``) y si no la lee o reconstruye.
+    """
+    try:
+        features = property_obj.match_features
+        return {f: getattr(features, f) for f in MATCH_FEATURE_FIELDS}
+    except PropertyMatchFeatures.DoesNotExist:
+        return match_feature_rows([property_obj.id]).get(property_obj.id, {})
+
+
+def refresh_nearby_counts(property_ids: Iterable[int], batch_size: int = 1000) -> int:
+    """
+    Recalcula ``nearby_count`` de las propiedades indicadas: un SELECT con la
+    subconsulta espacial correlacionada y un ``bulk_update``. Retorna las filas actualizadas.
+    """
+    ids = list(set(property_ids))
+    if not ids:
+        return 0
+    counts = Property.objects.filter(id__in=ids).annotate(
+        nearby=nearby_count_expression(NEARBY_RADIUS_KM)
+    ).values_list('id', 'nearby')
+    rows = [PropertyMatchFeatures(property_id=pid, nearby_count=nearby or 0) for pid, nearby in counts]
+    return PropertyMatchFeatures.objects.bulk_update(rows, ['nearby_count'], batch_size=batch_size)
+
+
+def refresh_nearby_counts_around(property_id, points) -> int:
+    """
+    Recalcula ``nearby_count`` de la propiedad (``None`` si se borró) y de todas las
+    que están a menos de NEARBY_RADIUS_KM de alguno de ``points`` (ubicación nueva y anterior).
+    """
+    ids = {property_id} if property_id is not None else set()
+    for point in points:
+        if point is not None:
+            ids.update(nearby_properties(Property.objects.all(), point, NEARBY_RADIUS_KM).values_list('id', flat=True))
+    return refresh_nearby_counts(ids)
@@ -0,0 +1,259 @@
+"""
+Instrumentación opcional del matching.
+
+Con ``MATCH_PROFILING`` activo (o dentro de ``profiling()``) se registra, por
+fase, el tiempo de reloj, la cantidad de llamadas y las consultas SQL
+ejecutadas, además de los candidatos puntuados por tipo de match. Las fases son
+las etapas del pipeline (``refresh.property``, ``batch.features``, ``write``...)
+y los sub-scores de ``calculate_property_match_score`` (``component.location``,
+``component.price``...). Sin profiler activo cada punto de medición es una
+consulta a un ContextVar, así que el costo en producción es despreciable.
+
+Los totales se acumulan en caché con ``incr`` (compartidos entre los workers de
+Celery y los procesos web) y se exponen como JSON para staff y como contadores
+en formato de exposición de Prometheus.
+"""
+import logging
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PHASES_KEY = 'matching:profiling:phases'
+PROFILE_METRIC_KEY = 'matching:profiling:{kind}:{name}:{field}'
+PROFILE_TIMEOUT = None
+
+# Los segundos se acumulan como microsegundos enteros para poder usar incr
+MICROSECONDS = 1_000_000
+
+_active: ContextVar[Optional['MatchProfiler']] = ContextVar('match_profiler', default=None)
+
+
+class MatchProfiler:
+    """Tiempos, llamadas y consultas por fase de una corrida de matching."""
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.candidates: Dict[str, int] = {}
+        self.queries = 0
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def record(self, name: str, seconds: float, queries: int = 0):
+        phase = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0, 'queries': 0})
+        phase['calls'] += 1
+        phase['seconds'] += seconds
+        phase['queries'] += queries
+
+    @contextmanager
+    def phase(self, name: str):
+        started, queries = perf_counter(), self.queries
+        try:
+            yield self
+        finally:
+            self.record(name, perf_counter() - started, self.queries - queries)
+
+    def lap(self, prefix: str) -> 'Lap':
+        return Lap(self, prefix)
+
+    def add_candidates(self, match_type: str, count: int):
+        self.candidates[match_type] = self.candidates.get(match_type, 0) + count
+
+    def as_dict(self) -> Dict:
+        return summarize(self.phases, self.candidates)
+
+
+class Lap:
+    """Cronómetro por vueltas: cada llamada registra el tramo desde la anterior."""
+
+    def __init__(self, profiler: MatchProfiler, prefix: str):
+        self.profiler = profiler
+        self.prefix = prefix
+        self.started = perf_counter()
+        self.queries = profiler.queries
+
+    def __call__(self, name: str):
+        current, queries = perf_counter(), self.profiler.queries
+        self.profiler.record(f'{self.prefix}.{name}', current - self.started, queries - self.queries)
+        self.started, self.queries = current, queries
+
+
+def _no_lap(name: str):
+    return None
+
+
+def active_profiler() -> Optional[MatchProfiler]:
+    return _active.get()
+
+
+def profiling_enabled() -> bool:
+    return bool(getattr(settings, 'MATCH_PROFILING', False))
+
+
+def phase(name: str):
+    """Context manager que mide una fase si hay un profiler activo (no-op si no)."""
+    profiler = _active.get()
+    return profiler.phase(name) if profiler is not None else nullcontext()
+
+
+def lap(prefix: str):
+    """Cronómetro por vueltas para los sub-scores; sin profiler activo retorna un no-op."""
+    profiler = _active.get()
+    return profiler.lap(prefix) if profiler is not None else _no_lap
+
+
+def add_candidates(match_type: str, count: int):
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.add_candidates(match_type, count)
+
+
+@contextmanager
+def profiling(publish: bool = True):
+    """
+    Activa un profiler para el bloque (cuenta las consultas con un execute_wrapper
+    de la conexión) y, si ``publish``, suma sus totales a los contadores en caché.
+    Si ya hay un profiler activo se reutiliza, así las corridas anidadas suman al externo.
+    """
+    current = _active.get()
+    if current is not None:
+        yield current
+        return
+    profiler = MatchProfiler()
+    token = _active.set(profiler)
+    try:
+        with connection.execute_wrapper(profiler._count_query):
+            yield profiler
+    finally:
+        _active.reset(token)
+        if publish:
+            publish_profile(profiler)
+
+
+def maybe_profiling():
+    """``profiling()`` si MATCH_PROFILING está activo; si no, un context manager vacío."""
+    if _active.get() is not None or profiling_enabled():
+        return profiling()
+    return nullcontext()
+
+
+def _metric_key(kind: str, name: str, field: str) -> str:
+    return PROFILE_METRIC_KEY.format(kind=kind, name=name, field=field)
+
+
+def _incr(key: str, delta: int):
+    if not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # La clave no existe: add evita pisar un valor creado en paralelo
+        if not cache.add(key, delta, timeout=PROFILE_TIMEOUT):
+            cache.incr(key, delta)
+
+
+def publish_profile(profiler: MatchProfiler):
+    """Suma los totales de la corrida a los contadores compartidos en caché."""
+    try:
+        names = set(cache.get(PROFILE_PHASES_KEY) or ())
+        new_names = (set(profiler.phases) | {f'candidates.{t}' for t in profiler.candidates}) - names
+        if new_names:
+            cache.set(PROFILE_PHASES_KEY, sorted(names | new_names), timeout=PROFILE_TIMEOUT)
+        for name, data in profiler.phases.items():
+            _incr(_metric_key('phase', name, 'calls'), data['calls'])
+            _incr(_metric_key('phase', name, 'us'), int(data['seconds'] * MICROSECONDS))
+            _incr(_metric_key('phase', name, 'queries'), data['queries'])
+        for match_type, count in profiler.candidates.items():
+            _incr(_metric_key('candidates', match_type, 'count'), count)
+    except Exception:
+        logger.warning('No se pudieron publicar las métricas de matching', exc_info=True)
+
+
+def collected_profile() -> Dict:
+    """Totales acumulados en caché con el mismo formato que ``MatchProfiler.as_dict``."""
+    names = cache.get(PROFILE_PHASES_KEY) or []
+    phase_names = [n for n in names if not n.startswith('candidates.')]
+    types = [n.split('.', 1)[1] for n in names if n.startswith('candidates.')]
+    keys = [_metric_key('phase', n, f) for n in phase_names for f in ('calls', 'us', 'queries')]
+    keys += [_metric_key('candidates', t, 'count') for t in types]
+    values = cache.get_many(keys)
+    phases = {
+        n: {
+            'calls': values.get(_metric_key('phase', n, 'calls'), 0),
+            'seconds': values.get(_metric_key('phase', n, 'us'), 0) / MICROSECONDS,
+            'queries': values.get(_metric_key('phase', n, 'queries'), 0),
+        }
+        for n in phase_names
+    }
+    candidates = {t: values.get(_metric_key('candidates', t, 'count'), 0) for t in types}
+    return summarize(phases, candidates)
+
+
+def reset_profile():
+    names = cache.get(PROFILE_PHASES_KEY) or []
+    keys = [_metric_key('phase', n, f) for n in names for f in ('calls', 'us', 'queries')]
+    keys += [_metric_key('candidates', n.split('.', 1)[1], 'count') for n in names if n.startswith('candidates.')]
+    cache.delete_many(keys + [PROFILE_PHASES_KEY])
+
+
+def summarize(phases: Dict[str, Dict], candidates: Dict[str, int]) -> Dict:
+    """Agrega promedios por fase y candidatos por segundo por tipo de match."""
+    rows = {}
+    for name, data in sorted(phases.items()):
+        calls = data['calls'] or 1
+        rows[name] = {
+            'calls': data['calls'],
+            'total_ms': round(data['seconds'] * 1000, 3),
+            'avg_ms': round(data['seconds'] * 1000 / calls, 4),
+            'queries': data['queries'],
+            'queries_per_call': round(data['queries'] / calls, 2),
+        }
+    throughput = {}
+    for match_type, count in sorted(candidates.items()):
+        seconds = phases.get(f'refresh.{match_type}', {}).get('seconds', 0.0)
+        throughput[match_type] = {
+            'candidates': count,
+            'candidates_per_second': round(count / seconds, 2) if seconds else 0.0,
+        }
+    return {'phases': rows, 'candidates': throughput}
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(summary: Dict) -> str:
+    """Contadores en formato de exposición de texto de Prometheus."""
+    lines = [
+        '# HELP habitto_match_phase_calls_total Ejecuciones de cada fase del matching.',
+        '# TYPE habitto_match_phase_calls_total counter',
+    ]
+    phases = summary['phases']
+    lines += [f'habitto_match_phase_calls_total{{phase="{_label(n)}"}} {d["calls"]}' for n, d in phases.items()]
+    lines += [
+        '# HELP habitto_match_phase_seconds_total Tiempo de reloj acumulado por fase del matching.',
+        '# TYPE habitto_match_phase_seconds_total counter',
+    ]
+    lines += [f'habitto_match_phase_seconds_total{{phase="{_label(n)}"}} {d["total_ms"] / 1000:.6f}' for n, d in phases.items()]
+    lines += [
+        '# HELP habitto_match_phase_queries_total Consultas SQL ejecutadas por fase del matching.',
+        '# TYPE habitto_match_phase_queries_total counter',
+    ]
+    lines += [f'habitto_match_phase_queries_total{{phase="{_label(n)}"}} {d["queries"]}' for n, d in phases.items()]
+    lines += [
+        '# HELP habitto_match_candidates_total Candidatos evaluados por tipo de match.',
+        '# TYPE habitto_match_candidates_total counter',
+    ]
+    lines += [
+        f'habitto_match_candidates_total{{match_type="{_label(t)}"}} {d["candidates"]}'
+        for t, d in summary['candidates'].items()
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,104 @@
+"""
+Política de retención de la tabla Match.
+
+Los matches pendientes que no se recalculan hace más de MATCH_PENDING_TTL_DAYS y
+los rechazados con más de MATCH_REJECTED_TTL_DAYS se mueven por lotes a
+ArchivedMatch (copia compacta sin metadata), a un export JSONL comprimido con
+gzip o simplemente se eliminan. Los matches con feedback se conservan porque
+son datos de entrenamiento del ajuste de pesos. Cada corrida informa filas y
+bytes recuperados (tamaño de las tuplas eliminadas según ``pg_column_size``).
+"""
+import gzip
+import json
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.expressions import RawSQL
+from django.utils.timezone import now
+
+from matching.models import ArchivedMatch, Match
+
+logger = logging.getLogger(__name__)
+
+RETENTION_MODES = ('archive', 'export', 'delete')
+
+ARCHIVE_FIELDS = ('id', 'match_type', 'subject_id', 'target_user_id', 'score', 'status', 'created_at', 'updated_at')
+
+
+def expired_matches(pending_days: int = None, rejected_days: int = None):
+    """QuerySet de matches sin feedback que superaron su TTL según el estado."""
+    pending_days = getattr(settings, 'MATCH_PENDING_TTL_DAYS', 30) if pending_days is None else pending_days
+    rejected_days = getattr(settings, 'MATCH_REJECTED_TTL_DAYS', 7) if rejected_days is None else rejected_days
+    current = now()
+    return Match.objects.filter(
+        Q(status='pending', updated_at__lt=current - timedelta(days=pending_days))
+        | Q(status='rejected', updated_at__lt=current - timedelta(days=rejected_days)),
+        feedback__isnull=True,
+    )
+
+
+def _row_bytes(model, ids) -> int:
+    """Tamaño en bytes de las tuplas indicadas del modelo."""
+    size = model.objects.filter(id__in=ids).aggregate(
+        total=Sum(RawSQL(f'pg_column_size({model._meta.db_table}.*)', []))
+    )['total']
+    return int(size or 0)
+
+
+def prune_expired_matches(mode: str = 'archive', pending_days: int = None, rejected_days: int = None,
+                          batch_size: int = 1000, export_path: Optional[str] = None, dry_run: bool = False) -> Dict:
+    """
+    Archiva, exporta o elimina los matches vencidos en lotes de ``batch_size``.
+    Retorna {'mode', 'rows', 'bytes_reclaimed', 'archive_bytes', 'batches'}; ``archive_bytes``
+    es lo que ocupa la copia (filas de ArchivedMatch o líneas JSONL sin comprimir).
+    """
+    if mode not in RETENTION_MODES:
+        raise ValueError(f'Modo de retención inválido: {mode}')
+    if mode == 'export' and not export_path:
+        raise ValueError('El modo export requiere export_path')
+    queryset = expired_matches(pending_days, rejected_days).order_by('id')
+    report = {'mode': mode, 'rows': 0, 'bytes_reclaimed': 0, 'archive_bytes': 0, 'batches': 0}
+    if dry_run:
+        ids = list(queryset.values_list('id', flat=True))
+        report['rows'] = len(ids)
+        report['bytes_reclaimed'] = sum(_row_bytes(Match, ids[i:i + batch_size]) for i in range(0, len(ids), batch_size))
+        return report
+
+    export = gzip.open(export_path, 'at', encoding='utf-8') if mode == 'export' else None
+    fields = ARCHIVE_FIELDS + ('metadata',) if export is not None else ARCHIVE_FIELDS
+    last_id = 0
+    try:
+        while True:
+            # Paginación por id: los lotes no se repiten aunque alguno quede sin borrar
+            batch = list(queryset.filter(id__gt=last_id).values(*fields)[:batch_size])
+            if not batch:
+                break
+            ids = [row['id'] for row in batch]
+            last_id = ids[-1]
+            with transaction.atomic():
+                reclaimed = _row_bytes(Match, ids)
+                if mode == 'archive':
+                    archived = ArchivedMatch.objects.bulk_create([
+                        ArchivedMatch(original_id=row['id'], **{f: row[f] for f in ARCHIVE_FIELDS if f != 'id'})
+                        for row in batch
+                    ])
+                    report['archive_bytes'] += _row_bytes(ArchivedMatch, [a.id for a in archived])
+                elif mode == 'export':
+                    for row in batch:
+                        line = json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+                        report['archive_bytes'] += len(line.encode('utf-8'))
+                        export.write(line)
+                _, deleted = Match.objects.filter(id__in=ids, feedback__isnull=True).delete()
+            report['rows'] += deleted.get(Match._meta.label, 0)
+            report['bytes_reclaimed'] += reclaimed
+            report['batches'] += 1
+    finally:
+        if export is not None:
+            export.close()
+    logger.info('Retención de matches: %s', report)
+    return report
@@ -0,0 +1,275 @@
+"""
+Ajuste offline de los pesos del score de propiedades.
+
+Las etiquetas salen de los resultados de los matches de propiedades: ``Match.status``
+accepted/rejected y, si el match sigue pendiente, el último ``MatchFeedback``
+like/dislike. Las features son los sub-scores guardados en
+``metadata['details']``, así que no hace falta recalcular nada para exportar.
+Se ajusta una regresión logística (Newton/IRLS vectorizado con NumPy y
+regularización L2) y los coeficientes se proyectan a pesos no negativos que
+suman 1, para que el score siga en la escala 0-100 y los umbrales
+(MATCH_MIN_SCORE) y cotas superiores conserven su significado.
+
+Cada ajuste se guarda como una versión de MatchWeightSet. El scorer lee la
+versión activa con ``get_property_weights`` (memoria del proceso, luego caché
+invalidada por versión): el costo por score no cambia, solo el vector de pesos.
+"""
+import csv
+import logging
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from matching.models import Match, MatchFeedback, MatchWeightSet
+
+logger = logging.getLogger(__name__)
+
+WEIGHT_KEYS = ('location', 'price', 'amenities', 'roommate', 'reputation', 'freshness', 'family', 'owner_prefs')
+DETAIL_KEYS = tuple(f'{key}_score' for key in WEIGHT_KEYS)
+
+WEIGHTS_VERSION_KEY = 'matching:weights:version'
+WEIGHTS_CACHE_KEY = 'matching:weights:property:{version}'
+WEIGHTS_CACHE_TIMEOUT = 60 * 60 * 24
+# Cada proceso revisa la versión en caché como máximo cada WEIGHTS_LOCAL_SECONDS
+WEIGHTS_LOCAL_SECONDS = 30
+
+_local_weights = {'version': None, 'weights': None, 'checked_at': 0.0}
+
+
+def _default_weights() -> Dict[str, float]:
+    from utils.matching import PROPERTY_MATCH_WEIGHTS
+    return dict(PROPERTY_MATCH_WEIGHTS)
+
+
+def _current_version() -> int:
+    try:
+        return cache.get_or_set(WEIGHTS_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        logger.warning('Caché no disponible para los pesos de matching; se leen de la base de datos')
+        return 0
+
+
+def invalidate_match_weights():
+    """Invalida los pesos en caché (se llama al activar o desactivar una versión)."""
+    try:
+        cache.incr(WEIGHTS_VERSION_KEY)
+    except ValueError:
+        cache.set(WEIGHTS_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        pass
+    _local_weights.update(version=None, weights=None, checked_at=0.0)
+
+
+def _load_active_weights() -> Dict[str, float]:
+    weights = _default_weights()
+    active = MatchWeightSet.objects.filter(match_type='property', is_active=True).values_list('weights', flat=True).first()
+    if active:
+        weights.update({key: float(active[key]) for key in WEIGHT_KEYS if key in active})
+    return weights
+
+
+def get_property_weights() -> Dict[str, float]:
+    """
+    Pesos vigentes del score de propiedades: los de la versión activa de
+    MatchWeightSet o los de PROPERTY_MATCH_WEIGHTS si no hay ninguna.
+    """
+    current = monotonic()
+    if _local_weights['weights'] is not None and current - _local_weights['checked_at'] < WEIGHTS_LOCAL_SECONDS:
+        return _local_weights['weights']
+    version = _current_version()
+    if version and _local_weights['version'] == version and _local_weights['weights'] is not None:
+        _local_weights['checked_at'] = current
+        return _local_weights['weights']
+    weights: Optional[Dict[str, float]] = None
+    if version:
+        try:
+            weights = cache.get(WEIGHTS_CACHE_KEY.format(version=version))
+        except Exception:
+            weights = None
+    if weights is None:
+        weights = _load_active_weights()
+        if version:
+            try:
+                cache.set(WEIGHTS_CACHE_KEY.format(version=version), weights, timeout=WEIGHTS_CACHE_TIMEOUT)
+            except Exception:
+                pass
+    _local_weights.update(version=version or None, weights=weights, checked_at=current)
+    return weights
+
+
+def labeled_matches(batch_size: int = 5000) -> Iterable[Tuple[int, List[float], int]]:
+    """
+    Genera (match_id, sub-scores, etiqueta) de los matches de propiedades con
+    resultado. El estado accepted/rejected tiene prioridad sobre el feedback.
+    """
+    feedback_types = ('like', 'dislike')
+    feedback = dict(
+        MatchFeedback.objects.filter(match__match_type='property', feedback_type__in=feedback_types)
+        .order_by('created_at', 'id').values_list('match_id', 'feedback_type')
+    )
+    matches = Match.objects.filter(match_type='property').filter(
+        Q(status__in=('accepted', 'rejected'))
+        | Q(id__in=MatchFeedback.objects.filter(feedback_type__in=feedback_types).values('match_id'))
+    ).values_list('id', 'status', 'metadata')
+    for match_id, status, metadata in matches.iterator(chunk_size=batch_size):
+        if status == 'accepted':
+            label = 1
+        elif status == 'rejected':
+            label = 0
+        elif match_id in feedback:
+            label = 1 if feedback[match_id] == 'like' else 0
+        else:
+            continue
+        details = (metadata or {}).get('details') or {}
+        if any(key not in details for key in DETAIL_KEYS):
+            continue
+        yield match_id, [float(details[key]) for key in DETAIL_KEYS], label
+
+
+def training_data(batch_size: int = 5000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Matriz de features (sub-scores / 100), etiquetas e ids de los matches."""
+    ids, rows, labels = [], [], []
+    for match_id, features, label in labeled_matches(batch_size):
+        ids.append(match_id)
+        rows.append(features)
+        labels.append(label)
+    X = np.clip(np.array(rows, dtype=np.float64).reshape(-1, len(WEIGHT_KEYS)) / 100.0, 0.0, 1.0)
+    return X, np.array(labels, dtype=np.float64), np.array(ids, dtype=np.int64)
+
+
+def export_training_csv(path: str, batch_size: int = 5000) -> int:
+    """Escribe match_id, sub-scores y etiqueta en CSV. Retorna la cantidad de filas."""
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('match_id',) + DETAIL_KEYS + ('label',))
+        for match_id, features, label in labeled_matches(batch_size):
+            writer.writerow([match_id, *features, label])
+            rows += 1
+    return rows
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+def fit_logistic_regression(X: np.ndarray, y: np.ndarray, l2: float = 1e-2, iterations: int = 25,
+                            tol: float = 1e-8) -> Tuple[np.ndarray, float]:
+    """
+    Regresión logística por Newton (IRLS) con L2 sobre los coeficientes (no sobre
+    el intercepto). Con pocas features cada paso es un sistema lineal pequeño.
+    Retorna (coeficientes, intercepto).
+    """
+    n, k = X.shape
+    A = np.hstack([np.ones((n, 1)), X])
+    beta = np.zeros(k + 1)
+    penalty = np.full(k + 1, l2 * n)
+    penalty[0] = 0.0
+    for _ in range(iterations):
+        p = _sigmoid(A @ beta)
+        gradient = A.T @ (p - y) + penalty * beta
+        hessian = (A * (p * (1 - p))[:, None]).T @ A + np.diag(penalty) + np.eye(k + 1) * 1e-9
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    return beta[1:], float(beta[0])
+
+
+def coefficients_to_weights(coefficients: np.ndarray) -> Dict[str, float]:
+    """
+    Pesos no negativos que suman 1, proporcionales a los coeficientes positivos.
+    Un sub-score con coeficiente negativo no puede restar en la fórmula del score y queda en 0.
+    """
+    positive = np.maximum(coefficients, 0.0)
+    total = positive.sum()
+    if total <= 0:
+        raise ValueError('Ningún sub-score tiene coeficiente positivo; no se pueden derivar pesos')
+    return {key: round(float(value / total), 4) for key, value in zip(WEIGHT_KEYS, positive)}
+
+
+def _auc(scores: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Área bajo la curva ROC por rangos (Mann-Whitney), con empates promediados."""
+    positives = int(y.sum())
+    negatives = len(y) - positives
+    if not positives or not negatives:
+        return None
+    order = np.argsort(scores, kind='mergesort')
+    ranks = np.empty(len(scores), dtype=np.float64)
+    sorted_scores = scores[order]
+    _, first, counts = np.unique(sorted_scores, return_index=True, return_counts=True)
+    average = first + (counts + 1) / 2.0
+    ranks[order] = np.repeat(average, counts)
+    return float((ranks[y == 1].sum() - positives * (positives + 1) / 2.0) / (positives * negatives))
+
+
+def _weight_vector(weights: Dict[str, float]) -> np.ndarray:
+    return np.array([weights[key] for key in WEIGHT_KEYS], dtype=np.float64)
+
+
+def tune_property_weights(l2: float = 1e-2, min_samples: int = 200, holdout: float = 0.2, seed: int = 42,
+                          batch_size: int = 5000) -> Dict:
+    """
+    Ajusta los pesos con los matches etiquetados. Retorna {'weights', 'intercept',
+    'coefficients', 'metrics'}; las métricas comparan el AUC del score con los
+    pesos vigentes y con los nuevos sobre una partición de validación.
+    """
+    X, y, _ = training_data(batch_size)
+    positives = int(y.sum())
+    if len(y) < min_samples or positives == 0 or positives == len(y):
+        raise ValueError(f'Datos insuficientes: {len(y)} matches etiquetados ({positives} positivos), mínimo {min_samples}')
+    order = np.random.default_rng(seed).permutation(len(y))
+    split = int(len(y) * (1 - holdout)) if holdout else len(y)
+    train, valid = order[:split], order[split:]
+
+    coefficients, intercept = fit_logistic_regression(X[train], y[train], l2=l2)
+    weights = coefficients_to_weights(coefficients)
+    p = _sigmoid(X[train] @ coefficients + intercept)
+    eps = 1e-12
+    metrics = {
+        'samples': int(len(y)),
+        'positives': positives,
+        'train_log_loss': round(float(-np.mean(y[train] * np.log(p + eps) + (1 - y[train]) * np.log(1 - p + eps))), 5),
+        'l2': l2,
+    }
+    if len(valid):
+        current_auc = _auc(X[valid] @ _weight_vector(get_property_weights()), y[valid])
+        tuned_auc = _auc(X[valid] @ _weight_vector(weights), y[valid])
+        metrics['validation_samples'] = int(len(valid))
+        metrics['validation_auc_current'] = round(current_auc, 5) if current_auc is not None else None
+        metrics['validation_auc_tuned'] = round(tuned_auc, 5) if tuned_auc is not None else None
+    return {
+        'weights': weights,
+        'intercept': intercept,
+        'coefficients': {key: round(float(c), 5) for key, c in zip(WEIGHT_KEYS, coefficients)},
+        'metrics': metrics,
+    }
+
+
+def save_weight_set(weights: Dict[str, float], intercept: float = 0.0, metrics: Dict = None,
+                    activate: bool = False) -> MatchWeightSet:
+    """Guarda una versión nueva de pesos y opcionalmente la activa."""
+    weight_set = MatchWeightSet.objects.create(
+        match_type='property', weights=weights, intercept=intercept, metrics=metrics or {},
+    )
+    if activate:
+        activate_weight_set(weight_set.pk)
+    return weight_set
+
+
+def activate_weight_set(version: Optional[int]):
+    """
+    Activa la versión indicada (desactivando la anterior). Con ``None`` se vuelve
+    a los pesos por defecto.
+    """
+    with transaction.atomic():
+        MatchWeightSet.objects.filter(match_type='property', is_active=True).update(is_active=False)
+        if version is not None:
+            updated = MatchWeightSet.objects.filter(pk=version, match_type='property').update(is_active=True)
+            if not updated:
+                raise MatchWeightSet.DoesNotExist(f'No existe la versión de pesos {version}')
+    invalidate_match_weights()
@@ -1,28 +1,55 @@
-from typing import Tuple, Dict
+import heapq
+from datetime import timedelta
+from typing import Dict, Iterable, Tuple
 from django.utils.timezone import now
-from django.db.models import Avg
-from django.contrib.gis.geos import Point
-from django.contrib.gis.measure import Distance
-from matching.models import Match, SearchProfile, RoommateRequest
+from django.db.models import Avg, F, FloatField, OuterRef, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+from matching.models import Match, MatchRefreshState, SearchProfile
 from property.models import Property
 from zone.models import Zone
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import cache
+from utils.agent_roster import get_agent_roster
+from utils.batch_matching import score_properties_for_profile, ScoringStats
+from utils.bitsets import mask_int, popcount
+from utils.embeddings import SEMANTIC_BOOST, semantic_score, unpack_embedding
+from utils.match_features import property_match_features
+from utils.match_profiling import add_candidates, lap, maybe_profiling, phase
+from utils.match_weights import get_property_weights
+from utils.roommate_matching import RoommateEngine, RoommateFeatures, seeker_candidates
+from utils.spatial import MATCH_RADIUS_KM, nearby_properties, property_distances_km
 
 THRESHOLD = getattr(settings, 'MATCH_MIN_SCORE', 70)
 
+PROPERTY_MATCH_WEIGHTS = {
+    'location': 0.26,
+    'price': 0.24,
+    'amenities': 0.13,
+    'roommate': 0.10,
+    'reputation': 0.08,
+    'freshness': 0.05,
+    'family': 0.05,
+    'owner_prefs': 0.09,
+}
+
 
 def calculate_property_match_score(search_profile: SearchProfile, property_obj: Property) -> Tuple[float, Dict]:
-    # 1. Location Score: Distancia GIS
+    # Cronómetro por sub-score (no-op salvo con MATCH_PROFILING, ver utils.match_profiling)
+    mark = lap('component')
+
+    # 1. Location Score: distancia geodésica en km calculada por PostGIS (ver utils.spatial)
+    distance_km = None
     if search_profile.location and property_obj.location:
         try:
-            # Aproximado en kilómetros usando distancia geodésica simple
-            distance_km = search_profile.location.distance(property_obj.location) * 100
+            distance_km = property_distances_km(search_profile.location, [property_obj.pk]).get(property_obj.pk)
         except Exception:
-            distance_km = 0
+            distance_km = None
+    if distance_km is not None:
         location_score = max(0, 100 - (distance_km * 10))
     else:
         location_score = 50
+    mark('location')
 
     # 2. Price Score
     price_score = 80
@@ -40,22 +67,27 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
             per_person = float(property_obj.price) / max(property_obj.max_occupancy, 1)
             if search_profile.budget_max is not None:
                 price_score = max(price_score, 100 if per_person <= float(search_profile.budget_max) else 80)
+    mark('price')
 
-    # 3. Amenities Score
+    # 3. Amenities Score: popcount sobre máscaras de bits (ver utils.bitsets)
     try:
-        s_amenities = set(search_profile.amenities.all())
-        p_amenities = set(property_obj.amenities.all())
-        matching_amenities = s_amenities & p_amenities
-        amenities_score = (len(matching_amenities) / max(len(s_amenities), 1)) * 100 if s_amenities else 100
+        p_features = property_match_features(property_obj)
+        s_amenities = mask_int(search_profile.amenity_mask)
+        matching_amenities = s_amenities & mask_int(p_features.get('amenity_mask'))
+        amenities_score = (popcount(matching_amenities) / max(popcount(s_amenities), 1)) * 100 if s_amenities else 100
     except Exception:
+        p_features = {}
         amenities_score = 100
+    mark('amenities')
 
     # 4. Roommate/Vibes Score
     roommate_score = 100 if (getattr(property_obj, 'allows_roommates', False) == (search_profile.roommate_preference != 'no')) else 50
     try:
-        vibes_score = (len(set(search_profile.vibes) & set(getattr(property_obj, 'tags', []))) / max(len(search_profile.vibes), 1)) * 100 if search_profile.vibes else 100
+        matching_vibes = mask_int(search_profile.vibe_mask) & mask_int(p_features.get('tag_mask'))
+        vibes_score = (popcount(matching_vibes) / max(len(search_profile.vibes), 1)) * 100 if search_profile.vibes else 100
     except Exception:
         vibes_score = 100
+    mark('roommate')
 
     # 5. Reputation/Freshness
     try:
@@ -63,8 +95,10 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
         reputation_score = float(avg_rating) * 20 if avg_rating else 80
     except Exception:
         reputation_score = 80
+    mark('reputation')
     freshness_days = (now() - property_obj.created_at).days if property_obj.created_at else 0
     freshness_score = max(0, 100 - (freshness_days * 2))
+    mark('freshness')
 
     # 6. Factor familiar: si tiene hijos y la propiedad tiene suficientes dormitorios
     try:
@@ -74,6 +108,7 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
         family_score = 100 if bedrooms_ok else 60
     except Exception:
         family_score = 80
+    mark('family')
 
     # 7. Preferencias del propietario sobre el inquilino
     try:
@@ -102,6 +137,7 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
         owner_prefs_score = max(0, owner_prefs_score)
     except Exception:
         owner_prefs_score = 80
+    mark('owner_prefs')
 
     # 8. Boost por favorito (estrella)
     try:
@@ -111,17 +147,17 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
             engagement_boost = 3
     except Exception:
         engagement_boost = 0
+    mark('engagement')
 
-    weights = {
-        'location': 0.26,
-        'price': 0.24,
-        'amenities': 0.13,
-        'roommate': 0.10,
-        'reputation': 0.08,
-        'freshness': 0.05,
-        'family': 0.05,
-        'owner_prefs': 0.09,
-    }
+    # 9. Similitud semántica (vibes/lifestyle vs descripción/tags), hasta SEMANTIC_BOOST puntos
+    semantic = semantic_score(
+        unpack_embedding(search_profile.semantic_embedding), unpack_embedding(property_obj.semantic_embedding)
+    )
+    semantic_boost = semantic * SEMANTIC_BOOST / 100
+    mark('semantic')
+
+    # Pesos vigentes: versión activa ajustada offline o PROPERTY_MATCH_WEIGHTS (ver utils.match_weights)
+    weights = get_property_weights()
     total_score = sum([
         location_score * weights['location'],
         price_score * weights['price'],
@@ -132,7 +168,7 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
         family_score * weights['family'],
         owner_prefs_score * weights['owner_prefs'],
     ])
-    total_score = min(100.0, total_score + engagement_boost)
+    total_score = min(100.0, total_score + engagement_boost + semantic_boost)
     details = {
         'location_score': round(location_score, 2),
         'price_score': round(price_score, 2),
@@ -143,6 +179,7 @@ def calculate_property_match_score(search_profile: SearchProfile, property_obj:
         'family_score': round(family_score, 2),
         'owner_prefs_score': round(owner_prefs_score, 2),
         'engagement_boost': round(engagement_boost, 2),
+        'semantic_score': round(semantic, 2),
     }
     return round(total_score, 2), {'details': details}
 
@@ -167,7 +204,8 @@ def calculate_roommate_match_score(profile1: SearchProfile, profile2: SearchProf
         prefs_score -= 50
     if not p1.get('smoker_ok', True) and p2.get('smoker', False):
         prefs_score -= 30
-    vibes_match = (len(set(profile1.vibes) & set(profile2.vibes)) / max(len(profile1.vibes), 1)) * 100 if profile1.vibes else 100
+    matching_vibes = mask_int(profile1.vibe_mask) & mask_int(profile2.vibe_mask)
+    vibes_match = (popcount(matching_vibes) / max(len(profile1.vibes), 1)) * 100 if profile1.vibes else 100
     prefs_score = (prefs_score + vibes_match) / 2
 
     weights = {'zone': 0.4, 'budget': 0.3, 'prefs': 0.3}
@@ -193,56 +231,378 @@ def calculate_agent_match_score(profile: SearchProfile, agent: User) -> Tuple[fl
     commission_score = max(0, 100 - commission * 10)  # Menor comisión => mayor score
     zones_overlap = 0
     try:
-        agent_zones = set(getattr(up, 'managed_zones', []))  # Placeholder; si existe relación futura
-        zones_overlap = (len(agent_zones & set(profile.preferred_zones.all())) / max(len(profile.preferred_zones.all()), 1)) * 100 if profile.preferred_zones.exists() else 50
+        # Zonas gestionadas: las de las propiedades que el agente administra
+        agent_zones = set(agent.managed_properties.filter(zone__isnull=False).values_list('zone_id', flat=True))
+        profile_zones = {zone.id for zone in profile.preferred_zones.all()}
+        zones_overlap = (len(agent_zones & profile_zones) / max(len(profile_zones), 1)) * 100 if profile_zones else 50
     except Exception:
         zones_overlap = 50
     total_score = base * 0.4 + commission_score * 0.4 + zones_overlap * 0.2
     return round(total_score, 2), {'details': {'commission_score': commission_score, 'zones_overlap': zones_overlap}}
 
 
-def _store_match(match_type: str, subject_id: int, target_user: User, score: float, metadata: Dict):
-    if score >= THRESHOLD:
-        Match.objects.update_or_create(
-            match_type=match_type,
-            subject_id=subject_id,
-            target_user=target_user,
-            defaults={'score': score, 'metadata': metadata}
+class MatchWriter:
+    """
+    Acumula matches puntuados y los persiste en bloque con un único
+    INSERT ... ON CONFLICT DO UPDATE sobre (match_type, subject_id, target_user).
+    Los incrementos de match_activity_score se agregan por zona y se aplican
+    con un UPDATE con F() por zona.
+
+    Con ``top_k`` (MATCH_TOP_K por defecto) se mantiene un heap acotado con los
+    K mejores candidatos por (match_type, target_user) y, tras persistirlos, se
+    eliminan los matches pendientes que quedaron fuera de los K mejores.
+    """
+
+    def __init__(self, threshold: float = None, update_zone_activity: bool = True, batch_size: int = 500, top_k: int = None):
+        self.threshold = THRESHOLD if threshold is None else threshold
+        self.update_zone_activity = update_zone_activity
+        self.batch_size = batch_size
+        self.top_k = getattr(settings, 'MATCH_TOP_K', 0) if top_k is None else top_k
+        self._pending: Dict[Tuple[str, int, int], Match] = {}
+        self._property_increments: Dict[int, float] = {}
+        self._heaps: Dict[Tuple[str, int], list] = {}
+        self._live: Dict[Tuple[str, int], int] = {}
+        self._entries: Dict[Tuple[str, int, int], int] = {}
+        self._seq = 0
+
+    def add(self, match_type: str, subject_id: int, target_user, score: float, metadata: Dict) -> bool:
+        """``target_user`` puede ser un User o su id (matching masivo sin cargar usuarios)."""
+        if score < self.threshold:
+            return False
+        target_user_id = getattr(target_user, 'id', target_user)
+        key = (match_type, subject_id, target_user_id)
+        # La última escritura gana, igual que update_or_create secuencial
+        self._pending[key] = Match(
+            match_type=match_type, subject_id=subject_id, target_user_id=target_user_id, score=score, metadata=metadata
+        )
+        if self.top_k:
+            return self._keep_top_k(key, score)
+        return True
+
+    def _keep_top_k(self, key: Tuple[str, int, int], score: float) -> bool:
+        """Heap mínimo por grupo; las entradas reemplazadas quedan obsoletas y se descartan al salir."""
+        group = key[0], key[2]
+        heap = self._heaps.setdefault(group, [])
+        if key not in self._entries:
+            self._live[group] = self._live.get(group, 0) + 1
+        self._seq += 1
+        self._entries[key] = self._seq
+        heapq.heappush(heap, (score, self._seq, key))
+        while self._live[group] > self.top_k:
+            _, seq, evicted = heapq.heappop(heap)
+            if self._entries.get(evicted) != seq:
+                continue
+            del self._entries[evicted]
+            del self._pending[evicted]
+            self._live[group] -= 1
+        return key in self._pending
+
+    def floor(self, match_type: str, target_user) -> float:
+        """
+        Score mínimo para entrar al top-K de (match_type, target_user): el k-ésimo
+        mejor score acumulado, o el umbral mientras haya menos de K candidatos.
+        """
+        group = match_type, getattr(target_user, 'id', target_user)
+        if not self.top_k or self._live.get(group, 0) < self.top_k:
+            return self.threshold
+        heap = self._heaps[group]
+        while self._entries.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        return max(self.threshold, heap[0][0])
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Persiste los matches acumulados y retorna cuántos se escribieron."""
+        written = len(self._pending)
+        if self._pending:
+            with phase('write'):
+                self._write()
+        self._pending = {}
+        self._property_increments = {}
+        self._heaps, self._live, self._entries = {}, {}, {}
+        return written
+
+    def _write(self):
+        Match.objects.bulk_create(
+            list(self._pending.values()),
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=['match_type', 'subject_id', 'target_user'],
+            update_fields=['score', 'metadata', 'updated_at'],
         )
-        # Actualizar actividad de zona si corresponde
-        if match_type == 'property':
-            try:
-                prop = Property.objects.get(id=subject_id)
-                if prop.zone:
-                    z = prop.zone
-                    z.match_activity_score = float(getattr(z, 'match_activity_score', 0.0) or 0.0) + (score / 100.0)
-                    z.save(update_fields=['match_activity_score'])
-            except Property.DoesNotExist:
-                pass
-
-
-def create_property_matches_for_profile(profile: SearchProfile):
+        if self.update_zone_activity:
+            for match in self._pending.values():
+                if match.match_type == 'property':
+                    self._property_increments[match.subject_id] = self._property_increments.get(match.subject_id, 0.0) + match.score / 100.0
+        if self._property_increments:
+            self._apply_zone_activity()
+        if self.top_k:
+            self._prune_below_top_k({(m.match_type, m.target_user_id) for m in self._pending.values()})
+
+    def _prune_below_top_k(self, groups):
+        """
+        Elimina los matches pendientes sin feedback que quedaron fuera de los K
+        mejores de su (match_type, target_user). Los aceptados/rechazados se conservan.
+        """
+        ranked = Match.objects.filter(
+            match_type__in={t for t, _ in groups}, target_user_id__in={u for _, u in groups}, status='pending',
+        ).annotate(
+            rank=Window(RowNumber(), partition_by=[F('match_type'), F('target_user')], order_by=[F('score').desc(), F('id')])
+        ).filter(rank__gt=self.top_k)
+        stale = [mid for mid, t, u in ranked.values_list('id', 'match_type', 'target_user_id') if (t, u) in groups]
+        if stale:
+            Match.objects.filter(id__in=stale, feedback__isnull=True).delete()
+
+    def _apply_zone_activity(self):
+        zone_increments: Dict[int, float] = {}
+        zone_ids = Property.objects.filter(
+            id__in=list(self._property_increments), zone__isnull=False
+        ).values_list('id', 'zone_id')
+        for prop_id, zone_id in zone_ids:
+            zone_increments[zone_id] = zone_increments.get(zone_id, 0.0) + self._property_increments[prop_id]
+        for zone_id, increment in zone_increments.items():
+            Zone.objects.filter(id=zone_id).update(match_activity_score=F('match_activity_score') + increment)
+
+
+def create_property_matches_for_profile(profile: SearchProfile, since=None, stats: ScoringStats = None) -> int:
+    """
+    Calcula matches de propiedades para el perfil. Si se indica ``since``, solo
+    se recalculan propiedades modificadas (o con reseñas nuevas) desde esa fecha.
+    Los candidatos cuya cota superior no alcanza THRESHOLD ni el k-ésimo mejor
+    score acumulado (MATCH_TOP_K) se podan sin decodificar amenities ni consultar
+    favoritos (ver ``stats``).
+    Retorna la cantidad de candidatos evaluados.
+    """
+    stats = stats if stats is not None else ScoringStats()
     qs = Property.objects.filter(is_active=True)
+    if since is not None:
+        qs = qs.filter(Q(updated_at__gt=since) | Q(reviews__created_at__gt=since)).distinct()
     if profile.location:
-        try:
-            qs = qs.filter(location__distance_lte=(profile.location, Distance(km=10)))
-        except Exception:
-            pass
-    for prop in qs[:500]:  # limitar por rendimiento
-        score, meta = calculate_property_match_score(profile, prop)
-        _store_match('property', prop.id, profile.user, score, meta)
+        # Etapa espacial: ST_DWithin con índice y distancias de PostGIS para el scorer
+        qs = nearby_properties(qs, profile.location, MATCH_RADIUS_KM).order_by('match_distance')
+    writer = MatchWriter()
+
+    def top_k_floor(results):
+        for prop_id, score, meta in results:
+            writer.add('property', prop_id, profile.user, score, meta)
+        return writer.floor('property', profile.user)
+
+    # Scoring por lotes en orden de cota: el piso del top-K poda el resto de los 500 candidatos
+    candidates_before, pruned_before = stats.candidates, len(stats.pruned_ids)
+    score_properties_for_profile(profile, qs[:500], threshold=writer.threshold, stats=stats, floor=top_k_floor)  # limitar por rendimiento
+    writer.flush()
+    pruned_ids = stats.pruned_ids[pruned_before:]
+    if pruned_ids:
+        # Un candidato podado ya no entra al top-K: su match pendiente guardado quedó obsoleto
+        Match.objects.filter(
+            match_type='property', target_user=profile.user, subject_id__in=pruned_ids,
+            status='pending', feedback__isnull=True,
+        ).delete()
+    return stats.candidates - candidates_before
+
+
+def property_scores_for_profile(profile: SearchProfile, property_ids: Iterable[int]) -> Dict[int, float]:
+    """
+    Score del perfil para cada propiedad indicada (listados con ``match_score`` u
+    ``order_by_match``), desde los Match guardados: los vigentes se leen en una sola
+    consulta ``subject_id__in`` y solo los pares sin Match o desactualizados (perfil
+    o propiedad modificados después del cálculo) se puntúan con el motor por lotes
+    y se escriben de vuelta con MatchWriter.
+    """
+    ids = list(dict.fromkeys(property_ids))
+    if not ids:
+        return {}
+    stored = Match.objects.filter(
+        match_type='property', target_user_id=profile.user_id, subject_id__in=ids, updated_at__gte=profile.updated_at,
+    ).annotate(
+        property_updated_at=Subquery(Property.objects.filter(pk=OuterRef('subject_id')).values('updated_at')[:1]),
+    ).values_list('subject_id', 'score', 'updated_at', 'property_updated_at')
+    scores = {
+        subject_id: score
+        for subject_id, score, updated_at, property_updated_at in stored
+        if property_updated_at is None or updated_at >= property_updated_at
+    }
+    missing = [pid for pid in ids if pid not in scores]
+    if missing:
+        # Sin umbral: el listado necesita el score de todas las filas; solo se guardan las que superan THRESHOLD
+        writer = MatchWriter(update_zone_activity=False)
+        for prop_id, score, meta in score_properties_for_profile(profile, Property.objects.filter(id__in=missing)):
+            scores[prop_id] = score
+            writer.add('property', prop_id, profile.user_id, score, meta)
+        writer.flush()
+    return scores
+
+
+def match_score_expression(profile: SearchProfile) -> Subquery:
+    """Subconsulta con el score del Match de propiedad del perfil, para anotar, filtrar y ordenar un QuerySet de Property en SQL."""
+    return Subquery(
+        Match.objects.filter(
+            match_type='property', target_user_id=profile.user_id, subject_id=OuterRef('pk'),
+        ).values('score')[:1],
+        output_field=FloatField(),
+    )
 
 
-def create_roommate_matches_for_profile(profile: SearchProfile):
-    others = SearchProfile.objects.exclude(user=profile.user)
-    for other in others[:500]:
-        score, meta = calculate_roommate_match_score(profile, other)
+def create_roommate_matches_for_profile(profile: SearchProfile, since=None, stats: ScoringStats = None) -> int:
+    """
+    Calcula matches de roomie del perfil contra los buscadores de roomie con el
+    motor por lotes (ver ``utils.roommate_matching``). Las claves de bloqueo (zonas
+    compartidas y ventana de presupuesto) se aplican en SQL con un tope de
+    candidatos; el motor descarta además los que por cota no alcanzan THRESHOLD.
+    Retorna la cantidad de candidatos evaluados.
+    """
+    stats = stats if stats is not None else ScoringStats()
+    writer = MatchWriter()
+    with phase('roommate.features'):
+        source = RoommateFeatures([profile])
+        others = SearchProfile.objects.filter(id__in=seeker_candidates(source, 0, writer.threshold, since=since))
+        engine = RoommateEngine(RoommateFeatures(others))
+    with phase('roommate.score'):
+        matches = engine.score_profile(source, 0, writer.threshold)
+    for other_id, _, score, meta in matches:
         # Usamos subject_id como el id del otro perfil para roomie
-        _store_match('roommate', other.id, profile.user, score, meta)
+        writer.add('roommate', other_id, profile.user, score, meta)
+    writer.flush()
+    stats.candidates += len(engine.candidates)
+    stats.fully_scored += engine.pairs_scored
+    stats.pruned += len(engine.candidates) - engine.pairs_scored
+    return len(engine.candidates)
 
 
-def create_agent_matches_for_profile(profile: SearchProfile):
-    agents = User.objects.filter(profile__user_type='agente')
-    for agent in agents[:200]:
-        score, meta = calculate_agent_match_score(profile, agent)
-        _store_match('agent', agent.id, profile.user, score, meta)
\ No newline at end of file
+def create_agent_matches_for_profile(profile: SearchProfile, since=None) -> int:
+    """
+    Calcula matches de agentes para el perfil contra el roster de agentes en
+    memoria (ver ``utils.agent_roster``) en una sola pasada vectorizada.
+    Retorna la cantidad de agentes evaluados.
+    """
+    with phase('agent.roster'):
+        roster = get_agent_roster()
+    with phase('agent.score'):
+        results = roster.score(profile.preferred_zones.values_list('id', flat=True), since=since)
+    writer = MatchWriter()
+    for agent_id, score, meta in results:
+        writer.add('agent', agent_id, profile.user, score, meta)
+    writer.flush()
+    return len(results)
+
+
+MATCH_CREATORS = {
+    'property': create_property_matches_for_profile,
+    'roommate': create_roommate_matches_for_profile,
+    'agent': create_agent_matches_for_profile,
+}
+
+
+def refresh_matches_for_profile(profile: SearchProfile, match_type: str) -> ScoringStats:
+    """
+    Recalcula matches de forma incremental usando la marca de agua del perfil.
+    Se hace un recálculo completo si no hay marca previa, si el SearchProfile
+    cambió después del último cálculo o si pasó MATCH_FULL_RESCORE_HOURS desde el
+    último recálculo completo (la frescura de las propiedades decae con el tiempo).
+    Retorna los contadores de la corrida (candidatos evaluados y podados).
+    """
+    stats = ScoringStats()
+    creator = MATCH_CREATORS.get(match_type)
+    if creator is None:
+        return stats
+    state = MatchRefreshState.objects.filter(profile=profile, match_type=match_type).first()
+    started_at = now()
+    full_interval = timedelta(hours=getattr(settings, 'MATCH_FULL_RESCORE_HOURS', 24))
+    full = (
+        state is None
+        or profile.updated_at > state.scored_at
+        or started_at - state.full_rescore_at > full_interval
+    )
+    since = None if full else state.scored_at
+    with maybe_profiling(), phase(f'refresh.{match_type}'):
+        if match_type in ('property', 'roommate'):
+            creator(profile, since=since, stats=stats)
+        else:
+            stats.candidates = stats.fully_scored = creator(profile, since=since)
+        add_candidates(match_type, stats.candidates)
+    MatchRefreshState.objects.update_or_create(
+        profile=profile,
+        match_type=match_type,
+        defaults={
+            'scored_at': started_at,
+            'full_rescore_at': started_at if full else state.full_rescore_at,
+            'candidates_rescored': stats.candidates,
+            'candidates_pruned': stats.pruned,
+        },
+    )
+    return stats
+
+
+MATCH_REFRESH_LOCK_KEY = 'matching:refresh_lock:{profile_id}:{match_type}'
+
+
+def matches_are_stale(profile: SearchProfile, state: MatchRefreshState = None) -> bool:
+    """
+    True si los matches almacenados del perfil deben recalcularse: nunca se
+    calcularon, el perfil cambió después del cálculo o superan MATCH_STALE_SECONDS.
+    """
+    if state is None:
+        return True
+    max_age = timedelta(seconds=getattr(settings, 'MATCH_STALE_SECONDS', 300))
+    return profile.updated_at > state.scored_at or now() - state.scored_at > max_age
+
+
+def acquire_refresh_lock(profile_id: int, match_type: str) -> bool:
+    """
+    Toma el lock de recálculo del perfil (SET NX en Redis con expiración) para
+    que solicitudes concurrentes no encolen el mismo recálculo. Sin caché disponible no deduplica.
+    """
+    key = MATCH_REFRESH_LOCK_KEY.format(profile_id=profile_id, match_type=match_type)
+    try:
+        return cache.add(key, 1, timeout=getattr(settings, 'MATCH_REFRESH_LOCK_SECONDS', 300))
+    except Exception:
+        return True
+
+
+def release_refresh_lock(profile_id: int, match_type: str):
+    try:
+        cache.delete(MATCH_REFRESH_LOCK_KEY.format(profile_id=profile_id, match_type=match_type))
+    except Exception:
+        pass
+
+
+def enqueue_stale_refresh(profile: SearchProfile, match_type: str) -> Tuple[bool, ScoringStats]:
+    """
+    Encola en Celery el recálculo de los matches del perfil si están vencidos (un
+    solo recálculo por perfil gracias al lock). Si Celery/broker no está disponible
+    recalcula dentro de la solicitud. Retorna (encolado, contadores del recálculo síncrono).
+    """
+    state = MatchRefreshState.objects.filter(profile=profile, match_type=match_type).first()
+    if matches_are_stale(profile, state) and acquire_refresh_lock(profile.id, match_type):
+        from matching.tasks import compute_matches_for_profile
+        try:
+            compute_matches_for_profile.delay(profile.id, match_type)
+            return True, ScoringStats()
+        except Exception:
+            # Fallback: recalcular directamente si Celery/broker no está disponible
+            release_refresh_lock(profile.id, match_type)
+            return False, refresh_matches_for_profile(profile, match_type)
+    return False, ScoringStats()
+
+
+def notify_matches_updated(profile: SearchProfile, match_types, computed_at):
+    """Evento "matches actualizados" al grupo ``notifications_{user_id}`` del usuario."""
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(f'notifications_{profile.user_id}', {
+            'type': 'matches_updated',
+            'payload': {
+                'event': 'matches_updated',
+                'profile_id': profile.id,
+                'match_types': list(match_types),
+                'computed_at': computed_at.isoformat(),
+            },
+        })
+    except Exception:
+        pass
@@ -0,0 +1,312 @@
+"""
+Motor de compatibilidad de roomies por lotes.
+
+Carga en una pasada (dos consultas) las zonas preferidas, intervalos de
+presupuesto, preferencias y vibes de una población de perfiles y calcula los
+mismos scores que ``calculate_roommate_match_score`` de forma vectorizada.
+Los candidatos se bloquean por zonas compartidas (lista invertida zona ->
+perfiles), por presupuesto (``utils.budget_index``) y por una cota superior que
+usa el presupuesto y las preferencias exactas, así que solo se puntúan por completo los pares que pueden alcanzar el
+umbral. Con esto el matching nocturno de todos contra todos entre buscadores
+de roomie es viable.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.db.models import Count, Q, QuerySet
+
+from matching.models import SearchProfile
+from utils.bitsets import mask_matrix, row_popcount, to_mask
+from utils.budget_index import BudgetIntervalIndex, budget_overlap_filter
+
+ROOMMATE_SEEKER_PREFERENCES = ('looking', 'open')
+
+ROOMMATE_FIELDS = ('id', 'user_id', 'budget_min', 'budget_max', 'roommate_preferences', 'vibes', 'vibe_mask')
+
+ROOMMATE_WEIGHTS = {'zone': 0.4, 'budget': 0.3, 'prefs': 0.3}
+
+# Tope de candidatos por perfil en el matching bajo demanda (como los 500 de propiedades)
+ROOMMATE_CANDIDATE_LIMIT = 500
+
+# Cota del score de un par sin zonas en común (zona 0, presupuesto y preferencias al máximo)
+NO_SHARED_ZONE_BOUND = 0 * ROOMMATE_WEIGHTS['zone'] + 100 * ROOMMATE_WEIGHTS['budget'] + 100 * ROOMMATE_WEIGHTS['prefs']
+
+
+def _prefs(value) -> Dict:
+    return value if isinstance(value, dict) else {}
+
+
+class RoommateFeatures:
+    """
+    Columnas de roommate matching para una población de SearchProfile.
+    ``profiles`` puede ser un QuerySet (dos consultas en total) o una lista de instancias.
+    """
+
+    def __init__(self, profiles):
+        if isinstance(profiles, QuerySet):
+            rows = list(profiles.values(*ROOMMATE_FIELDS))
+            zone_links = SearchProfile.preferred_zones.through.objects.filter(
+                searchprofile__in=profiles.values('id')
+            ).values_list('searchprofile_id', 'zone_id')
+        else:
+            rows = [{f: getattr(p, f, None) for f in ROOMMATE_FIELDS} for p in profiles]
+            zone_links = SearchProfile.preferred_zones.through.objects.filter(
+                searchprofile_id__in=[r['id'] for r in rows]
+            ).values_list('searchprofile_id', 'zone_id')
+        self.ids = [r['id'] for r in rows]
+        self.user_ids = np.array([r['user_id'] for r in rows], dtype=np.int64)
+        self.position = {pid: i for i, pid in enumerate(self.ids)}
+
+        zones: Dict[int, List[int]] = {}
+        for pid, zone_id in zone_links:
+            zones.setdefault(pid, []).append(zone_id)
+        zone_masks = [to_mask(zones.get(pid, [])) for pid in self.ids]
+        self.zone_masks = zone_masks
+        # Matrices de palabras construidas una vez: el scoring solo indexa filas
+        self.zone_matrix = mask_matrix(zone_masks)
+        self.zone_count = np.array([len(set(zones.get(pid, []))) for pid in self.ids], dtype=np.int64)
+        # Lista invertida zona -> índices de perfiles (bloqueo por zonas compartidas)
+        self.zone_postings: Dict[int, np.ndarray] = {}
+        postings: Dict[int, List[int]] = {}
+        for pid, zone_ids in zones.items():
+            for zone_id in set(zone_ids):
+                postings.setdefault(zone_id, []).append(self.position[pid])
+        self.zone_postings = {z: np.array(sorted(idx), dtype=np.int64) for z, idx in postings.items()}
+        self.profile_zones = {self.position[pid]: sorted(set(z)) for pid, z in zones.items()}
+
+        # Presupuesto: la regla escalar exige los cuatro valores no vacíos (ni None ni 0)
+        self.full_budget = np.array([bool(r['budget_min']) and bool(r['budget_max']) for r in rows], dtype=bool)
+        self.budget_min = np.array([float(r['budget_min']) if r['budget_min'] else np.nan for r in rows], dtype=np.float64)
+        self.budget_max = np.array([float(r['budget_max']) if r['budget_max'] else np.nan for r in rows], dtype=np.float64)
+
+        prefs = [_prefs(r['roommate_preferences']) for r in rows]
+        self.wanted_gender = np.array([p.get('gender') for p in prefs], dtype=object)
+        self.gender_filter = np.array([p.get('gender') not in [None, 'any'] for p in prefs], dtype=bool)
+        self.declared_gender = np.array([p.get('gender') for p in prefs], dtype=object)
+        self.rejects_smokers = np.array([not p.get('smoker_ok', True) for p in prefs], dtype=bool)
+        self.is_smoker = np.array([bool(p.get('smoker', False)) for p in prefs], dtype=bool)
+
+        self.vibe_count = np.array([len(r['vibes']) if r['vibes'] else 0 for r in rows], dtype=np.int64)
+        self.vibe_masks = [r['vibe_mask'] for r in rows]
+        self.vibe_matrix = mask_matrix(self.vibe_masks)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def budget_index(self) -> BudgetIntervalIndex:
+        """Índice de intervalos de presupuesto de la población (se construye una vez)."""
+        if getattr(self, '_budget_index', None) is None:
+            self._budget_index = BudgetIntervalIndex(self.budget_min, self.budget_max)
+        return self._budget_index
+
+    @classmethod
+    def seekers(cls) -> 'RoommateFeatures':
+        """Todos los perfiles que buscan roomie o están abiertos a uno."""
+        return cls(SearchProfile.objects.filter(roommate_preference__in=ROOMMATE_SEEKER_PREFERENCES))
+
+
+def _cheap_scores(a: RoommateFeatures, b: RoommateFeatures, i: np.ndarray, j: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Presupuesto y preferencias sin vibes (exactos) para los pares (a[i], b[j])."""
+    both_budget = a.full_budget[i] & b.full_budget[j]
+    max_i, min_i = a.budget_max[i], a.budget_min[i]
+    max_j, min_j = b.budget_max[j], b.budget_min[j]
+    with np.errstate(invalid='ignore'):
+        overlap = np.minimum(max_i, max_j) - np.maximum(min_i, min_j)
+        gap = np.maximum(0, 80 - np.abs(max_i - min_j) / np.maximum(max_i, 1) * 100)
+    budget = np.where(both_budget, np.where(overlap > 0, 100.0, gap), 80.0)
+
+    prefs = np.full(len(i), 100, dtype=np.int64)
+    prefs -= np.where(a.gender_filter[i] & (a.wanted_gender[i] != b.declared_gender[j]), 50, 0)
+    prefs -= np.where(a.rejects_smokers[i] & b.is_smoker[j], 30, 0)
+    return budget, prefs
+
+
+def _mask_rows(matrix: np.ndarray, rows: np.ndarray, words: int) -> np.ndarray:
+    """Filas ``rows`` de una matriz de máscaras, completadas con ceros hasta ``words`` palabras."""
+    selected = matrix[rows]
+    if selected.shape[1] < words:
+        selected = np.pad(selected, ((0, 0), (0, words - selected.shape[1])))
+    return selected
+
+
+def score_roommate_pairs(a: RoommateFeatures, b: RoommateFeatures, i: np.ndarray, j: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Scores de roommate para los pares alineados (a[i], b[j]); replica exactamente
+    ``calculate_roommate_match_score(a[i], b[j])``.
+    """
+    w = ROOMMATE_WEIGHTS
+    words = max(a.zone_matrix.shape[1], b.zone_matrix.shape[1])
+    zone_overlap = row_popcount(_mask_rows(a.zone_matrix, i, words) & _mask_rows(b.zone_matrix, j, words))
+    zone_count = a.zone_count[i]
+    zone = np.where(zone_count > 0, (zone_overlap / np.maximum(zone_count, 1)) * 100, 50.0)
+
+    budget, prefs = _cheap_scores(a, b, i, j)
+
+    words = max(a.vibe_matrix.shape[1], b.vibe_matrix.shape[1])
+    vibe_overlap = row_popcount(_mask_rows(a.vibe_matrix, i, words) & _mask_rows(b.vibe_matrix, j, words))
+    vibe_count = a.vibe_count[i]
+    vibes = np.where(vibe_count > 0, (vibe_overlap / np.maximum(vibe_count, 1)) * 100, 100.0)
+    prefs_score = (prefs + vibes) / 2
+
+    # Mismo orden de suma que la versión escalar
+    total = zone * w['zone'] + budget * w['budget'] + prefs_score * w['prefs']
+    return {'total': total, 'zone_score': zone, 'budget_score': budget, 'prefs_score': prefs_score}
+
+
+def _to_results(scores: Dict[str, np.ndarray]) -> List[Tuple[float, Dict]]:
+    # round() de Python sobre floats nativos para coincidir con la versión escalar
+    columns = {k: v.tolist() for k, v in scores.items()}
+    return [
+        (round(total, 2), {'details': {k: round(columns[k][n], 2) for k in ('zone_score', 'budget_score', 'prefs_score')}})
+        for n, total in enumerate(columns['total'])
+    ]
+
+
+def _budget_window(source: RoommateFeatures, row: int, threshold: float,
+                   zone_bound: float) -> Optional[Tuple[float, float, Optional[float]]]:
+    """
+    Ventana de presupuesto que un candidato necesita para alcanzar el umbral (con
+    zona y preferencias al máximo): (lo, hi, radius). Con ``radius`` None solo
+    sirven los presupuestos solapados; con radio también los cercanos y los
+    incompletos (score parcial). None si el presupuesto no permite filtrar.
+    """
+    if not source.full_budget[row]:
+        return None
+    w = ROOMMATE_WEIGHTS
+    needed = (threshold - zone_bound * w['zone'] - 100 * w['prefs']) / w['budget'] - 1e-6
+    if needed <= 0:
+        return None
+    lo, hi = float(source.budget_min[row]), float(source.budget_max[row])
+    if needed > 80:
+        return lo, hi, None
+    # Score parcial 80 - |max - min_otro| / max(max, 1) * 100 y los perfiles sin presupuesto completo (80)
+    return lo, hi, (80 - needed) * max(hi, 1) / 100 * (1 + 1e-9) + 1e-9
+
+
+def seeker_candidates(source: RoommateFeatures, row: int, threshold: float, since=None,
+                      limit: int = ROOMMATE_CANDIDATE_LIMIT) -> List[int]:
+    """
+    Ids de los buscadores de roomie (sin el propio usuario) que pasan en SQL las
+    mismas claves de bloqueo que ``RoommateEngine`` para ``source[row]``: zonas
+    compartidas si sin ellas no se alcanza el umbral y presupuesto dentro de la
+    ventana (``budget_overlap_filter``). Con ``since`` solo los modificados después.
+    Se limita a ``limit`` candidatos, primero los que comparten más zonas y luego
+    los perfiles actualizados más recientemente.
+    """
+    qs = SearchProfile.objects.filter(
+        roommate_preference__in=ROOMMATE_SEEKER_PREFERENCES
+    ).exclude(user_id=int(source.user_ids[row]))
+    if since is not None:
+        qs = qs.filter(updated_at__gt=since)
+    zones = source.profile_zones.get(row, [])
+    if zones and threshold > NO_SHARED_ZONE_BOUND:
+        qs = qs.filter(id__in=SearchProfile.preferred_zones.through.objects.filter(
+            zone_id__in=zones).values('searchprofile_id'))
+    window = _budget_window(source, row, threshold, zone_bound=100.0 if zones else 50.0)
+    if window is not None:
+        lo, hi, radius = window
+        if radius is None:
+            qs = qs.filter(budget_overlap_filter(lo, hi))
+        else:
+            incomplete = Q(budget_min__isnull=True) | Q(budget_min=0) | Q(budget_max__isnull=True) | Q(budget_max=0)
+            qs = qs.filter(budget_overlap_filter(lo, hi, radius) | incomplete)
+    ordering = ['-updated_at', 'id']
+    if zones:
+        qs = qs.annotate(shared_zones=Count('preferred_zones', filter=Q(preferred_zones__in=zones)))
+        ordering.insert(0, '-shared_zones')
+    return list(qs.order_by(*ordering).values_list('id', flat=True)[:limit])
+
+
+class RoommateEngine:
+    """
+    Puntúa perfiles contra una población de candidatos con bloqueo por zonas y
+    cota superior. Los pares del mismo usuario se excluyen.
+    """
+
+    def __init__(self, candidates: RoommateFeatures):
+        self.candidates = candidates
+        self.pairs_considered = 0
+        self.pairs_scored = 0
+
+    def _blocked_candidates(self, source: RoommateFeatures, row: int, threshold: float) -> np.ndarray:
+        """
+        Índices de candidatos que pueden alcanzar el umbral: comparten zona con
+        ``source[row]`` (si sin zona compartida no se alcanza) y tienen un
+        presupuesto solapado o lo bastante cercano según el índice de intervalos.
+        """
+        zones = source.profile_zones.get(row, [])
+        candidates = None
+        if zones and threshold > NO_SHARED_ZONE_BOUND:
+            postings = [self.candidates.zone_postings[z] for z in zones if z in self.candidates.zone_postings]
+            if not postings:
+                return np.zeros(0, dtype=np.int64)
+            candidates = np.unique(np.concatenate(postings))
+        by_budget = self._budget_candidates(source, row, threshold, zone_bound=100.0 if zones else 50.0)
+        if by_budget is not None:
+            candidates = by_budget if candidates is None else np.intersect1d(candidates, by_budget, assume_unique=True)
+        if candidates is None:
+            return np.arange(len(self.candidates), dtype=np.int64)
+        return candidates
+
+    def _budget_candidates(self, source: RoommateFeatures, row: int, threshold: float, zone_bound: float) -> Optional[np.ndarray]:
+        """
+        Candidatos cuyo score de presupuesto alcanza el mínimo necesario para el
+        umbral (con zona y preferencias al máximo), o None si no se puede filtrar.
+        """
+        window = _budget_window(source, row, threshold, zone_bound)
+        if window is None:
+            return None
+        lo, hi, radius = window
+        b = self.candidates
+        index = b.budget_index
+        found = [index.overlapping(lo, hi)]
+        if radius is not None:
+            found.append(index.within(hi, radius))
+            found.append(np.nonzero(~b.full_budget)[0])
+        return np.unique(np.concatenate(found))
+
+    def score_profile(self, source: RoommateFeatures, row: int, threshold: float) -> List[Tuple[int, int, float, Dict]]:
+        """
+        Matches de ``source[row]`` contra los candidatos con score >= ``threshold``.
+        Retorna [(candidate_profile_id, candidate_user_id, score, metadata), ...].
+        """
+        b = self.candidates
+        j = self._blocked_candidates(source, row, threshold)
+        j = j[b.user_ids[j] != source.user_ids[row]]
+        self.pairs_considered += len(j)
+        if not len(j):
+            return []
+        i = np.full(len(j), row, dtype=np.int64)
+
+        if threshold > 0:
+            budget, prefs = _cheap_scores(source, b, i, j)
+            if source.zone_count[row] == 0:
+                zone_bound = 50.0
+            else:
+                # Zonas compartidas solo para los candidatos j, desde las listas invertidas
+                postings = [b.zone_postings[z] for z in source.profile_zones.get(row, []) if z in b.zone_postings]
+                shares_zone = np.isin(j, np.concatenate(postings)) if postings else np.zeros(len(j), dtype=bool)
+                zone_bound = np.where(shares_zone, 100.0, 0.0)
+            w = ROOMMATE_WEIGHTS
+            bound = zone_bound * w['zone'] + budget * w['budget'] + ((prefs + 100) / 2) * w['prefs']
+            keep = bound + 1e-6 >= threshold
+            i, j = i[keep], j[keep]
+            if not len(j):
+                return []
+
+        self.pairs_scored += len(j)
+        results = _to_results(score_roommate_pairs(source, b, i, j))
+        return [
+            (b.ids[c], int(b.user_ids[c]), score, meta)
+            for c, (score, meta) in zip(j.tolist(), results)
+            if score >= threshold
+        ]
+
+    def all_pairs(self, threshold: float) -> Iterator[Tuple[int, List[Tuple[int, int, float, Dict]]]]:
+        """
+        Todos contra todos dentro de la población de candidatos.
+        Genera (user_id, matches) por perfil.
+        """
+        for row in range(len(self.candidates)):
+            yield int(self.candidates.user_ids[row]), self.score_profile(self.candidates, row, threshold)
@@ -0,0 +1,97 @@
+"""
+Etapa espacial del matching: prefiltro por radio y distancias geodésicas.
+
+Las columnas ``location`` son geometrías en SRID 4326 (grados). Para medir en
+metros se castean a ``geography``: ``ST_DWithin`` usa el índice GiST funcional
+sobre ese cast (ver migraciones de property) y ``ST_Distance`` devuelve la
+distancia sobre el esferoide. Las distancias siempre se calculan en el orden
+(propiedad, perfil) para que el scoring directo, el inverso y el escalar
+obtengan exactamente el mismo valor.
+"""
+from typing import Dict, Iterable
+
+from django.contrib.gis.db import models as gis_models
+from django.contrib.gis.db.models.functions import Distance as DistanceFunction
+from django.contrib.gis.measure import Distance
+from django.db.models import BooleanField, F, Func, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast
+
+from matching.models import SearchProfile
+from property.models import Property
+
+# Con la fórmula de location_score la ubicación vale 0 a partir de 10 km
+MATCH_RADIUS_KM = 10
+
+
+def geography(expression):
+    """Cast de una columna Point (SRID 4326) a geography, igual al del índice GiST."""
+    return Cast(expression, output_field=gis_models.PointField(geography=True))
+
+
+def _point_value(point) -> Value:
+    return Value(point, output_field=gis_models.PointField(geography=True))
+
+
+def property_distance_to(point):
+    """Expresión ST_Distance(propiedad, ``point``) para anotar un QuerySet de Property."""
+    return DistanceFunction(geography('location'), _point_value(point))
+
+
+def nearby_properties(queryset, point, radius_km: float = MATCH_RADIUS_KM):
+    """
+    Propiedades dentro de ``radius_km`` de ``point`` (ST_DWithin sobre geography,
+    con índice), anotadas con ``match_distance`` calculada por PostGIS.
+    """
+    return (
+        queryset.annotate(location_geog=geography('location'))
+        .filter(location_geog__dwithin=(point, Distance(km=radius_km)))
+        .annotate(match_distance=property_distance_to(point))
+    )
+
+
+class DWithin(Func):
+    """ST_DWithin(a, b, metros) como expresión booleana, para comparar dos columnas."""
+    function = 'ST_DWithin'
+    output_field = BooleanField()
+
+
+def nearby_count_expression(radius_km: float):
+    """
+    Subconsulta correlacionada con la cantidad de propiedades activas (distintas
+    de la fila externa) a menos de ``radius_km``. Anotada sobre un QuerySet de
+    Property cuenta una página entera en una sola consulta, con el índice GiST.
+    """
+    neighbours = (
+        Property.objects.filter(
+            DWithin(geography('location'), geography(OuterRef('location')), Value(radius_km * 1000.0)),
+            is_active=True,
+        )
+        .exclude(pk=OuterRef('pk'))
+        .order_by()
+        .annotate(total=Func(F('pk'), function='COUNT'))
+        .values('total')
+    )
+    return Subquery(neighbours, output_field=IntegerField())
+
+
+def property_distances_km(point, property_ids: Iterable[int]) -> Dict[int, float]:
+    """Distancias en km de cada propiedad a ``point`` en una sola consulta."""
+    rows = (
+        Property.objects.filter(id__in=list(property_ids), location__isnull=False)
+        .annotate(match_distance=property_distance_to(point))
+        .values_list('id', 'match_distance')
+    )
+    return {pid: distance.km for pid, distance in rows}
+
+
+def profile_distances_km(property_point, profile_ids: Iterable[int]) -> Dict[int, float]:
+    """
+    Distancias en km de cada perfil a una propiedad en una sola consulta
+    (propiedad como primer argumento, igual que en ``property_distance_to``).
+    """
+    rows = (
+        SearchProfile.objects.filter(id__in=list(profile_ids), location__isnull=False)
+        .annotate(match_distance=DistanceFunction(_point_value(property_point), geography('location')))
+        .values_list('id', 'match_distance')
+    )
+    return {pid: distance.km for pid, distance in rows}
@@ -0,0 +1,140 @@
+"""
+Vector tiles (Mapbox Vector Tile) del mapa de propiedades.
+
+Cada tile ``z/x/y`` se arma en PostGIS con ``ST_AsMVT`` sobre las propiedades
+activas cuyo punto cae en el envelope del tile (``&&`` usa el índice GiST de
+``location``), así que el cliente puede pintar el catálogo completo a cualquier
+zoom sin el tope de filas de ``/map/`` y ``/geojson/``. Los filtros son los del
+mapa: ``zone_id``, ``price_min``, ``price_max`` y ``type``.
+
+Los tiles se guardan en caché por (versión, hash de filtros, z, x, y). Los
+cambios de propiedades que afectan al mapa incrementan la versión (ver
+``matching.signals``) y dejan obsoletos todos los tiles de una vez.
+"""
+import hashlib
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.db import connection
+
+from property.models import Property
+
+logger = logging.getLogger(__name__)
+
+TILE_VERSION_KEY = 'property:tiles:version'
+TILE_CACHE_KEY = 'property:tiles:{version}:{filters}:{z}:{x}:{y}'
+TILE_CACHE_TIMEOUT = 60 * 60 * 24
+TILE_LAYER = 'properties'
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+
+# Campos que se dibujan o filtran en el tile: otros cambios no invalidan la caché
+TILE_FIELDS = frozenset(('location', 'is_active', 'type', 'price', 'zone', 'bedrooms', 'bathrooms', 'allows_roommates'))
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_filters(params) -> Dict[str, object]:
+    """
+    Filtros del tile normalizados desde los query params (mismo valor, misma clave
+    de caché). Lanza ValueError si alguno es inválido.
+    """
+    filters: Dict[str, object] = {}
+    zone_id = params.get('zone_id')
+    if zone_id:
+        filters['zone_id'] = int(zone_id)
+    for name in ('price_min', 'price_max'):
+        value = params.get(name)
+        if value:
+            try:
+                price = Decimal(value)
+            except InvalidOperation:
+                raise ValueError(f'{name} inválido')
+            if not price.is_finite():
+                raise ValueError(f'{name} inválido')
+            filters[name] = format(price.normalize(), 'f')
+    property_type = params.get('type')
+    if property_type:
+        filters['type'] = property_type
+    return filters
+
+
+def filters_hash(filters: Dict[str, object]) -> str:
+    raw = json.dumps(filters, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def build_tile(z: int, x: int, y: int, filters: Dict[str, object]) -> bytes:
+    """Tile MVT con la capa ``properties`` (una consulta, sin caché)."""
+    conditions = ['p.is_active', 'p.location IS NOT NULL', 'p.location && ST_Transform(bounds.geom, 4326)']
+    params = [z, x, y]
+    if 'zone_id' in filters:
+        conditions.append('p.zone_id = %s')
+        params.append(filters['zone_id'])
+    if 'price_min' in filters:
+        conditions.append('p.price >= %s')
+        params.append(Decimal(filters['price_min']))
+    if 'price_max' in filters:
+        conditions.append('p.price <= %s')
+        params.append(Decimal(filters['price_max']))
+    if 'type' in filters:
+        conditions.append('p.type = %s')
+        params.append(filters['type'])
+    sql = f"""
+        WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom),
+        tile AS (
+            SELECT
+                ST_AsMVTGeom(ST_Transform(p.location, 3857), bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                p.id, p.type, p.price::float8 AS price, p.zone_id, p.bedrooms, p.bathrooms, p.allows_roommates
+            FROM {Property._meta.db_table} p, bounds
+            WHERE {' AND '.join(conditions)}
+        )
+        SELECT ST_AsMVT(tile, '{TILE_LAYER}', {TILE_EXTENT}, 'geom') FROM tile
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b''
+
+
+def _current_version() -> int:
+    try:
+        return cache.get_or_set(TILE_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        logger.warning('Caché no disponible para los vector tiles; se generan sin caché')
+        return 0
+
+
+def invalidate_tiles():
+    try:
+        cache.incr(TILE_VERSION_KEY)
+    except ValueError:
+        cache.set(TILE_VERSION_KEY, 1, timeout=None)
+    except Exception:
+        pass
+
+
+def get_tile(z: int, x: int, y: int, filters: Dict[str, object]) -> bytes:
+    """Tile desde la caché o generado y guardado (los tiles vacíos también se guardan)."""
+    version = _current_version()
+    key = TILE_CACHE_KEY.format(version=version, filters=filters_hash(filters), z=z, x=x, y=y)
+    tile: Optional[bytes] = None
+    if version:
+        try:
+            tile = cache.get(key)
+        except Exception:
+            tile = None
+    if tile is None:
+        tile = build_tile(z, x, y, filters)
+        if version:
+            try:
+                cache.set(key, tile, timeout=TILE_CACHE_TIMEOUT)
+            except Exception:
+                pass
+    return tile